@@ -0,0 +1,120 @@
+from sqlalchemy import text
+from datetime import datetime, timedelta
+from enum import Enum
+from typing import Optional
+import math
+
+# Reads the hourly/daily rollups that the triggers from migration 4 fill in
+# as tickets are created and resolved. A query touches one row per bucket
+# plus the non-empty histogram bins, never the tickets table.
+
+# Must match resolution_time_bins in migration 4: bin i covers times up to
+# 1.1^i seconds, bin 0 everything up to one second
+RESOLUTION_BIN_GROWTH = 1.1
+
+ROLLUP_TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+class RollupGranularity(str, Enum):
+    HOUR = "hour"
+    DAY = "day"
+
+
+# Default window when no start is given
+DEFAULT_WINDOWS = {
+    RollupGranularity.HOUR: timedelta(hours=48),
+    RollupGranularity.DAY: timedelta(days=30),
+}
+
+
+def _bin_seconds(bin_index: int) -> float:
+    """Representative resolution time for a bin: the geometric middle of its range."""
+    if bin_index <= 0:
+        return 0.5
+    return RESOLUTION_BIN_GROWTH ** (bin_index - 0.5)
+
+
+def histogram_percentile(histogram: dict, q: float) -> Optional[float]:
+    """Estimate the q-th quantile (0..1) from {bin: count}, within about 5%."""
+    total = sum(histogram.values())
+    if not total:
+        return None
+    rank = max(math.ceil(q * total), 1)
+    seen = 0
+    for bin_index in sorted(histogram):
+        seen += histogram[bin_index]
+        if seen >= rank:
+            return round(_bin_seconds(bin_index), 1)
+    return None
+
+
+def _summary(row: dict, histogram: dict) -> dict:
+    resolved = row["resolved"]
+    return {
+        "created": row["created"],
+        "resolved": resolved,
+        "resolved_by_llm": row["resolved_by_llm"],
+        "resolved_by_human": row["resolved_by_human"],
+        "reopened": row["reopened"],
+        "llm_resolution_rate": round(row["resolved_by_llm"] / resolved, 4) if resolved else None,
+        "avg_resolution_seconds": round(row["resolution_seconds_total"] / resolved, 1) if resolved else None,
+        "median_resolution_seconds": histogram_percentile(histogram, 0.5),
+        "p95_resolution_seconds": histogram_percentile(histogram, 0.95)
+    }
+
+
+def bucket_floor(moment: datetime, granularity: RollupGranularity) -> datetime:
+    """Start of the bucket containing `moment`."""
+    moment = moment.replace(minute=0, second=0, microsecond=0)
+    if granularity == RollupGranularity.DAY:
+        moment = moment.replace(hour=0)
+    return moment
+
+
+async def get_ticket_analytics(db, granularity: RollupGranularity, start: datetime, end: datetime) -> dict:
+    """Per-bucket series and range totals for the buckets overlapping [start, end)."""
+    start = bucket_floor(start, granularity)
+    params = {
+        "granularity": granularity.value,
+        "start": start.strftime(ROLLUP_TIME_FORMAT),
+        "end": end.strftime(ROLLUP_TIME_FORMAT)
+    }
+
+    result = await db.execute(text("""
+        SELECT bucket_start, created, resolved, resolved_by_llm, resolved_by_human,
+               reopened, resolution_seconds_total
+        FROM ticket_rollups
+        WHERE granularity = :granularity AND bucket_start >= :start AND bucket_start < :end
+        ORDER BY bucket_start
+    """), params)
+    rows = result.mappings().fetchall()
+
+    result = await db.execute(text("""
+        SELECT bucket_start, bin, count
+        FROM ticket_resolution_histogram
+        WHERE granularity = :granularity AND bucket_start >= :start AND bucket_start < :end
+    """), params)
+    histograms = {}
+    overall_histogram = {}
+    for bucket_start, bin_index, count in result.fetchall():
+        histograms.setdefault(bucket_start, {})[bin_index] = count
+        overall_histogram[bin_index] = overall_histogram.get(bin_index, 0) + count
+
+    series = [
+        {"bucket_start": row["bucket_start"], **_summary(row, histograms.get(row["bucket_start"], {}))}
+        for row in rows
+    ]
+
+    totals = {
+        key: sum(row[key] for row in rows)
+        for key in ("created", "resolved", "resolved_by_llm", "resolved_by_human",
+                    "reopened", "resolution_seconds_total")
+    }
+
+    return {
+        "granularity": granularity.value,
+        "start": params["start"],
+        "end": params["end"],
+        "totals": _summary(totals, overall_histogram),
+        "series": series
+    }
@@ -0,0 +1,86 @@
+"""Latency of cheap requests while admins list tickets, against a running server.
+
+    uvicorn main:app --port 8000
+    python benchmarks/concurrent_latency.py --url http://localhost:8000
+
+Probe clients call GET /api/auth/me back to back, first on their own and
+then while --admins clients loop over GET /api/tickets?limit=500 and
+GET /api/admin/stats. If database work blocks the event loop, the probes
+queue behind every listing and their p99 climbs. Seed the database with a
+realistic number of tickets first; a near-empty table hides the effect.
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def summary(samples) -> str:
+    return (f"{len(samples):6d} requests  "
+            f"p50 {percentile(samples, 50) * 1000:7.1f} ms  "
+            f"p99 {percentile(samples, 99) * 1000:7.1f} ms  "
+            f"max {max(samples) * 1000:7.1f} ms")
+
+
+async def login(client, username: str, password: str) -> dict:
+    response = await client.post("/api/auth/login", json={"username": username, "password": password})
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def loop(client, deadline: float, requests, latencies: list):
+    while time.perf_counter() < deadline:
+        for method, path, headers in requests:
+            started = time.perf_counter()
+            response = await client.request(method, path, headers=headers)
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - started)
+
+
+async def probe_phase(client, headers: dict, args, admin_headers=None):
+    deadline = time.perf_counter() + args.seconds
+    probes, background = [], []
+    clients = [
+        loop(client, deadline, [("GET", "/api/auth/me", headers)], probes)
+        for _ in range(args.probes)
+    ]
+    if admin_headers is not None:
+        clients += [
+            loop(client, deadline, [
+                ("GET", "/api/tickets?limit=500", admin_headers),
+                ("GET", "/api/admin/stats", admin_headers)
+            ], background)
+            for _ in range(args.admins)
+        ]
+    await asyncio.gather(*clients)
+    return probes, background
+
+
+async def main(args):
+    limits = httpx.Limits(max_connections=args.probes + args.admins + 1)
+    async with httpx.AsyncClient(base_url=args.url, timeout=120, limits=limits) as client:
+        admin_headers = await login(client, args.username, args.password)
+
+        probes, _ = await probe_phase(client, admin_headers, args)
+        print(f"probes alone                  {summary(probes)}")
+
+        probes, background = await probe_phase(client, admin_headers, args, admin_headers)
+        print(f"probes, {args.admins:2d} admins listing     {summary(probes)}")
+        print(f"admin list/stats requests     {summary(background)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--username", default="admin")
+    parser.add_argument("--password", default="admin123")
+    parser.add_argument("--probes", type=int, default=8)
+    parser.add_argument("--admins", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=10)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,78 @@
+"""Check IntentRouter.match against a corpus of chat messages.
+
+    python benchmarks/intent_router_accuracy.py
+
+Each phrase maps to the expected (intent, tool arguments), or None when
+the message must go to the agent. Exits 1 if any phrase is routed
+differently, so a regex change that starts catching "close ticket 5" is
+caught before it answers a request it doesn't understand.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from intent_router import IntentRouter  # noqa: E402
+from utils import TicketStatus  # noqa: E402
+
+USER = {"id": 7, "role": "user"}
+ADMIN = {"id": 1, "role": "admin"}
+
+# (message, user, expected match)
+CORPUS = [
+    # Ticket lookups
+    ("ticket 42", USER, ("get_ticket", {"ticket_id": 42})),
+    ("Show me ticket #42", USER, ("get_ticket", {"ticket_id": 42})),
+    ("what's the status of ticket 7?", USER, ("get_ticket", {"ticket_id": 7})),
+    ("status of ticket no. 15", USER, ("get_ticket", {"ticket_id": 15})),
+    ("please tell me about ticket number 3", USER, ("get_ticket", {"ticket_id": 3})),
+    ("Ticket#9", USER, ("get_ticket", {"ticket_id": 9})),
+    ("details for the ticket 100", ADMIN, ("get_ticket", {"ticket_id": 100})),
+    ("  SHOW   ticket 5 !", USER, ("get_ticket", {"ticket_id": 5})),
+    # Listings
+    ("show my tickets", USER, ("get_tickets", {})),
+    ("show my tickets", ADMIN, ("get_tickets", {"user_id": 1})),
+    ("list my open tickets", USER, ("get_tickets", {"status": TicketStatus.OPEN})),
+    ("what are my in progress tickets?", USER, ("get_tickets", {"status": TicketStatus.IN_PROGRESS})),
+    ("show my in-progress tickets", USER, ("get_tickets", {"status": TicketStatus.IN_PROGRESS})),
+    ("pls list my closed tickets", USER, ("get_tickets", {"status": TicketStatus.CLOSED})),
+    ("show me all resolved tickets", ADMIN, ("get_tickets", {"is_resolved": True})),
+    ("show all of my unresolved tickets", USER, ("get_tickets", {"is_resolved": False})),
+    ("could you get me all tickets", ADMIN, ("get_tickets", {})),
+    # Left to the agent
+    ("close ticket 5", USER, None),
+    ("resolve ticket 5", ADMIN, None),
+    # "open" may mean reopening it
+    ("open ticket 12", USER, None),
+    ("can you open ticket 12", USER, None),
+    ("show ticket 5 and close it", USER, None),
+    ("ticket 5 is still broken", USER, None),
+    ("show me ticket five", USER, None),
+    ("show open tickets", USER, None),
+    ("show open tickets", ADMIN, None),
+    ("show my tickets from last week", USER, None),
+    ("show my open tickets and close them", USER, None),
+    ("show my recent tickets", USER, None),
+    ("how do I create a ticket", USER, None),
+    ("create a ticket: my vpn is broken", USER, None),
+    ("my vpn is broken", USER, None),
+    ("", USER, None),
+]
+
+
+def main() -> int:
+    router = IntentRouter(get_ticket=None, get_tickets=None)
+    failures = 0
+    for message, user, expected in CORPUS:
+        matched = router.match(message, user)
+        if matched != expected:
+            failures += 1
+            print(f"MISMATCH {message!r} ({user['role']}): expected {expected}, got {matched}")
+    routed = sum(1 for _, _, expected in CORPUS if expected is not None)
+    print(f"{len(CORPUS) - failures}/{len(CORPUS)} phrases as expected "
+          f"({routed} routed, {len(CORPUS) - routed} left to the agent)")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
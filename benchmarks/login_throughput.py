@@ -0,0 +1,101 @@
+"""Login throughput of a running HelpHub server.
+
+    uvicorn main:app --port 8000
+    python benchmarks/login_throughput.py --url http://localhost:8000
+
+Registers a throwaway user, then has 1, 8 and 64 clients log in back to
+back for --seconds each and reports logins/sec with latency percentiles.
+It then times ticket creation on its own and while --registrations
+registrations run at once, which shows whether password hashing holds up
+the single writer connection.
+"""
+import argparse
+import asyncio
+import secrets
+import time
+
+import httpx
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def summary(samples) -> str:
+    return (f"p50 {percentile(samples, 50) * 1000:7.1f} ms  "
+            f"p99 {percentile(samples, 99) * 1000:7.1f} ms  "
+            f"max {max(samples) * 1000:7.1f} ms")
+
+
+async def register(client, username: str):
+    response = await client.post("/api/auth/register", json={
+        "username": username,
+        "email": f"{username}@bench.local",
+        "password": "bench-password"
+    })
+    response.raise_for_status()
+
+
+async def login_clients(client, username: str, clients: int, seconds: float):
+    latencies = []
+    deadline = time.perf_counter() + seconds
+
+    async def run():
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            response = await client.post("/api/auth/login", json={
+                "username": username,
+                "password": "bench-password"
+            })
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(run() for _ in range(clients)))
+    elapsed = time.perf_counter() - started
+    print(f"{clients:3d} clients  {len(latencies) / elapsed:7.1f} logins/s  {summary(latencies)}")
+
+
+async def create_tickets(client, headers: dict, count: int) -> list:
+    latencies = []
+    for i in range(count):
+        started = time.perf_counter()
+        response = await client.post("/api/tickets", json={"query": f"benchmark ticket {i}"}, headers=headers)
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+async def main(args):
+    limits = httpx.Limits(max_connections=max(args.clients) + args.registrations + 1)
+    async with httpx.AsyncClient(base_url=args.url, timeout=120, limits=limits) as client:
+        prefix = f"bench_{secrets.token_hex(4)}"
+        username = f"{prefix}_login"
+        await register(client, username)
+
+        for clients in args.clients:
+            await login_clients(client, username, clients, args.seconds)
+
+        response = await client.post("/api/auth/login", json={"username": username, "password": "bench-password"})
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        idle = await create_tickets(client, headers, args.tickets)
+        print(f"ticket create, idle                      {summary(idle)}")
+
+        registrations = asyncio.gather(*(
+            register(client, f"{prefix}_{i}") for i in range(args.registrations)
+        ))
+        await asyncio.sleep(0.05)
+        busy = await create_tickets(client, headers, args.tickets)
+        await registrations
+        print(f"ticket create, {args.registrations:3d} registrations running   {summary(busy)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 8, 64])
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--tickets", type=int, default=20)
+    parser.add_argument("--registrations", type=int, default=8)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,121 @@
+"""Per-call overhead of the MCP transports the agent can use to reach the ticket tools.
+
+    python benchmarks/mcp_transport_overhead.py
+    fastmcp run mcp_srvo.py --transport http --port 8001   # for the http row
+    python benchmarks/mcp_transport_overhead.py --transports direct inprocess stdio http
+
+Calls get_ticket --calls times back to back, then --concurrency at a time,
+through each transport as a LangChain tool, the way ToolNode calls it:
+
+    direct     the tool function itself; the query cost every row pays
+    inprocess  FastMCP tool run in this process (MCP_TRANSPORT=inprocess)
+    stdio      pooled sessions to a spawned server (MCP_TRANSPORT=stdio)
+    http       pooled sessions to a running server at --url (MCP_TRANSPORT=http)
+
+Run from the repository root so every transport opens the same database.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mcp_cliento import MCP_SERVER_PATH, SERVERS, _to_langchain_tool  # noqa: E402
+from mcp_pool import MCPSessionPool  # noqa: E402
+from utils import async_engine, async_read_engine  # noqa: E402
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def summary(samples) -> str:
+    return (f"p50 {percentile(samples, 50) * 1000:7.2f} ms  "
+            f"p99 {percentile(samples, 99) * 1000:7.2f} ms  "
+            f"max {max(samples) * 1000:7.2f} ms")
+
+
+async def direct_call(arguments: dict):
+    from mcp_srvo import get_ticket
+    return await get_ticket.fn(**arguments)
+
+
+async def open_transport(transport: str, args):
+    """Return (call, close) for one transport."""
+    if transport == "direct":
+        return direct_call, None
+    if transport == "inprocess":
+        from mcp_srvo import mcp
+        tool = _to_langchain_tool(await mcp.get_tool("get_ticket"))
+        return tool.ainvoke, None
+
+    if transport == "stdio":
+        connection = dict(SERVERS["stdio"]["Tickets"])
+        if args.stdio_command:
+            connection.update(command=args.stdio_command[0],
+                              args=args.stdio_command[1:] + [MCP_SERVER_PATH])
+    else:
+        connection = dict(SERVERS["http"]["Tickets"], url=args.url)
+    pool = MCPSessionPool(connection, size=args.concurrency)
+    await pool.start()
+    tool = next(tool for tool in pool.get_tools() if tool.name == "get_ticket")
+    return tool.ainvoke, pool.close
+
+
+async def timed_calls(call, arguments: dict, count: int) -> list:
+    latencies = []
+    for _ in range(count):
+        started = time.perf_counter()
+        await call(arguments)
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+async def main(args):
+    arguments = {"ticket_id": args.ticket_id, "current_user_id": 1, "current_user_role": "admin"}
+    baseline = None
+    for transport in args.transports:
+        try:
+            call, close = await open_transport(transport, args)
+        except Exception as e:
+            print(f"{transport:9s}  unavailable: {e}")
+            continue
+        try:
+            await timed_calls(call, arguments, args.warmup)
+            serial = await timed_calls(call, arguments, args.calls)
+            started = time.perf_counter()
+            await asyncio.gather(*(
+                timed_calls(call, arguments, args.calls // args.concurrency)
+                for _ in range(args.concurrency)
+            ))
+            throughput = args.calls // args.concurrency * args.concurrency / (time.perf_counter() - started)
+        finally:
+            if close is not None:
+                await close()
+
+        p50 = percentile(serial, 50)
+        if baseline is None:
+            baseline = p50
+        print(f"{transport:9s}  {summary(serial)}  +{(p50 - baseline) * 1000:6.2f} ms/call  "
+              f"{throughput:7.0f} calls/s at {args.concurrency}")
+
+    # Open aiosqlite connections otherwise keep the interpreter from exiting
+    await async_engine.dispose()
+    await async_read_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--transports", nargs="+", default=["direct", "inprocess", "stdio", "http"],
+                        choices=["direct", "inprocess", "stdio", "http"])
+    parser.add_argument("--url", default=SERVERS["http"]["Tickets"]["url"])
+    parser.add_argument("--stdio-command", nargs="+",
+                        help="server command instead of MCP_SERVER_COMMAND, e.g. fastmcp run")
+    parser.add_argument("--ticket-id", type=int, default=1)
+    parser.add_argument("--calls", type=int, default=500)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=4)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,127 @@
+"""FTS5 ticket search against a LIKE scan, on a seeded database of --rows tickets.
+
+    python benchmarks/ticket_search.py --dir /tmp/helphub-search --rows 1000000
+
+The first run creates ticketing_tool.db in --dir through the app's own
+schema and migrations and fills it with --rows synthetic tickets from a
+fixed --seed (a few minutes for 1M, mostly the FTS and statistics
+triggers). Later runs reuse it. Never point --dir at a real database.
+
+Each term is searched as an admin and as a regular user, through
+build_ticket_search (bm25-ranked, what /api/tickets/search runs, plus the
+snippets) and through a LIKE '%term%' scan of the text columns, newest
+first. Best of --runs, 20 results.
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+TERMS = ["kerberos", "certificate proxy firewall", "printer jam", "vpn"]
+# The regular user searching; owns the one "kerberos" ticket
+SEARCH_USER_ID = 5
+
+WORDS = ("vpn outlook password printer jam laptop slow wifi network email calendar sync crash update "
+         "install license teams zoom camera microphone keyboard mouse monitor docking battery charger "
+         "login mfa token expired access denied share drive folder permission backup restore server "
+         "timeout error disk full memory browser chrome firefox certificate proxy firewall").split()
+FILLER = ("the a my is not since morning please help cannot works after again when using office "
+          "home remote today yesterday it keeps showing").split()
+
+LIKE_SEARCH_QUERY = """
+    SELECT t.*, u.username FROM tickets t JOIN users u ON t.user_id = u.id
+    WHERE (t.query LIKE :pattern OR t.llm_response LIKE :pattern OR t.final_response LIKE :pattern)
+    {user_filter}
+    ORDER BY t.created_at DESC
+    LIMIT 20
+"""
+
+
+def seed(conn, rows: int, rng: random.Random, batch: int = 50_000):
+    def sentence(words: int) -> str:
+        return " ".join(rng.choice(WORDS if rng.random() < 0.3 else FILLER) for _ in range(words))
+
+    conn.executemany(
+        "INSERT INTO users (username, email, hashed_password) VALUES (?, ?, 'x')",
+        [(f"search_user_{i}", f"search_user_{i}@bench.local") for i in range(1000)]
+    )
+    user_ids = [row[0] for row in conn.execute("SELECT id FROM users WHERE username LIKE 'search_user_%'")]
+    for start in range(0, rows - 1, batch):
+        conn.executemany(
+            "INSERT INTO tickets (user_id, query, llm_response, final_response) VALUES (?, ?, ?, ?)",
+            [
+                (rng.choice(user_ids), sentence(rng.randint(6, 20)),
+                 sentence(rng.randint(15, 40)) if rng.random() < 0.7 else None,
+                 sentence(rng.randint(10, 30)) if rng.random() < 0.4 else None)
+                for _ in range(min(batch, rows - 1 - start))
+            ]
+        )
+        conn.commit()
+        print(f"  {start + batch:>9,} tickets", end="\r", flush=True)
+    # One ticket with a word nothing else uses
+    conn.execute("INSERT INTO tickets (user_id, query) VALUES (?, 'Kerberos ticket renewal fails on the jumphost')",
+                 (SEARCH_USER_ID,))
+    conn.commit()
+    print()
+
+
+def best_of(runs: int, search):
+    best, rows = None, None
+    for _ in range(runs):
+        started = time.perf_counter()
+        rows = search()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, rows
+
+
+def main(args):
+    os.makedirs(args.dir, exist_ok=True)
+    # utils opens ticketing_tool.db relative to the working directory
+    os.chdir(args.dir)
+    from utils import initialize_database_and_tables, build_fts_match, build_ticket_search, build_search_snippet
+
+    initialize_database_and_tables()
+    conn = sqlite3.connect("ticketing_tool.db")
+    existing = conn.execute("SELECT COUNT(*) FROM tickets").fetchone()[0]
+    if existing < args.rows:
+        if existing > 1:
+            sys.exit(f"{args.dir} holds {existing} tickets; use an empty --dir to seed {args.rows}")
+        print(f"seeding {args.rows:,} tickets into {os.path.abspath('ticketing_tool.db')}")
+        started = time.perf_counter()
+        seed(conn, args.rows, random.Random(args.seed))
+        print(f"seeded in {time.perf_counter() - started:.0f} s")
+
+    def fts(term: str, role: str):
+        sql, params = build_ticket_search(build_fts_match(term), SEARCH_USER_ID, role, limit=20)
+        rows = conn.execute(sql, params).fetchall()
+        return [build_search_snippet([row[3], row[5], row[6]], term) for row in rows]
+
+    def like(term: str, role: str):
+        sql = LIKE_SEARCH_QUERY.format(user_filter="" if role == "admin" else "AND t.user_id = :user_id")
+        return conn.execute(sql, {"pattern": f"%{term}%", "user_id": SEARCH_USER_ID}).fetchall()
+
+    print(f"{'term (matches)':36}  {'role':5}  {'FTS5':>18}  {'LIKE':>18}")
+    for term in TERMS:
+        matches = conn.execute("SELECT COUNT(*) FROM tickets_fts WHERE tickets_fts MATCH ?",
+                               (build_fts_match(term),)).fetchone()[0]
+        for role in ("admin", "user"):
+            fts_time, fts_rows = best_of(args.runs, lambda: fts(term, role))
+            like_time, like_rows = best_of(args.runs, lambda: like(term, role))
+            print(f"{f'{term} ({matches:,})':36}  {role:5}  "
+                  f"{fts_time * 1000:7.1f} ms {len(fts_rows):2d} rows  "
+                  f"{like_time * 1000:7.1f} ms {len(like_rows):2d} rows")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dir", required=True, help="directory for the benchmark database")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--runs", type=int, default=3)
+    main(parser.parse_args())
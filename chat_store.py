@@ -0,0 +1,245 @@
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+from threading import Lock
+from typing import Optional
+from cache import TTLCache
+import asyncio
+import json
+import time
+
+# Rough fixed cost of a message object on top of its content
+MESSAGE_OVERHEAD_BYTES = 256
+
+
+def message_size(message: BaseMessage) -> int:
+    """Approximate memory footprint of a chat message in bytes."""
+    content = message.content
+    if isinstance(content, str):
+        size = len(content.encode("utf-8"))
+    else:
+        size = len(json.dumps(content, default=str).encode("utf-8"))
+    tool_calls = getattr(message, "tool_calls", None)
+    if tool_calls:
+        size += len(json.dumps(tool_calls, default=str).encode("utf-8"))
+    if message.additional_kwargs:
+        size += len(json.dumps(message.additional_kwargs, default=str).encode("utf-8"))
+    return size + MESSAGE_OVERHEAD_BYTES
+
+
+class _Session:
+    __slots__ = ("messages", "nbytes", "last_access")
+
+    def __init__(self, messages: list, nbytes: int):
+        self.messages = messages
+        self.nbytes = nbytes
+        self.last_access = time.monotonic()
+
+
+class ChatSessionStore:
+    """In-memory chat histories with an idle TTL, a global byte budget and a per-session message cap.
+
+    Sessions are kept in LRU order; when the byte budget is exceeded the least
+    recently used sessions are evicted. Histories longer than the cap keep
+    their system prompt and the most recent messages.
+    """
+
+    def __init__(self, idle_ttl: float, max_bytes: int, max_messages: int):
+        self.idle_ttl = idle_ttl
+        self.max_bytes = max_bytes
+        self.max_messages = max_messages
+        self._sessions = OrderedDict()
+        self._lock = Lock()
+        self._bytes = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.trimmed_messages = 0
+
+    def _trim(self, messages: list) -> list:
+        system = [m for m in messages if isinstance(m, SystemMessage)]
+        rest = [m for m in messages if not isinstance(m, SystemMessage)]
+        if len(rest) <= self.max_messages:
+            return messages
+
+        kept = rest[-self.max_messages:]
+        # Start on a user turn so no tool result is left without its tool call
+        while kept and not isinstance(kept[0], HumanMessage):
+            kept = kept[1:]
+        self.trimmed_messages += len(rest) - len(kept)
+        return system + kept
+
+    def _drop(self, session_id: str):
+        session = self._sessions.pop(session_id)
+        self._bytes -= session.nbytes
+
+    def _expire_idle(self, now: float):
+        # LRU order means idle sessions are at the front
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if now - session.last_access < self.idle_ttl:
+                break
+            self._drop(session_id)
+            self.expirations += 1
+
+    def _get_live(self, session_id: str):
+        session = self._sessions.get(session_id)
+        if session is None:
+            return None
+        now = time.monotonic()
+        if now - session.last_access >= self.idle_ttl:
+            self._drop(session_id)
+            self.expirations += 1
+            return None
+        session.last_access = now
+        self._sessions.move_to_end(session_id)
+        return session
+
+    def get(self, session_id: str, default=None):
+        with self._lock:
+            session = self._get_live(session_id)
+            return session.messages if session is not None else default
+
+    def __contains__(self, session_id: str) -> bool:
+        with self._lock:
+            return self._get_live(session_id) is not None
+
+    def __getitem__(self, session_id: str) -> list:
+        messages = self.get(session_id)
+        if messages is None:
+            raise KeyError(session_id)
+        return messages
+
+    def __setitem__(self, session_id: str, messages: list):
+        with self._lock:
+            now = time.monotonic()
+            self._expire_idle(now)
+
+            messages = self._trim(list(messages))
+            nbytes = sum(message_size(m) for m in messages)
+            if session_id in self._sessions:
+                self._drop(session_id)
+            self._sessions[session_id] = _Session(messages, nbytes)
+            self._bytes += nbytes
+
+            # Evict least recently used sessions, never the one just written
+            while self._bytes > self.max_bytes and len(self._sessions) > 1:
+                oldest = next(iter(self._sessions))
+                self._drop(oldest)
+                self.evictions += 1
+
+    def __delitem__(self, session_id: str):
+        with self._lock:
+            self._drop(session_id)
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def stats(self) -> dict:
+        return {
+            "sessions": len(self._sessions),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "max_messages": self.max_messages,
+            "idle_ttl_seconds": self.idle_ttl,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "trimmed_messages": self.trimmed_messages
+        }
+
+
+def normalize_message(message: str) -> str:
+    return " ".join(message.lower().split())
+
+
+class ChatTurnCoordinator:
+    """Serializes chat turns per session and shares one agent run between duplicate submits.
+
+    Turns for a session run one at a time under a per-session lock, so each
+    turn reads the history the previous one wrote. An identical message that
+    arrives while the same turn is in flight, or within `coalesce_window`
+    seconds after it finished, gets that turn's result instead of a new run.
+    Requests carrying an idempotency key replay the stored result for
+    `idempotency_ttl` seconds.
+    """
+
+    def __init__(self, coalesce_window: float, idempotency_ttl: float, max_keys: int = 10000):
+        self._locks = {}
+        self._in_flight = {}
+        self._recent = TTLCache(maxsize=max_keys, ttl=coalesce_window)
+        self._idempotent = TTLCache(maxsize=max_keys, ttl=idempotency_ttl)
+        self.turns = 0
+        # Turns that reached the agent, counted by the turn itself; routed
+        # and cached answers don't
+        self.agent_runs = 0
+        self.coalesced = 0
+        self.idempotent_replays = 0
+        self.lock_waits = 0
+
+    @asynccontextmanager
+    async def session_lock(self, session_id: str):
+        """Hold the session's turn lock; the lock is dropped once nobody uses it."""
+        entry = self._locks.setdefault(session_id, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            if entry[0].locked():
+                self.lock_waits += 1
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                self._locks.pop(session_id, None)
+
+    async def run(self, session_id: str, message: str, turn, idempotency_key: Optional[str] = None):
+        """Run `turn()` for this message unless an equivalent run can be reused."""
+        keys = [("message", session_id, normalize_message(message))]
+        if idempotency_key:
+            keys.append(("idempotency", session_id, idempotency_key))
+            replay = self._idempotent.get(keys[1])
+            if replay is not None:
+                self.idempotent_replays += 1
+                return replay
+
+        recent = self._recent.get(keys[0])
+        if recent is not None:
+            self.coalesced += 1
+            return recent
+
+        for key in keys:
+            future = self._in_flight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        for key in keys:
+            self._in_flight[key] = future
+
+        try:
+            async with self.session_lock(session_id):
+                self.turns += 1
+                result = await turn()
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark retrieved so a run nobody else joined doesn't log a warning
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            self._recent.set(keys[0], result)
+            if idempotency_key:
+                self._idempotent.set(keys[1], result)
+            return result
+        finally:
+            for key in keys:
+                self._in_flight.pop(key, None)
+
+    def stats(self) -> dict:
+        return {
+            "turns": self.turns,
+            "agent_runs": self.agent_runs,
+            "coalesced": self.coalesced,
+            "idempotent_replays": self.idempotent_replays,
+            "lock_waits": self.lock_waits,
+            "active_sessions": len(self._locks)
+        }
@@ -0,0 +1,330 @@
+from sqlalchemy import text
+from utils import get_db, get_async_db
+from datetime import datetime, timezone
+from collections import OrderedDict
+from typing import Dict, List
+import numpy as np
+import asyncio
+import logging
+import os
+import re
+import threading
+import time
+import zlib
+
+logger = logging.getLogger(__name__)
+
+# Tickets whose estimated Jaccard similarity (over character shingles of the
+# normalized query) reaches this are grouped as duplicates
+DUPLICATE_THRESHOLD = float(os.getenv("DUPLICATE_THRESHOLD", "0.6"))
+# Only tickets filed within this window are considered; outages are bursts
+DUPLICATE_WINDOW_HOURS = float(os.getenv("DUPLICATE_WINDOW_HOURS", "24"))
+# ...and at most this many of them, the newest (about 1.6 KB each)
+DUPLICATE_MAX_TICKETS = int(os.getenv("DUPLICATE_MAX_TICKETS", "50000"))
+
+MINHASH_PERMUTATIONS = 64
+# 16 bands of 4 rows: pairs at Jaccard 0.6 share a band ~88% of the time,
+# pairs at 0.3 only ~12%
+LSH_BANDS = 16
+SHINGLE_CHARS = 5
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# First load: the newest tickets in the window. After that: whatever any
+# process inserted since, found by id
+RECENT_TICKETS_QUERY = """
+    SELECT * FROM (
+        SELECT id, query, duplicate_group_id, created_at
+        FROM tickets
+        WHERE created_at >= datetime('now', :window)
+        ORDER BY id DESC
+        LIMIT :limit
+    )
+    ORDER BY id
+"""
+NEW_TICKETS_QUERY = """
+    SELECT id, query, duplicate_group_id, created_at
+    FROM tickets
+    WHERE id > :last_id
+    ORDER BY id
+"""
+# Never regroups a ticket that already has a group
+SET_DUPLICATE_GROUP_QUERY = """
+    UPDATE tickets SET duplicate_group_id = :group_id
+    WHERE id = :id AND duplicate_group_id IS NULL
+"""
+
+
+def _epoch(created_at) -> float:
+    if isinstance(created_at, datetime):
+        moment = created_at
+    else:
+        moment = datetime.strptime(str(created_at)[:19], "%Y-%m-%d %H:%M:%S")
+    return moment.replace(tzinfo=timezone.utc).timestamp()
+
+
+class DuplicateIndex:
+    """MinHash + LSH index over recent tickets' query text.
+
+    Each query becomes a 64-value MinHash signature of its character
+    5-gram shingles; the signature is cut into 16 bands and every band is
+    a hash bucket. A new ticket is compared only with tickets sharing a
+    bucket, so a check costs one signature plus a few dictionary lookups.
+
+    The group id is the id of the first ticket of the group. The index
+    holds up to DUPLICATE_MAX_TICKETS tickets from the last
+    DUPLICATE_WINDOW_HOURS and catches up on tickets created by other
+    processes through `pending_query()` and `observe()`; `assign()` runs
+    at insert time and `apply()` after the insert commits.
+    """
+
+    def __init__(self, permutations: int = MINHASH_PERMUTATIONS, bands: int = LSH_BANDS):
+        rng = np.random.default_rng(0x5EED)
+        # Multiply-shift hash family: (a * x + b) mod 2^64, top 32 bits
+        self._a = rng.integers(1, 2 ** 63, permutations, dtype=np.uint64) | np.uint64(1)
+        self._b = rng.integers(0, 2 ** 63, permutations, dtype=np.uint64)
+        self._bands = bands
+        # Folds each band into one 64-bit bucket key; a collision only adds
+        # a candidate that the signature comparison then rejects
+        self._band_mix = rng.integers(1, 2 ** 63, permutations // bands, dtype=np.uint64) | np.uint64(1)
+        self._band_offset = rng.integers(0, 2 ** 63, bands, dtype=np.uint64)
+        self._lock = threading.Lock()
+        # bucket key -> ticket id, or a list of ids once a second group lands there
+        self._buckets = {}
+        # ticket id -> [signature bytes, group id, created epoch], oldest first
+        self._tickets = OrderedDict()
+        self._loaded = False
+        self._warming = False
+        self.last_id = 0
+        self.checks = 0
+        self.duplicates = 0
+        self.total_check_time = 0.0
+
+    def signature(self, query: str) -> np.ndarray:
+        normalized = " ".join(_TOKEN_RE.findall(query.lower()))
+        if len(normalized) <= SHINGLE_CHARS:
+            shingles = {normalized}
+        else:
+            shingles = {normalized[i:i + SHINGLE_CHARS] for i in range(len(normalized) - SHINGLE_CHARS + 1)}
+        # crc32 rather than hash(), which is salted per process
+        hashes = np.fromiter((zlib.crc32(s.encode()) for s in shingles), np.uint64, len(shingles))
+        with np.errstate(over="ignore"):
+            mixed = (self._a[:, None] * hashes[None, :] + self._b[:, None]) >> np.uint64(32)
+        return mixed.min(axis=1).astype(np.uint32)
+
+    def _band_keys(self, signature: np.ndarray) -> list:
+        rows = signature.reshape(self._bands, -1).astype(np.uint64)
+        with np.errstate(over="ignore"):
+            return ((rows * self._band_mix).sum(axis=1) + self._band_offset).tolist()
+
+    def _member(self, ticket_id: int) -> int:
+        group_id = self._tickets[ticket_id][1]
+        return ticket_id if group_id is None else group_id
+
+    def _add(self, ticket_id: int, signature: np.ndarray, group_id, created: float):
+        self._tickets[ticket_id] = [signature.tobytes(), group_id, created]
+        # Each bucket keeps one ticket per group: during an outage hundreds
+        # of reports share the same buckets, and comparing against one of
+        # them is enough to find the group
+        member = ticket_id if group_id is None else group_id
+        for key in self._band_keys(signature):
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                self._buckets[key] = ticket_id
+                continue
+            if isinstance(bucket, int):
+                bucket = self._buckets[key] = [bucket]
+            if all(self._member(other) != member for other in bucket):
+                bucket.append(ticket_id)
+
+    def _evict(self):
+        cutoff = time.time() - DUPLICATE_WINDOW_HOURS * 3600
+        # Tickets are added in id order, so the oldest come first
+        while self._tickets:
+            ticket_id, (signature, _, created) = next(iter(self._tickets.items()))
+            if created >= cutoff and len(self._tickets) <= DUPLICATE_MAX_TICKETS:
+                break
+            for key in self._band_keys(np.frombuffer(signature, np.uint32)):
+                bucket = self._buckets.get(key)
+                if bucket == ticket_id:
+                    del self._buckets[key]
+                elif isinstance(bucket, list) and ticket_id in bucket:
+                    bucket.remove(ticket_id)
+                    if len(bucket) == 1:
+                        self._buckets[key] = bucket[0]
+            del self._tickets[ticket_id]
+
+    def ready(self) -> bool:
+        """False until the first load has at least started; inserts skip grouping until then."""
+        return self._loaded or self._warming
+
+    def pending_query(self):
+        """(sql, params) for the tickets this index hasn't seen yet, or None while `warm()` runs."""
+        if self._warming:
+            return None
+        if not self._loaded:
+            return RECENT_TICKETS_QUERY, {
+                "window": f"-{DUPLICATE_WINDOW_HOURS * 3600:.0f} seconds",
+                "limit": DUPLICATE_MAX_TICKETS
+            }
+        return NEW_TICKETS_QUERY, {"last_id": self.last_id}
+
+    def observe(self, rows):
+        """Index (id, query, duplicate_group_id, created_at) rows from `pending_query()`."""
+        # Signatures are computed outside the lock; only the dict updates hold it
+        entries = [
+            (ticket_id, self.signature(query), group_id, _epoch(created_at))
+            for ticket_id, query, group_id, created_at in rows
+            if ticket_id not in self._tickets
+        ]
+        with self._lock:
+            for ticket_id, signature, group_id, created in entries:
+                if ticket_id not in self._tickets:
+                    self._add(ticket_id, signature, group_id, created)
+                self.last_id = max(self.last_id, ticket_id)
+            self._loaded = True
+            self._evict()
+
+    def warm(self, db, chunk_size: int = 1000):
+        """Load the recent window in chunks, so inserts meanwhile aren't held up.
+
+        Inserts made during the load are checked against what is loaded so far.
+        """
+        with self._lock:
+            pending = self.pending_query()
+            if pending is None:
+                return
+            self._warming = True
+        try:
+            # Read first, so a quiet window still leaves last_id at the newest ticket
+            newest = db.execute(text("SELECT COALESCE(MAX(id), 0) FROM tickets")).scalar()
+            result = db.execute(text(pending[0]), pending[1])
+            while True:
+                rows = result.fetchmany(chunk_size)
+                if not rows:
+                    break
+                self.observe(rows)
+            with self._lock:
+                self.last_id = max(self.last_id, newest)
+                self._loaded = True
+        finally:
+            self._warming = False
+        logger.info(f"Duplicate ticket index loaded: {len(self._tickets)} recent tickets")
+
+    def assign(self, rows):
+        """Check new (id, query, created_at) rows in id order.
+
+        Returns (groups, entries): groups is {ticket_id: group_id} for every
+        ticket whose group must be written (each duplicate, plus the first
+        ticket of a new group). Nothing is indexed yet; pass both to
+        `apply()` once the inserting transaction has committed.
+        """
+        groups = {}
+        # Tickets of this batch, checked against each other as well
+        batch = {}
+        batch_buckets = {}
+        with self._lock:
+            for ticket_id, query, created_at in sorted(rows, key=lambda row: row[0]):
+                started = time.perf_counter()
+                signature = self.signature(query)
+                keys = self._band_keys(signature)
+                candidates = set()
+                for key in keys:
+                    bucket = self._buckets.get(key)
+                    if isinstance(bucket, int):
+                        candidates.add(bucket)
+                    elif bucket is not None:
+                        candidates.update(bucket)
+                    candidates.update(batch_buckets.get(key, ()))
+                best_id = None
+                if candidates:
+                    candidates = list(candidates)
+                    stored = b"".join(batch[c][0] if c in batch else self._tickets[c][0] for c in candidates)
+                    scores = (np.frombuffer(stored, np.uint32).reshape(len(candidates), -1) == signature).mean(axis=1)
+                    best = int(scores.argmax())
+                    if scores[best] >= DUPLICATE_THRESHOLD:
+                        best_id = candidates[best]
+
+                group_id = None
+                if best_id is not None:
+                    group_id = groups.get(best_id)
+                    if group_id is None:
+                        group_id = batch[best_id][1] if best_id in batch else self._tickets[best_id][1]
+                    if group_id is None:
+                        group_id = groups[best_id] = best_id
+                    groups[ticket_id] = group_id
+                    self.duplicates += 1
+
+                batch[ticket_id] = [signature.tobytes(), group_id, _epoch(created_at)]
+                for key in keys:
+                    batch_buckets.setdefault(key, []).append(ticket_id)
+                self.checks += 1
+                self.total_check_time += time.perf_counter() - started
+        entries = [(ticket_id, signature, created) for ticket_id, (signature, _, created) in batch.items()]
+        return groups, entries
+
+    def apply(self, groups: Dict[int, int], entries: list):
+        """Index what `assign()` returned, after its transaction committed."""
+        with self._lock:
+            for ticket_id, group_id in groups.items():
+                ticket = self._tickets.get(ticket_id)
+                # SET_DUPLICATE_GROUP_QUERY doesn't overwrite a group either
+                if ticket is not None and ticket[1] is None:
+                    ticket[1] = group_id
+            for ticket_id, signature, created in entries:
+                if ticket_id not in self._tickets:
+                    self._add(ticket_id, np.frombuffer(signature, np.uint32), groups.get(ticket_id), created)
+                # Ids are handed out under the write lock and never reused, so
+                # a gap means another process inserted a ticket we have yet to
+                # observe; last_id stays below it for the next catch-up
+                if ticket_id == self.last_id + 1:
+                    self.last_id = ticket_id
+            self._evict()
+
+    @staticmethod
+    def update_params(updates: Dict[int, int]) -> List[dict]:
+        """Parameters for SET_DUPLICATE_GROUP_QUERY, one dict per ticket."""
+        return [{"id": ticket_id, "group_id": group_id} for ticket_id, group_id in updates.items()]
+
+    def stats(self) -> dict:
+        return {
+            "indexed": len(self._tickets),
+            "buckets": len(self._buckets),
+            "checks": self.checks,
+            "duplicates": self.duplicates,
+            "avg_check_us": round(self.total_check_time / self.checks * 1e6, 1) if self.checks else 0.0
+        }
+
+
+duplicate_index = DuplicateIndex()
+# Background load started by catch_up_duplicate_index(); held so it isn't
+# garbage-collected mid-run
+_warm_task = None
+
+
+def warm_duplicate_index():
+    """Load the recent tickets ahead of the first insert."""
+    with get_db(readonly=True) as db:
+        duplicate_index.warm(db)
+
+
+async def catch_up_duplicate_index():
+    """Index tickets other processes created since the last insert.
+
+    Call before opening the inserting transaction, so the write lock is
+    never held while reading. A cold index is loaded in the background
+    instead of inline.
+    """
+    global _warm_task
+    pending = duplicate_index.pending_query()
+    if pending is None:
+        return
+    if not duplicate_index.ready():
+        if _warm_task is None or _warm_task.done():
+            _warm_task = asyncio.create_task(asyncio.to_thread(warm_duplicate_index))
+        return
+    async with get_async_db(readonly=True) as db:
+        result = await db.execute(text(pending[0]), pending[1])
+        rows = result.fetchall()
+    if rows:
+        duplicate_index.observe(rows)
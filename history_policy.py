@@ -0,0 +1,130 @@
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage, ToolMessage
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+# Cheap token estimate; close enough for English/HTML with OpenAI tokenizers
+CHARS_PER_TOKEN = 4
+MESSAGE_OVERHEAD_TOKENS = 4
+
+_TAG_RE = re.compile(r"<[^>]+>")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def estimate_tokens(messages: list) -> int:
+    total = 0
+    for message in messages:
+        content = message.content if isinstance(message.content, str) else str(message.content)
+        total += len(content) // CHARS_PER_TOKEN + MESSAGE_OVERHEAD_TOKENS
+        tool_calls = getattr(message, "tool_calls", None)
+        if tool_calls:
+            total += len(str(tool_calls)) // CHARS_PER_TOKEN
+    return total
+
+
+def _plain_text(content: str) -> str:
+    return _SPACE_RE.sub(" ", _TAG_RE.sub(" ", content)).strip()
+
+
+def _shorten(text: str, limit: int) -> str:
+    return text if len(text) <= limit else text[:limit].rstrip() + "..."
+
+
+class HistoryPolicy:
+    """Decides which part of a chat history is sent to the agent on each turn.
+
+    Keeps the system prompt and the last `max_turns` turns (a turn starts at a
+    user message). In older kept turns, tool output is collapsed to a stub and
+    HTML answers to a short plain-text preview. Turns that fall outside the
+    window or the token budget are dropped, optionally leaving a one-line
+    summary of what the user asked.
+    """
+
+    def __init__(self, max_turns: int, token_budget: int, summarize: bool = True, stub_chars: int = 200):
+        self.max_turns = max_turns
+        self.token_budget = token_budget
+        self.summarize = summarize
+        self.stub_chars = stub_chars
+        self.turns = 0
+        self.last_prompt_tokens = 0
+        self.last_full_tokens = 0
+        self.total_prompt_tokens = 0
+        self.total_full_tokens = 0
+        self.max_prompt_tokens = 0
+        self.dropped_turns = 0
+
+    def _compact(self, message: BaseMessage) -> BaseMessage:
+        if not isinstance(message.content, str):
+            return message
+        if isinstance(message, ToolMessage):
+            stub = f"[earlier {message.name or 'tool'} result omitted, {len(message.content)} chars]"
+            return message.model_copy(update={"content": stub})
+        if isinstance(message, AIMessage) and "<" in message.content:
+            preview = _shorten(_plain_text(message.content), self.stub_chars)
+            return message.model_copy(update={"content": preview})
+        return message
+
+    def _summary(self, dropped_turns: list):
+        asks = [
+            _shorten(_plain_text(turn[0].content), 80)
+            for turn in dropped_turns
+            if isinstance(turn[0].content, str)
+        ]
+        if not asks:
+            return None
+        return SystemMessage(content="Earlier in this conversation the user asked: " + "; ".join(asks))
+
+    def apply(self, messages: list) -> list:
+        system = []
+        turns = []
+        for message in messages:
+            if isinstance(message, SystemMessage) and not turns:
+                system.append(message)
+            elif isinstance(message, HumanMessage) or not turns:
+                turns.append([message])
+            else:
+                turns[-1].append(message)
+
+        current = turns[-1:] if turns else []
+        older = turns[:-1]
+        dropped = older[:-(self.max_turns - 1)] if self.max_turns > 1 else older
+        kept = older[len(dropped):]
+        kept = [[self._compact(m) for m in turn] for turn in kept]
+
+        def build():
+            summary = self._summary(dropped) if self.summarize and dropped else None
+            return system + ([summary] if summary else []) + [m for turn in kept + current for m in turn]
+
+        prompt = build()
+        while kept and estimate_tokens(prompt) > self.token_budget:
+            dropped.append(kept.pop(0))
+            prompt = build()
+
+        self._record(messages, prompt, len(dropped))
+        return prompt
+
+    def _record(self, full: list, prompt: list, dropped: int):
+        full_tokens = estimate_tokens(full)
+        prompt_tokens = estimate_tokens(prompt)
+        self.turns += 1
+        self.last_full_tokens = full_tokens
+        self.last_prompt_tokens = prompt_tokens
+        self.total_full_tokens += full_tokens
+        self.total_prompt_tokens += prompt_tokens
+        self.max_prompt_tokens = max(self.max_prompt_tokens, prompt_tokens)
+        self.dropped_turns += dropped
+        logger.debug(f"Chat prompt ~{prompt_tokens} tokens (full history ~{full_tokens}, {dropped} turns dropped)")
+
+    def stats(self) -> dict:
+        return {
+            "max_turns": self.max_turns,
+            "token_budget": self.token_budget,
+            "turns": self.turns,
+            "last_prompt_tokens": self.last_prompt_tokens,
+            "last_full_history_tokens": self.last_full_tokens,
+            "avg_prompt_tokens": round(self.total_prompt_tokens / self.turns, 1) if self.turns else 0,
+            "max_prompt_tokens": self.max_prompt_tokens,
+            "tokens_saved": self.total_full_tokens - self.total_prompt_tokens,
+            "dropped_turns": self.dropped_turns
+        }
@@ -0,0 +1,122 @@
+from typing import Optional, Tuple
+from utils import TicketStatus
+from mcp_srvo import tool_output_format
+import logging
+import re
+import time
+
+logger = logging.getLogger(__name__)
+
+# Only whole-message matches are routed; anything with extra qualifiers
+# ("... from last week", "... and close it") goes to the agent.
+_POLITE = r"(?:(?:please|pls|can you|could you)\s+)?"
+
+_TICKET_DETAIL_RE = re.compile(
+    r"^" + _POLITE +
+    r"(?:(?:tell me about|show(?: me)?|get|view|details (?:of|for|on)|"
+    r"what(?:'s| is)(?: the status of)?|status of)\s+)?"
+    r"(?:the\s+)?ticket\s*(?:#|no\.?\s*|number\s*)?(\d+)$"
+)
+
+_TICKET_LIST_RE = re.compile(
+    r"^" + _POLITE +
+    r"(?:(?:show|list|get|view)(?: me)?|what are)\s+"
+    r"(?:(all)(?: of)?\s+)?(my\s+)?(?:(?:the|all)\s+)?"
+    r"(open|in progress|in-progress|resolved|unresolved|closed)?\s*tickets$"
+)
+
+# Filter arguments for get_tickets, keyed by the status word in the message
+_LIST_FILTERS = {
+    None: {},
+    "open": {"status": TicketStatus.OPEN},
+    "in progress": {"status": TicketStatus.IN_PROGRESS},
+    "in-progress": {"status": TicketStatus.IN_PROGRESS},
+    "closed": {"status": TicketStatus.CLOSED},
+    "resolved": {"is_resolved": True},
+    "unresolved": {"is_resolved": False},
+}
+
+
+def _normalize(message: str) -> str:
+    return " ".join(message.lower().split()).rstrip("?.! ")
+
+
+class IntentRouter:
+    """Answers simple ticket lookups by calling the MCP tool functions directly.
+
+    Recognizes "ticket #N" lookups and "show my [status] tickets" listings.
+    Anything else returns None from `route()` so the caller falls back to
+    the agent.
+    """
+
+    def __init__(self, get_ticket, get_tickets):
+        self._get_ticket = get_ticket
+        self._get_tickets = get_tickets
+        self.attempts = 0
+        self.hits = {}
+        self.errors = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    def match(self, message: str, user: dict) -> Optional[Tuple[str, dict]]:
+        """Map a message to (intent, tool arguments), or None if it isn't a simple command."""
+        text = _normalize(message)
+
+        detail = _TICKET_DETAIL_RE.match(text)
+        if detail:
+            return "get_ticket", {"ticket_id": int(detail.group(1))}
+
+        listing = _TICKET_LIST_RE.match(text)
+        if listing:
+            everyone, mine, status_word = listing.groups()
+            args = dict(_LIST_FILTERS[status_word])
+            # "my tickets" from an admin means their own, not everyone's
+            if mine and user.get("role") == "admin":
+                args["user_id"] = user["id"]
+            elif not mine and not everyone:
+                # "show open tickets": whose? Let the agent decide
+                return None
+            return "get_tickets", args
+
+        return None
+
+    async def route(self, message: str, user: dict) -> Optional[str]:
+        """Run the matched tool for this user and return its HTML, or None to use the agent."""
+        self.attempts += 1
+        matched = self.match(message, user)
+        if matched is None:
+            return None
+
+        intent, args = matched
+        access = {"current_user_id": user["id"], "current_user_role": user.get("role", "user")}
+        tool = self._get_ticket if intent == "get_ticket" else self._get_tickets
+
+        started = time.perf_counter()
+        # The result goes straight into the chat, so ask for the HTML cards
+        token = tool_output_format.set("html")
+        try:
+            html = await tool(**args, **access)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Fast path {intent} failed, falling back to agent: {e}")
+            return None
+        finally:
+            tool_output_format.reset(token)
+
+        latency = time.perf_counter() - started
+        self.hits[intent] = self.hits.get(intent, 0) + 1
+        self.total_latency += latency
+        self.max_latency = max(self.max_latency, latency)
+        return html
+
+    def stats(self) -> dict:
+        routed = sum(self.hits.values())
+        return {
+            "attempts": self.attempts,
+            "routed": routed,
+            "hit_rate": round(routed / self.attempts, 4) if self.attempts else 0.0,
+            "by_intent": dict(self.hits),
+            "errors": self.errors,
+            "avg_latency_ms": round(self.total_latency / routed * 1000, 2) if routed else 0.0,
+            "max_latency_ms": round(self.max_latency * 1000, 2)
+        }
@@ -1,11 +1,11 @@
-from fastapi.responses import HTMLResponse, FileResponse, JSONResponse
+from fastapi.responses import HTMLResponse, FileResponse, JSONResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
-from fastapi import FastAPI, HTTPException, Form, Depends, status, Query, Request
+from fastapi import FastAPI, HTTPException, Form, Depends, status, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.templating import Jinja2Templates
 from pydantic import BaseModel, Field
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Tuple
 from datetime import datetime, timedelta, timezone
 import os
 from langchain_core.messages import HumanMessage, AIMessage, SystemMessage, ToolMessage
@@ -13,6 +13,7 @@ from enum import Enum
 from contextlib import contextmanager, asynccontextmanager
 import uvicorn
 import hashlib
+import json
 import secrets
 import jwt
 from passlib.context import CryptContext
@@ -26,11 +27,27 @@ from mcp_cliento import *
 load_dotenv()
 import asyncio
 from security import *
+from cache import TTLCache
+from chat_store import ChatSessionStore, ChatTurnCoordinator, normalize_message
+from history_policy import HistoryPolicy
+from intent_router import IntentRouter
+from rendering import format_error_message, format_success_message, get_render_stats
+from ticket_stats import COUNTERS_QUERY, build_stats
+from analytics import RollupGranularity, DEFAULT_WINDOWS, get_ticket_analytics
+from similarity import similar_tickets, lookup_similar_tickets, warm_similar_tickets, SIMILARITY_MIN_SCORE
+from dedup import duplicate_index, catch_up_duplicate_index, warm_duplicate_index, SET_DUPLICATE_GROUP_QUERY
+from ticket_events import ticket_event_bus, watch_ticket_changes, TICKET_EVENT_KEEPALIVE_SECONDS
+import mcp_srvo
 # JWT configuration
 SECRET_KEY = os.getenv("JWT_SECRET_KEY", "raurrr")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
+# Authenticated user records, keyed by username, so auth skips the DB on most requests
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "60"))
+USER_CACHE_MAX_SIZE = int(os.getenv("USER_CACHE_MAX_SIZE", "10000"))
+user_cache = TTLCache(maxsize=USER_CACHE_MAX_SIZE, ttl=USER_CACHE_TTL_SECONDS)
+
 # Password hashing
 
 security = HTTPBearer()
@@ -39,8 +56,46 @@ security = HTTPBearer()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Store chat sessions in memory (use Redis in production)
-chat_sessions = {}
+# Store chat sessions in memory (use Redis in production), bounded by
+# idle TTL, a global byte budget and a per-session message cap
+CHAT_SESSION_IDLE_TTL_SECONDS = float(os.getenv("CHAT_SESSION_IDLE_TTL_SECONDS", "3600"))
+CHAT_SESSION_MAX_BYTES = int(os.getenv("CHAT_SESSION_MAX_BYTES", str(64 * 1024 * 1024)))
+CHAT_SESSION_MAX_MESSAGES = int(os.getenv("CHAT_SESSION_MAX_MESSAGES", "50"))
+chat_sessions = ChatSessionStore(
+    idle_ttl=CHAT_SESSION_IDLE_TTL_SECONDS,
+    max_bytes=CHAT_SESSION_MAX_BYTES,
+    max_messages=CHAT_SESSION_MAX_MESSAGES
+)
+
+# What part of a session's history is sent to the agent each turn
+HISTORY_MAX_TURNS = int(os.getenv("HISTORY_MAX_TURNS", "8"))
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "6000"))
+HISTORY_SUMMARIZE = os.getenv("HISTORY_SUMMARIZE", "true").lower() == "true"
+history_policy = HistoryPolicy(
+    max_turns=HISTORY_MAX_TURNS,
+    token_budget=HISTORY_TOKEN_BUDGET,
+    summarize=HISTORY_SUMMARIZE
+)
+
+# Rendered answers for repeat chat intents, keyed on the message, the user and
+# their ticket data version so any ticket write invalidates them
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "300"))
+RESPONSE_CACHE_MAX_SIZE = int(os.getenv("RESPONSE_CACHE_MAX_SIZE", "1000"))
+# Very short messages ("yes", "the first one") depend on the conversation, so skip them
+RESPONSE_CACHE_MIN_CHARS = int(os.getenv("RESPONSE_CACHE_MIN_CHARS", "12"))
+response_cache = TTLCache(maxsize=RESPONSE_CACHE_MAX_SIZE, ttl=RESPONSE_CACHE_TTL_SECONDS)
+
+# Simple ticket lookups skip the agent and call the MCP tools directly
+INTENT_ROUTER_ENABLED = os.getenv("INTENT_ROUTER_ENABLED", "true").lower() == "true"
+intent_router = IntentRouter(mcp_srvo.get_ticket.fn, mcp_srvo.get_tickets.fn)
+
+# One agent run at a time per session; duplicate submits share a run
+CHAT_COALESCE_WINDOW_SECONDS = float(os.getenv("CHAT_COALESCE_WINDOW_SECONDS", "2"))
+CHAT_IDEMPOTENCY_TTL_SECONDS = float(os.getenv("CHAT_IDEMPOTENCY_TTL_SECONDS", "600"))
+chat_turns = ChatTurnCoordinator(
+    coalesce_window=CHAT_COALESCE_WINDOW_SECONDS,
+    idempotency_ttl=CHAT_IDEMPOTENCY_TTL_SECONDS
+)
 
 
 ## agent initialization
@@ -68,11 +123,26 @@ async def lifespan(app: FastAPI):
 
     # Define tool_llm NOW that agent_instance exists
         async def tool_llm(msg: list):
-            state = {"messages": msg}
+            state = {"messages": history_policy.apply(msg)}
             resp = await agent_instance.ainvoke(state)
-            msg.append(resp["messages"][-1])
+            # Rendered cards the tools attached in this turn ride along on the reply
+            turn_messages = resp["messages"][len(state["messages"]):]
+            msg.append(with_artifacts(resp["messages"][-1], collect_tool_artifacts(turn_messages)))
             return msg
         initialize_database_and_tables()
+        # Load the similar-ticket index in the background; lookups made
+        # before it finishes wait for it. Likewise the duplicate index;
+        # inserts meanwhile check what is loaded so far. The tasks are held
+        # until shutdown so they can't be garbage-collected mid-run
+        warm_tasks = [
+            asyncio.create_task(asyncio.to_thread(warm_similar_tickets)),
+            asyncio.create_task(asyncio.to_thread(warm_duplicate_index))
+        ]
+        # Tools running in a separate MCP server process can't publish to the
+        # ticket feed here, so pick their writes up from the database
+        ticket_watcher = None
+        if MCP_TRANSPORT != "inprocess":
+            ticket_watcher = asyncio.create_task(watch_ticket_changes())
 
         logger.info("Application startup complete")
     except Exception as e:
@@ -82,6 +152,15 @@ async def lifespan(app: FastAPI):
     yield
     
     # Shutdown
+    # A load still running in its thread can't be interrupted; let it finish
+    await asyncio.gather(*warm_tasks, return_exceptions=True)
+    if ticket_watcher is not None:
+        ticket_watcher.cancel()
+    await close_mcp_pool()
+    shutdown_hash_pool()
+    await async_engine.dispose()
+    if async_read_engine is not async_engine:
+        await async_read_engine.dispose()
     logger.info("Application shutting down")
 
 # App creation with lifespan
@@ -100,6 +179,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Mount static files
@@ -109,27 +189,31 @@ except RuntimeError:
     pass  # Directory doesn't exist yet
 
 # Authentication functions
-def verify_password(plain_password, hashed_password):
+async def verify_password(plain_password, hashed_password):
     try:
-        return pwd_context.verify(plain_password, hashed_password)
+        return await verify_in_pool(plain_password, hashed_password)
     except Exception as e:
         logger.error(f"Error verifying password: {e}")
         return False
 
-def get_password_hash(password):
+async def get_password_hash(password):
     try:
-        return pwd_context.hash(password)
+        return await hash_in_pool(password)
     except Exception as e:
         logger.error(f"Error hashing password: {e}")
         raise HTTPException(status_code=500, detail="Error processing password")
 
-def get_user(username: str):
+async def get_user(username: str, use_cache: bool = True):
+    if use_cache:
+        cached = user_cache.get(username)
+        if cached is not None:
+            return cached
     try:
-        with get_db() as db:
-            result = db.execute(text("SELECT * FROM users WHERE username = :username"), {"username": username})
+        async with get_async_db(readonly=True) as db:
+            result = await db.execute(text("SELECT * FROM users WHERE username = :username"), {"username": username})
             user = result.fetchone()
             if user:
-                return {
+                user_record = {
                     "id": user[0],
                     "username": user[1],
                     "email": user[2],
@@ -138,16 +222,51 @@ def get_user(username: str):
                     "role": user[5],
                     "is_active": user[6]
                 }
+                user_cache.set(username, user_record)
+                return user_record
             return None
     except Exception as e:
         logger.error(f"Error getting user: {e}")
         return None
 
-def authenticate_user(username: str, password: str):
-    user = get_user(username)
+async def get_ticket_data_version(user: dict) -> int:
+    """Version of the tickets this user can see; bumped by triggers on every ticket write."""
+    version_key = 0 if user.get("role") == "admin" else user["id"]
+    async with get_async_db(readonly=True) as db:
+        result = await db.execute(
+            text("SELECT version FROM ticket_data_versions WHERE user_id = :user_id"),
+            {"user_id": version_key}
+        )
+        row = result.fetchone()
+        return row[0] if row else 0
+
+def history_digest(history: list) -> str:
+    """Fingerprint of the conversation so far, so a follow-up like "tell me more
+    about the second one" is only answered from cache within the same conversation"""
+    digest = hashlib.sha256()
+    for message in history:
+        content = message.content if isinstance(message.content, str) else json.dumps(message.content, default=str)
+        digest.update(f"{message.type}\0{content}\0".encode())
+    return digest.hexdigest()
+
+async def response_cache_key(user: dict, message: str, history: list):
+    """Cache key for a chat answer given the prior history, or None if the message shouldn't be cached"""
+    normalized = normalize_message(message)
+    if len(normalized) < RESPONSE_CACHE_MIN_CHARS:
+        return None
+    version = await get_ticket_data_version(user)
+    return (normalized, user["id"], user.get("role", "user"), version, history_digest(history))
+
+def invalidate_cached_user(username: str):
+    """Drop a cached user record; call after changing a user's role or active flag."""
+    user_cache.invalidate(username)
+
+async def authenticate_user(username: str, password: str):
+    # Always read fresh on login, which also refreshes the cache
+    user = await get_user(username, use_cache=False)
     if not user:
         return False
-    if not verify_password(password, user['hashed_password']):
+    if not await verify_password(password, user['hashed_password']):
         return False
     return user
 
@@ -175,19 +294,19 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
         token_data = TokenData(username=username)
     except jwt.PyJWTError:
         raise credentials_exception
-    user = get_user(username=token_data.username)
+    user = await get_user(username=token_data.username)
     if user is None:
         raise credentials_exception
     return user
 
-def get_user_from_token(token: str):
+async def get_user_from_token(token: str):
     """Helper to get user from token string"""
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
         if username is None:
             return None
-        return get_user(username=username)
+        return await get_user(username=username)
     except jwt.PyJWTError:
         return None
 
@@ -200,172 +319,37 @@ async def get_current_admin(current_user: dict = Depends(get_current_user)):
     return current_user
 
 # ============================================================================
-# RESPONSE FORMATTER HELPERS
+# CHAT REPLY HELPERS
 # ============================================================================
 
-def format_ticket_details(ticket_data: dict) -> str:
-    """Format a single ticket into nice HTML"""
-    status_colors = {
-        "open": "bg-green-100 text-green-800",
-        "in_progress": "bg-blue-100 text-blue-800",
-        "resolved": "bg-purple-100 text-purple-800",
-        "closed": "bg-gray-100 text-gray-800"
-    }
-    
-    status = ticket_data.get('status', 'unknown')
-    status_class = status_colors.get(status, 'bg-gray-100 text-gray-800')
-    
-    html = f"""
-    <div class="ticket-card bg-white border border-gray-200 rounded-lg p-4 my-2">
-        <div class="flex items-center justify-between mb-3">
-            <h3 class="text-lg font-semibold text-gray-800">Ticket #{ticket_data['id']}</h3>
-            <span class="inline-block px-3 py-1 text-xs font-medium rounded-full {status_class}">
-                {status.upper().replace('_', ' ')}
-            </span>
-        </div>
-        
-        <div class="space-y-2 text-sm">
-            <div>
-                <span class="font-medium text-gray-600">Query:</span>
-                <p class="text-gray-800 mt-1">{ticket_data['query']}</p>
-            </div>
-    """
-    
-    if ticket_data.get('llm_response'):
-        html += f"""
-            <div class="mt-3 p-3 bg-blue-50 rounded">
-                <span class="font-medium text-blue-800">AI Response:</span>
-                <p class="text-gray-700 mt-1">{ticket_data['llm_response']}</p>
-            </div>
-        """
-    
-    if ticket_data.get('final_response'):
-        html += f"""
-            <div class="mt-3 p-3 bg-green-50 rounded">
-                <span class="font-medium text-green-800">Final Response:</span>
-                <p class="text-gray-700 mt-1">{ticket_data['final_response']}</p>
-            </div>
-        """
-    
-    if ticket_data.get('responded_by') and ticket_data['responded_by'] != 'none':
-        html += f"""
-            <div class="text-xs text-gray-500 mt-2">
-                <span class="font-medium">Handled by:</span> {ticket_data['responded_by'].upper()}
-            </div>
-        """
-    
-    if ticket_data.get('is_resolved'):
-        html += f"""
-            <div class="mt-2 p-2 bg-green-50 border border-green-200 rounded text-xs text-green-800">
-                âœ“ This ticket has been resolved
-            </div>
-        """
-    
-    if ticket_data.get('user_satisfied') is not None:
-        satisfaction = "ðŸ˜Š Satisfied" if ticket_data['user_satisfied'] else "ðŸ˜ž Not Satisfied"
-        html += f"""
-            <div class="text-xs text-gray-600 mt-2">
-                <span class="font-medium">User Feedback:</span> {satisfaction}
-            </div>
-        """
-    
-    html += f"""
-            <div class="text-xs text-gray-400 mt-3 flex justify-between">
-                <span>Created: {ticket_data.get('created_at', 'N/A')}</span>
-                <span>Updated: {ticket_data.get('updated_at', 'N/A')}</span>
-            </div>
-        </div>
-    </div>
-    """
-    
-    return html
-
+def collect_tool_artifacts(messages: list) -> list:
+    """HTML the tools attached for the user, in call order"""
+    artifacts = []
+    for message in messages:
+        if isinstance(message, ToolMessage) and isinstance(message.artifact, dict):
+            html = (message.artifact.get("structured_content") or {}).get("html")
+            if html:
+                artifacts.append(html)
+    return artifacts
+
+def with_artifacts(message: AIMessage, artifacts: list) -> AIMessage:
+    """Attach artifacts to a reply; additional_kwargs isn't sent back to the model"""
+    if not artifacts:
+        return message
+    return message.model_copy(update={
+        "additional_kwargs": {**message.additional_kwargs, "artifacts": artifacts}
+    })
 
-def format_ticket_list(tickets: list, title: str = "Your Tickets") -> str:
-    """Format a list of tickets into nice HTML"""
-    if not tickets:
-        return f"<p class='text-gray-600'>ðŸ“­ No tickets found matching your criteria.</p>"
-    
-    status_colors = {
-        "open": "bg-green-100 text-green-800",
-        "in_progress": "bg-blue-100 text-blue-800",
-        "resolved": "bg-purple-100 text-purple-800",
-        "closed": "bg-gray-100 text-gray-800"
+def chat_reply_context(message: AIMessage) -> dict:
+    """Template context for an assistant reply: its text, then any tool artifacts"""
+    response_text = message.content if isinstance(message.content, str) else ""
+    return {
+        "message": response_text,
+        # Check if response contains HTML
+        "is_html": any(tag in response_text for tag in ['<div', '<span', '<ul', '<li', '<p class']),
+        "is_system": True,
+        "artifacts": message.additional_kwargs.get("artifacts", [])
     }
-    
-    count = len(tickets)
-    html = f"""
-    <div class="mb-4">
-        <h3 class="text-lg font-semibold text-gray-800 mb-3">{title} ({count} ticket{'s' if count != 1 else ''})</h3>
-        <div class="space-y-2">
-    """
-    
-    for ticket in tickets:
-        status = ticket.get('status', 'unknown')
-        status_class = status_colors.get(status, 'bg-gray-100 text-gray-800')
-        query_preview = ticket['query'][:80] + ('...' if len(ticket['query']) > 80 else '')
-        
-        resolved_badge = ""
-        if ticket.get('is_resolved'):
-            resolved_badge = '<span class="ml-2 text-xs text-green-600">âœ“ Resolved</span>'
-        
-        html += f"""
-        <div class="ticket-card bg-white border border-gray-200 rounded-lg p-3 hover:border-indigo-300 transition">
-            <div class="flex items-center justify-between mb-1">
-                <span class="font-semibold text-gray-800">Ticket #{ticket['id']}</span>
-                <div class="flex items-center gap-2">
-                    <span class="inline-block px-2 py-0.5 text-xs font-medium rounded {status_class}">
-                        {status.upper().replace('_', ' ')}
-                    </span>
-                    {resolved_badge}
-                </div>
-            </div>
-            <p class="text-sm text-gray-600 mb-1">{query_preview}</p>
-            <div class="flex justify-between items-center text-xs text-gray-400">
-                <span>Created: {ticket.get('created_at', 'N/A')}</span>
-            </div>
-        </div>
-        """
-    
-    html += """
-        </div>
-    </div>
-    """
-    
-    return html
-
-
-def format_success_message(message_text: str) -> str:
-    """Format success messages nicely"""
-    return f"""
-    <div class="bg-green-50 border border-green-200 rounded-lg p-4 my-2">
-        <div class="flex items-start">
-            <svg class="w-5 h-5 text-green-600 mt-0.5 mr-2 flex-shrink-0" fill="none" stroke="currentColor" viewBox="0 0 24 24">
-                <path stroke-linecap="round" stroke-linejoin="round" stroke-width="2" d="M9 12l2 2 4-4m6 2a9 9 0 11-18 0 9 9 0 0118 0z"></path>
-            </svg>
-            <div>
-                <p class="text-sm text-green-800">{message_text}</p>
-            </div>
-        </div>
-    </div>
-    """
-
-
-def format_error_message(error_text: str) -> str:
-    """Format error messages nicely"""
-    return f"""
-    <div class="bg-red-50 border border-red-200 rounded-lg p-4 my-2">
-        <div class="flex items-start">
-            <svg class="w-5 h-5 text-red-600 mt-0.5 mr-2 flex-shrink-0" fill="none" stroke="currentColor" viewBox="0 0 24 24">
-                <path stroke-linecap="round" stroke-linejoin="round" stroke-width="2" d="M12 8v4m0 4h.01M21 12a9 9 0 11-18 0 9 9 0 0118 0z"></path>
-            </svg>
-            <div>
-                <h4 class="text-sm font-medium text-red-800">Error</h4>
-                <p class="text-sm text-red-700 mt-1">{error_text}</p>
-            </div>
-        </div>
-    </div>
-    """
 
 # ============ FRONTEND ROUTES ============
 
@@ -396,23 +380,8 @@ async def dashboard_page(request: Request):
 # HTMX CHAT ENDPOINTS WITH LLM INTEGRATION
 # ============================================================================
 
-@app.post("/htmx/chat/init")
-async def chat_init(request: Request):
-    """Initialize chat with welcome message and create new session"""
-    auth_header = request.headers.get("Authorization")
-    if not auth_header or not auth_header.startswith("Bearer "):
-        return HTMLResponse("<div class='text-red-500'>Unauthorized</div>", status_code=401)
-    
-    token = auth_header.replace("Bearer ", "")
-    user = get_user_from_token(token)
-    
-    if not user:
-        return HTMLResponse("<div class='text-red-500'>Unauthorized</div>", status_code=401)
-    
-    # Create new chat session for this user
-    session_id = f"user_{user['id']}"
-    
-    # Initialize with system message
+def new_chat_session(user: dict) -> list:
+    """Fresh chat history for a user: just the system prompt."""
     system_prompt = f"""You are a helpful support assistant for HelpHub ticket management system.
 
 Current user information:
@@ -429,24 +398,45 @@ You can help users with their support tickets:
 When users ask about tickets:
 - Use the get_ticket tool for specific ticket IDs
 - Use the get_tickets tool to list multiple tickets with filters
+- Use search_tickets to find tickets by topic or wording (e.g. "my ticket about VPN")
+- When a user describes a new problem, use find_similar_tickets to check for a known resolution first
 - Use create_ticket to create new tickets
 - Use update_ticket to modify ticket information
 
 Important guidelines:
 - Be conversational and friendly
-- Format responses clearly using the HTML tools provide
+- Tools return compact text/JSON; present the results clearly (simple HTML lists are fine)
+- When a tool result says it is shown to the user as cards, don't repeat it; add a short comment instead
 - If a user mentions a ticket number, fetch its details
 - If they ask about status, filter tickets accordingly
 - Always acknowledge what you've done and offer to help further
 
 Remember: Regular users can only see their own tickets. Admins can see all tickets."""
+    return [SystemMessage(content=system_prompt)]
+
 
-    chat_sessions[session_id] = [SystemMessage(content=system_prompt)]
+@app.post("/htmx/chat/init")
+async def chat_init(request: Request):
+    """Initialize chat with welcome message and create new session"""
+    auth_header = request.headers.get("Authorization")
+    if not auth_header or not auth_header.startswith("Bearer "):
+        return HTMLResponse("<div class='text-red-500'>Unauthorized</div>", status_code=401)
+    
+    token = auth_header.replace("Bearer ", "")
+    user = await get_user_from_token(token)
+    
+    if not user:
+        return HTMLResponse("<div class='text-red-500'>Unauthorized</div>", status_code=401)
+    
+    # Create new chat session for this user
+    session_id = f"user_{user['id']}"
+    
+    chat_sessions[session_id] = new_chat_session(user)
     
     # Get initial ticket count
     try:
-        with get_db() as db:
-            result = db.execute(text("""
+        async with get_async_db(readonly=True) as db:
+            result = await db.execute(text("""
                 SELECT COUNT(*) FROM tickets 
                 WHERE user_id = :user_id
             """), {"user_id": user["id"]})
@@ -484,7 +474,7 @@ async def chat_send(request: Request, message: str = Form(...)):
         return HTMLResponse("<div class='text-red-500'>Unauthorized</div>", status_code=401)
     
     token = auth_header.replace("Bearer ", "")
-    user = get_user_from_token(token)
+    user = await get_user_from_token(token)
     
     if not user:
         return HTMLResponse("<div class='text-red-500'>Unauthorized</div>", status_code=401)
@@ -492,26 +482,31 @@ async def chat_send(request: Request, message: str = Form(...)):
     message = message.strip()
     session_id = f"user_{user['id']}"
     
-    # Initialize session if doesn't exist
-#     if session_id not in chat_sessions:
-#         system_prompt = f"""You are a helpful support assistant for HelpHub.
-# Current user: {user['username']} (ID: {user['id']}, Role: {user.get('role', 'user')})"""
-#         chat_sessions[session_id] = [SystemMessage(content=system_prompt)]
-    if session_id not in chat_sessions:
-        return HTMLResponse(
-        "<div class='text-red-500'>Session not initialized. Refresh the page.</div>",
-        status_code=400
-        )
-
-    try:
-        # Get current chat history
-        chat_history = chat_sessions[session_id]
+    async def run_turn():
+        # Read the history inside the session lock so concurrent turns don't drop each other.
+        # A session the store evicted while idle starts over from the system prompt
+        chat_history = chat_sessions.get(session_id) or new_chat_session(user)
         
         # Add user message
         msgs = chat_history + [HumanMessage(content=message)]
         
+        # Simple commands are answered by calling the tool directly
+        routed_html = await intent_router.route(message, user) if INTENT_ROUTER_ENABLED else None
+        if routed_html is not None:
+            reply = AIMessage(content=routed_html)
+            chat_sessions[session_id] = msgs + [reply]
+            return reply
+        
+        # Repeat intents are answered from the cache without touching the LLM
+        cache_key = await response_cache_key(user, message, chat_history)
+        cached = response_cache.get(cache_key) if cache_key else None
+        if cached is not None:
+            chat_sessions[session_id] = msgs + [cached]
+            return cached
+        
         # Call your LLM with tools (from mcp_cliento.py)
         # Pass user context
+        chat_turns.agent_runs += 1
         updated_history = await tool_llm(
             msgs
         )
@@ -522,17 +517,25 @@ async def chat_send(request: Request, message: str = Form(...)):
         # Get the last AI message
         last_message = updated_history[-1]
         
+        # Only cache turns that didn't change ticket data themselves
+        if cache_key and isinstance(last_message, AIMessage) and (last_message.content or last_message.additional_kwargs.get("artifacts")):
+            if await response_cache_key(user, message, chat_history) == cache_key:
+                response_cache.set(cache_key, last_message)
+        
+        return last_message
+
+    try:
+        last_message = await chat_turns.run(
+            session_id,
+            message,
+            run_turn,
+            idempotency_key=request.headers.get("Idempotency-Key")
+        )
+        
         if isinstance(last_message, AIMessage):
-            response_text = last_message.content
-            
-            # Check if response contains HTML
-            is_html = any(tag in response_text for tag in ['<div', '<span', '<ul', '<li', '<p class'])
-            
             return templates.TemplateResponse("partials/chat_message.html", {
                 "request": request,
-                "message": response_text,
-                "is_system": True,
-                "is_html": is_html
+                **chat_reply_context(last_message)
             })
         else:
             return templates.TemplateResponse("partials/chat_message.html", {
@@ -552,6 +555,130 @@ async def chat_send(request: Request, message: str = Form(...)):
         })
 
 
+def sse_event(event: str, data: dict) -> str:
+    """Format one Server-Sent Events frame"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.post("/htmx/chat/stream")
+async def chat_stream(request: Request, message: str = Form(...)):
+    """Handle chat messages like /htmx/chat/send, streaming tokens and tool progress over SSE"""
+    auth_header = request.headers.get("Authorization")
+    if not auth_header or not auth_header.startswith("Bearer "):
+        return HTMLResponse("<div class='text-red-500'>Unauthorized</div>", status_code=401)
+    
+    token = auth_header.replace("Bearer ", "")
+    user = await get_user_from_token(token)
+    
+    if not user:
+        return HTMLResponse("<div class='text-red-500'>Unauthorized</div>", status_code=401)
+    
+    message = message.strip()
+    session_id = f"user_{user['id']}"
+    
+    chat_message = templates.get_template("partials/chat_message.html")
+
+    async def run_turn():
+        final_message = None
+        # As in /htmx/chat/send, an evicted session starts over from the system prompt
+        history = chat_sessions.get(session_id) or new_chat_session(user)
+        msgs = history + [HumanMessage(content=message)]
+
+        # Routed commands and cached answers skip the agent and go straight to "done"
+        routed_html = await intent_router.route(message, user) if INTENT_ROUTER_ENABLED else None
+        cache_key = None if routed_html is not None else await response_cache_key(user, message, history)
+        cached = response_cache.get(cache_key) if cache_key else None
+        if routed_html is not None:
+            final_message = AIMessage(content=routed_html)
+        elif cached is not None:
+            final_message = cached
+        else:
+            tool_outputs = []
+            state = {"messages": history_policy.apply(msgs)}
+            chat_turns.agent_runs += 1
+            async for event in agent_instance.astream_events(state, version="v2"):
+                kind = event["event"]
+                if kind == "on_chat_model_stream":
+                    chunk = event["data"]["chunk"]
+                    if isinstance(chunk.content, str) and chunk.content:
+                        progress.put_nowait(sse_event("token", {"text": chunk.content}))
+                elif kind == "on_chat_model_end":
+                    output = event["data"]["output"]
+                    if isinstance(output, AIMessage) and not output.tool_calls:
+                        final_message = output
+                elif kind == "on_tool_start":
+                    progress.put_nowait(sse_event("tool_start", {"name": event["name"]}))
+                elif kind == "on_tool_end":
+                    tool_outputs.append(event["data"].get("output"))
+                    progress.put_nowait(sse_event("tool_end", {"name": event["name"]}))
+
+            if final_message is not None:
+                final_message = with_artifacts(final_message, collect_tool_artifacts(tool_outputs))
+
+            if cache_key and final_message is not None and (final_message.content or final_message.additional_kwargs.get("artifacts")):
+                if await response_cache_key(user, message, history) == cache_key:
+                    response_cache.set(cache_key, final_message)
+
+        if final_message is not None:
+            # Persist the finished turn, same shape as /htmx/chat/send
+            chat_sessions[session_id] = msgs + [final_message]
+        return final_message
+
+    # Frames of the run this request started; a duplicate submit that joins
+    # another request's run gets no tokens, only the shared final "done"
+    progress = asyncio.Queue()
+
+    def turn_finished(task):
+        # Marks a failure retrieved even if the client has gone away
+        if not task.cancelled():
+            task.exception()
+        progress.put_nowait(None)
+
+    async def event_stream():
+        # Flush headers right away so the browser can show progress
+        yield sse_event("start", {})
+        try:
+            # Same serialization, coalescing and Idempotency-Key handling as
+            # /htmx/chat/send; the run outlives a dropped connection so
+            # requests that joined it still get the answer
+            turn = asyncio.create_task(chat_turns.run(
+                session_id,
+                message,
+                run_turn,
+                idempotency_key=request.headers.get("Idempotency-Key")
+            ))
+            turn.add_done_callback(turn_finished)
+            while True:
+                frame = await progress.get()
+                if frame is None:
+                    break
+                yield frame
+            final_message = turn.result()
+
+            if final_message is None:
+                html = chat_message.render({
+                    "message": "I encountered an issue processing your request. Please try again.",
+                    "is_system": True
+                })
+                yield sse_event("done", {"html": html})
+                return
+
+            html = chat_message.render(chat_reply_context(final_message))
+            yield sse_event("done", {"html": html})
+
+        except Exception as e:
+            logger.error(f"Error in chat stream: {e}", exc_info=True)
+            error_html = format_error_message(f"An error occurred while processing your message: {str(e)}")
+            html = chat_message.render({"message": error_html, "is_system": True, "is_html": True})
+            yield sse_event("error", {"html": html})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @app.post("/htmx/chat/clear")
 async def chat_clear(request: Request):
     """Clear chat session"""
@@ -560,7 +687,7 @@ async def chat_clear(request: Request):
         return HTMLResponse("<div class='text-red-500'>Unauthorized</div>", status_code=401)
     
     token = auth_header.replace("Bearer ", "")
-    user = get_user_from_token(token)
+    user = await get_user_from_token(token)
     
     if not user:
         return HTMLResponse("<div class='text-red-500'>Unauthorized</div>", status_code=401)
@@ -578,22 +705,26 @@ async def chat_clear(request: Request):
 @app.post("/api/auth/register", response_model=User)
 async def register(user: UserCreate):
     try:
-        with get_db() as db:
-            result = db.execute(
+        async with get_async_db(readonly=True) as db:
+            result = await db.execute(
                 text("SELECT username FROM users WHERE username = :username OR email = :email"),
                 {"username": user.username, "email": user.email}
             )
-            
-            if result.fetchone():
-                raise HTTPException(
-                    status_code=400,
-                    detail="Username or email already registered"
-                )
-            
-            role = "user" if user.role != "admin" else "user"
-            
-            hashed_password = get_password_hash(user.password)
-            db.execute(text("""
+            existing = result.fetchone()
+
+        if existing:
+            raise HTTPException(
+                status_code=400,
+                detail="Username or email already registered"
+            )
+
+        role = "user" if user.role != "admin" else "user"
+
+        # Hash before taking the writer session; the write pool has a single
+        # connection and every ticket write would queue behind the hash
+        hashed_password = await get_password_hash(user.password)
+        async with get_async_db() as db:
+            await db.execute(text("""
                 INSERT INTO users (username, email, full_name, hashed_password, role)
                 VALUES (:username, :email, :full_name, :hashed_password, :role)
             """), {
@@ -603,25 +734,32 @@ async def register(user: UserCreate):
                 "hashed_password": hashed_password,
                 "role": role
             })
-            db.commit()
-
-            return User(
-                username=user.username,
-                email=user.email,
-                full_name=user.full_name,
-                is_active=True,
-                role=role
-            )
-        
+            await db.commit()
+        invalidate_cached_user(user.username)
+
+        return User(
+            username=user.username,
+            email=user.email,
+            full_name=user.full_name,
+            is_active=True,
+            role=role
+        )
+
     except HTTPException:
         raise
+    except IntegrityError:
+        # Lost a race with a concurrent registration of the same name or email
+        raise HTTPException(
+            status_code=400,
+            detail="Username or email already registered"
+        )
     except Exception as e:
         logger.error(f"Error registering user: {e}")
         raise HTTPException(status_code=500, detail="Internal server error during user registration")
 
 @app.post("/api/auth/login", response_model=Token)
 async def login(user: UserLogin):
-    authenticated_user = authenticate_user(user.username, user.password)
+    authenticated_user = await authenticate_user(user.username, user.password)
     if not authenticated_user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -644,35 +782,42 @@ async def read_users_me(current_user: dict = Depends(get_current_user)):
         role=current_user.get("role", "user")
     )
 
+async def group_duplicate_tickets(db, rows) -> Tuple[Dict[int, int], list]:
+    """Group freshly inserted tickets with near-duplicates from the last day.
+
+    Runs inside the inserting transaction, after catch_up_duplicate_index()
+    ran outside it; returns ({ticket_id: group_id} for the tickets whose
+    group was set, index entries) to hand to duplicate_index.apply() after
+    the commit. Skipped while the index is still cold.
+    """
+    if not duplicate_index.ready():
+        return {}, []
+    groups, entries = duplicate_index.assign([(row["id"], row["query"], row["created_at"]) for row in rows])
+    if groups:
+        await db.execute(text(SET_DUPLICATE_GROUP_QUERY), duplicate_index.update_params(groups))
+    return groups, entries
+
 @app.post("/api/tickets", response_model=TicketResponse, status_code=status.HTTP_201_CREATED)
 async def create_ticket(ticket: TicketCreate, current_user: dict = Depends(get_current_user)):
     try:
-        with get_db() as db:
-            db.execute(text("""
+        await catch_up_duplicate_index()
+        async with get_async_db() as db:
+            result = await db.execute(text(f"""
                 INSERT INTO tickets (user_id, query, status, responded_by)
                 VALUES (:user_id, :query, :status, :responded_by)
+                RETURNING {TICKET_RETURNING_COLUMNS}
             """), {
                 "user_id": current_user["id"],
                 "query": ticket.query,
                 "status": TicketStatus.OPEN.value,
                 "responded_by": RespondedBy.NONE.value
             })
-            db.commit()
-            
-            result = db.execute(text("""
-                SELECT 
-                    t.id, t.user_id, u.username, 
-                    t.query, t.status, t.llm_response, t.final_response, 
-                    t.responded_by, t.is_resolved, t.user_satisfied, 
-                    t.created_at, t.updated_at
-                FROM tickets t
-                JOIN users u ON t.user_id = u.id
-                WHERE t.user_id = :user_id
-                ORDER BY t.created_at DESC
-                LIMIT 1
-            """), {"user_id": current_user["id"]})
-
             row = result.mappings().fetchone()
+            groups, entries = await group_duplicate_tickets(db, [row])
+            await db.commit()
+            duplicate_index.apply(groups, entries)
+            ticket_event_bus.publish("created", [row])
+
             return TicketResponse(
                 id=row["id"],
                 user_id=row["user_id"],
@@ -685,31 +830,79 @@ async def create_ticket(ticket: TicketCreate, current_user: dict = Depends(get_c
                 is_resolved=row["is_resolved"],
                 user_satisfied=row["user_satisfied"],
                 created_at=row["created_at"],
-                updated_at=row["updated_at"]
+                updated_at=row["updated_at"],
+                duplicate_group_id=groups.get(row["id"])
             )
 
     except Exception as e:
         logger.error(f"Error creating ticket: {e}")
         raise HTTPException(status_code=500, detail="Error creating ticket")
 
+@app.post("/api/tickets/bulk", response_model=List[TicketResponse], status_code=status.HTTP_201_CREATED)
+async def create_tickets_bulk(bulk: TicketBulkCreate, current_user: dict = Depends(get_current_user)):
+    """Create many tickets for the current user in a single transaction"""
+    try:
+        await catch_up_duplicate_index()
+        async with get_async_db() as db:
+            rows = []
+            for sql, params in build_bulk_ticket_inserts(current_user["id"], [t.query for t in bulk.tickets]):
+                result = await db.execute(text(sql), params)
+                rows.extend(result.mappings().fetchall())
+            groups, entries = await group_duplicate_tickets(db, rows)
+            await db.commit()
+            duplicate_index.apply(groups, entries)
+            ticket_event_bus.publish("created", rows)
+
+            return [
+                TicketResponse(
+                    id=row["id"],
+                    user_id=row["user_id"],
+                    username=row["username"],
+                    query=row["query"],
+                    status=row["status"],
+                    llm_response=row["llm_response"],
+                    final_response=row["final_response"],
+                    responded_by=row["responded_by"],
+                    is_resolved=row["is_resolved"],
+                    user_satisfied=row["user_satisfied"],
+                    created_at=row["created_at"],
+                    updated_at=row["updated_at"],
+                    duplicate_group_id=groups.get(row["id"])
+                )
+                for row in sorted(rows, key=lambda r: r["id"])
+            ]
+
+    except Exception as e:
+        logger.error(f"Error bulk creating tickets: {e}")
+        raise HTTPException(status_code=500, detail="Error creating tickets")
+
 @app.get("/api/tickets", response_model=List[TicketResponse])
 async def get_tickets(
+    response: Response,
     current_user: dict = Depends(get_current_user),
     user_id: Optional[int] = Query(None),
     status: Optional[TicketStatus] = Query(None),
     is_resolved: Optional[bool] = Query(None),
     responded_by: Optional[RespondedBy] = Query(None),
     limit: int = Query(100, ge=1, le=500),
-    offset: int = Query(0, ge=0)
+    offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="Opaque keyset cursor from X-Next-Cursor; overrides offset")
 ):
+    cursor_position = None
+    if cursor:
+        try:
+            cursor_position = decode_ticket_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
     try:
-        with get_db() as db:
+        async with get_async_db(readonly=True) as db:
             query = """
                 SELECT 
                     t.id, t.user_id, u.username, 
                     t.query, t.status, t.llm_response, t.final_response, 
                     t.responded_by, t.is_resolved, t.user_satisfied, 
-                    t.created_at, t.updated_at
+                    t.created_at, t.updated_at, t.duplicate_group_id
                 FROM tickets t
                 JOIN users u ON t.user_id = u.id
                 WHERE 1=1
@@ -736,13 +929,23 @@ async def get_tickets(
                 query += " AND t.responded_by = :responded_by"
                 params["responded_by"] = responded_by.value
             
-            query += " ORDER BY t.created_at DESC LIMIT :limit OFFSET :offset"
+            if cursor_position is not None:
+                # Keyset mode: seek past the last row instead of skipping `offset` rows
+                query += " AND (t.created_at, t.id) < (:cursor_created_at, :cursor_id)"
+                params["cursor_created_at"], params["cursor_id"] = cursor_position
+                offset = 0
+            
+            query += " ORDER BY t.created_at DESC, t.id DESC LIMIT :limit OFFSET :offset"
             params["limit"] = limit
             params["offset"] = offset
             
-            result = db.execute(text(query), params)
+            result = await db.execute(text(query), params)
             tickets = result.mappings().fetchall()
             
+            if len(tickets) == limit:
+                last = tickets[-1]
+                response.headers["X-Next-Cursor"] = encode_ticket_cursor(last["created_at"], last["id"])
+            
             return [
                 TicketResponse(
                     id=row["id"],
@@ -756,7 +959,8 @@ async def get_tickets(
                     is_resolved=row["is_resolved"],
                     user_satisfied=row["user_satisfied"],
                     created_at=row["created_at"],
-                    updated_at=row["updated_at"]
+                    updated_at=row["updated_at"],
+                    duplicate_group_id=row["duplicate_group_id"]
                 )
                 for row in tickets
             ]
@@ -764,16 +968,102 @@ async def get_tickets(
         logger.error(f"Error fetching tickets: {e}")
         raise HTTPException(status_code=500, detail="Error fetching tickets")
 
+# Declared before /api/tickets/{ticket_id} so "events", "search" and "similar" aren't taken for ids
+@app.get("/api/tickets/events")
+async def stream_ticket_events(current_user: dict = Depends(get_current_user)):
+    """Server-Sent Events feed of ticket creates and updates the current user may see"""
+    subscription = ticket_event_bus.subscribe(current_user["id"], current_user["role"])
+
+    async def event_stream():
+        try:
+            # Flush headers right away so the client knows the feed is live
+            yield sse_event("ready", {})
+            while True:
+                try:
+                    event, data = await asyncio.wait_for(subscription.get(), TICKET_EVENT_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield sse_event(event, data)
+        finally:
+            ticket_event_bus.unsubscribe(subscription)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/api/tickets/search", response_model=List[TicketSearchResult])
+async def search_tickets(
+    current_user: dict = Depends(get_current_user),
+    q: str = Query(..., min_length=1, max_length=500),
+    user_id: Optional[int] = Query(None),
+    limit: int = Query(20, ge=1, le=100)
+):
+    """Full-text search over ticket queries and responses, best matches first"""
+    match = build_fts_match(q)
+    if match is None:
+        raise HTTPException(status_code=400, detail="Search must contain at least one word")
+
+    try:
+        async with get_async_db(readonly=True) as db:
+            sql, params = build_ticket_search(
+                match, current_user["id"], current_user["role"], user_id=user_id, limit=limit
+            )
+            result = await db.execute(text(sql), params)
+            return [
+                TicketSearchResult(
+                    id=row["id"],
+                    user_id=row["user_id"],
+                    username=row["username"],
+                    query=row["query"],
+                    status=row["status"],
+                    llm_response=row["llm_response"],
+                    final_response=row["final_response"],
+                    responded_by=row["responded_by"],
+                    is_resolved=row["is_resolved"],
+                    user_satisfied=row["user_satisfied"],
+                    created_at=row["created_at"],
+                    updated_at=row["updated_at"],
+                    duplicate_group_id=row["duplicate_group_id"],
+                    snippet=build_search_snippet(
+                        [row["query"], row["llm_response"], row["final_response"]], q
+                    ),
+                    rank=row["rank"]
+                )
+                for row in result.mappings().fetchall()
+            ]
+    except Exception as e:
+        logger.error(f"Error searching tickets: {e}")
+        raise HTTPException(status_code=500, detail="Error searching tickets")
+
+@app.get("/api/tickets/similar", response_model=List[SimilarTicket])
+async def get_similar_tickets(
+    current_user: dict = Depends(get_current_user),
+    q: str = Query(..., min_length=1, max_length=2000),
+    k: int = Query(5, ge=1, le=50),
+    min_score: float = Query(SIMILARITY_MIN_SCORE, ge=0.0, le=1.0)
+):
+    """Resolved tickets most similar to a problem description, with their resolutions"""
+    try:
+        return await asyncio.to_thread(
+            lookup_similar_tickets, q, current_user["id"], current_user["role"], k, min_score
+        )
+    except Exception as e:
+        logger.error(f"Error finding similar tickets: {e}")
+        raise HTTPException(status_code=500, detail="Error finding similar tickets")
+
 @app.get("/api/tickets/{ticket_id}", response_model=TicketResponse)
 async def get_ticket(ticket_id: int, current_user: dict = Depends(get_current_user)):
     try:
-        with get_db() as db:
-            result = db.execute(text("""
+        async with get_async_db(readonly=True) as db:
+            result = await db.execute(text("""
                 SELECT 
                     t.id, t.user_id, u.username, 
                     t.query, t.status, t.llm_response, t.final_response, 
                     t.responded_by, t.is_resolved, t.user_satisfied, 
-                    t.created_at, t.updated_at
+                    t.created_at, t.updated_at, t.duplicate_group_id
                 FROM tickets t
                 JOIN users u ON t.user_id = u.id
                 WHERE t.id = :ticket_id
@@ -799,7 +1089,8 @@ async def get_ticket(ticket_id: int, current_user: dict = Depends(get_current_us
                 is_resolved=row["is_resolved"],
                 user_satisfied=row["user_satisfied"],
                 created_at=row["created_at"],
-                updated_at=row["updated_at"]
+                updated_at=row["updated_at"],
+                duplicate_group_id=row["duplicate_group_id"]
             )
     except Exception as e:
         logger.error(f"Error fetching ticket: {e}")
@@ -812,8 +1103,8 @@ async def update_ticket(
     current_user: dict = Depends(get_current_user)
 ):
     try:
-        with get_db() as db:
-            result = db.execute(text("SELECT user_id FROM tickets WHERE id = :ticket_id"), {"ticket_id": ticket_id})
+        async with get_async_db() as db:
+            result = await db.execute(text("SELECT user_id FROM tickets WHERE id = :ticket_id"), {"ticket_id": ticket_id})
             ticket = result.fetchone()
             
             if not ticket:
@@ -862,21 +1153,22 @@ async def update_ticket(
             update_fields.append("updated_at = CURRENT_TIMESTAMP")
             
             update_query = f"UPDATE tickets SET {', '.join(update_fields)} WHERE id = :ticket_id"
-            db.execute(text(update_query), params)
-            db.commit()
+            await db.execute(text(update_query), params)
+            await db.commit()
             
-            result = db.execute(text("""
+            result = await db.execute(text("""
                 SELECT 
                     t.id, t.user_id, u.username, 
                     t.query, t.status, t.llm_response, t.final_response, 
                     t.responded_by, t.is_resolved, t.user_satisfied, 
-                    t.created_at, t.updated_at
+                    t.created_at, t.updated_at, t.duplicate_group_id
                 FROM tickets t
                 JOIN users u ON t.user_id = u.id
                 WHERE t.id = :ticket_id
             """), {"ticket_id": ticket_id})
             
             row = result.mappings().fetchone()
+            ticket_event_bus.publish("updated", [row])
             
             return TicketResponse(
                 id=row["id"],
@@ -890,7 +1182,8 @@ async def update_ticket(
                 is_resolved=row["is_resolved"],
                 user_satisfied=row["user_satisfied"],
                 created_at=row["created_at"],
-                updated_at=row["updated_at"]
+                updated_at=row["updated_at"],
+                duplicate_group_id=row["duplicate_group_id"]
             )
     except HTTPException:
         raise
@@ -901,51 +1194,119 @@ async def update_ticket(
 @app.get("/api/admin/stats")
 async def get_admin_stats(current_admin: dict = Depends(get_current_admin)):
     try:
-        with get_db() as db:
-            stats = {}
-            
-            result = db.execute(text("SELECT COUNT(*) FROM tickets"))
-            stats["total_tickets"] = result.fetchone()[0]
-            
-            result = db.execute(text("""
-                SELECT status, COUNT(*) as count 
-                FROM tickets 
-                GROUP BY status
-            """))
-            stats["tickets_by_status"] = {row[0]: row[1] for row in result.fetchall()}
-            
-            result = db.execute(text("SELECT COUNT(*) FROM tickets WHERE is_resolved = 1"))
-            stats["resolved_tickets"] = result.fetchone()[0]
-            
-            result = db.execute(text("""
-                SELECT 
-                    COUNT(CASE WHEN user_satisfied = 1 THEN 1 END) as satisfied,
-                    COUNT(CASE WHEN user_satisfied = 0 THEN 1 END) as unsatisfied,
-                    COUNT(CASE WHEN user_satisfied IS NULL THEN 1 END) as no_response
-                FROM tickets
-            """))
-            satisfaction = result.fetchone()
-            stats["user_satisfaction"] = {
-                "satisfied": satisfaction[0],
-                "unsatisfied": satisfaction[1],
-                "no_response": satisfaction[2]
-            }
-            
-            result = db.execute(text("""
-                SELECT responded_by, COUNT(*) as count 
-                FROM tickets 
-                GROUP BY responded_by
-            """))
-            stats["response_types"] = {row[0]: row[1] for row in result.fetchall()}
-            
-            result = db.execute(text("SELECT COUNT(*) FROM users"))
-            stats["total_users"] = result.fetchone()[0]
-            
-            return stats
+        async with get_async_db(readonly=True) as db:
+            # Trigger-maintained counters; see ticket_stats.py to rebuild them
+            result = await db.execute(text(COUNTERS_QUERY))
+            return build_stats(result.fetchall())
     except Exception as e:
         logger.error(f"Error fetching admin stats: {e}")
         raise HTTPException(status_code=500, detail="Error fetching statistics")
 
+@app.get("/api/admin/analytics")
+async def get_admin_analytics(
+    current_admin: dict = Depends(get_current_admin),
+    granularity: RollupGranularity = Query(RollupGranularity.DAY),
+    start: Optional[datetime] = Query(None, description="UTC; defaults to 48 hours (hour) or 30 days (day) before end"),
+    end: Optional[datetime] = Query(None, description="UTC, exclusive; defaults to now")
+):
+    """Ticket volume and resolution latency from the hourly/daily rollups"""
+    # Rollup buckets are stored in UTC without an offset
+    if end is None:
+        end = datetime.now(timezone.utc)
+    end = end.astimezone(timezone.utc).replace(tzinfo=None) if end.tzinfo else end
+    if start is None:
+        start = end - DEFAULT_WINDOWS[granularity]
+    start = start.astimezone(timezone.utc).replace(tzinfo=None) if start.tzinfo else start
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+
+    try:
+        async with get_async_db(readonly=True) as db:
+            return await get_ticket_analytics(db, granularity, start, end)
+    except Exception as e:
+        logger.error(f"Error fetching analytics: {e}")
+        raise HTTPException(status_code=500, detail="Error fetching analytics")
+
+@app.get("/api/admin/duplicate-groups")
+async def list_duplicate_groups(
+    current_admin: dict = Depends(get_current_admin),
+    open_only: bool = Query(True, description="Only groups with unresolved tickets"),
+    limit: int = Query(50, ge=1, le=500)
+):
+    """Groups of near-duplicate tickets, most recently active first"""
+    try:
+        async with get_async_db(readonly=True) as db:
+            result = await db.execute(text(f"""
+                SELECT
+                    g.duplicate_group_id AS group_id,
+                    COUNT(*) AS tickets,
+                    SUM(g.is_resolved = 0) AS open_tickets,
+                    MIN(g.created_at) AS first_created_at,
+                    MAX(g.created_at) AS last_created_at,
+                    (SELECT query FROM tickets WHERE id = g.duplicate_group_id) AS query
+                FROM tickets g
+                WHERE g.duplicate_group_id IS NOT NULL
+                GROUP BY g.duplicate_group_id
+                {"HAVING SUM(g.is_resolved = 0) > 0" if open_only else ""}
+                ORDER BY last_created_at DESC
+                LIMIT :limit
+            """), {"limit": limit})
+            return [dict(row) for row in result.mappings().fetchall()]
+    except Exception as e:
+        logger.error(f"Error listing duplicate groups: {e}")
+        raise HTTPException(status_code=500, detail="Error listing duplicate groups")
+
+@app.post("/api/admin/duplicate-groups/{group_id}/resolve")
+async def resolve_duplicate_group(
+    group_id: int,
+    resolution: DuplicateGroupResolve,
+    current_admin: dict = Depends(get_current_admin)
+):
+    """Resolve every open ticket of a duplicate group with one response"""
+    try:
+        async with get_async_db() as db:
+            result = await db.execute(text(f"""
+                UPDATE tickets
+                SET status = :status, is_resolved = 1, final_response = :final_response,
+                    responded_by = :responded_by, updated_at = CURRENT_TIMESTAMP
+                WHERE duplicate_group_id = :group_id AND is_resolved = 0
+                RETURNING {TICKET_RETURNING_COLUMNS}
+            """), {
+                "status": TicketStatus.RESOLVED.value,
+                "final_response": resolution.final_response,
+                "responded_by": resolution.responded_by.value,
+                "group_id": group_id
+            })
+            rows = result.mappings().fetchall()
+            await db.commit()
+            ticket_event_bus.publish("updated", rows)
+            resolved = len(rows)
+    except Exception as e:
+        logger.error(f"Error resolving duplicate group {group_id}: {e}")
+        raise HTTPException(status_code=500, detail="Error resolving duplicate group")
+
+    logger.info(f"Admin {current_admin['username']} resolved {resolved} ticket(s) in duplicate group {group_id}")
+    return {"group_id": group_id, "resolved_tickets": resolved}
+
+@app.get("/api/admin/metrics")
+async def get_admin_metrics(current_admin: dict = Depends(get_current_admin)):
+    """Runtime metrics for the in-process pools and caches"""
+    return {
+        "password_hashing": get_hash_pool_stats(),
+        "user_cache": user_cache.stats(),
+        "chat_sessions": chat_sessions.stats(),
+        "chat_history": history_policy.stats(),
+        "chat_turns": chat_turns.stats(),
+        "response_cache": response_cache.stats(),
+        "intent_router": intent_router.stats(),
+        "mcp_sessions": get_mcp_pool_stats(),
+        "tool_calls": tool_limiter.stats(),
+        "render_cache": get_render_stats(),
+        "similar_tickets": similar_tickets.stats(),
+        "duplicate_tickets": duplicate_index.stats(),
+        "ticket_events": ticket_event_bus.stats()
+    }
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000, reload=True)
     
@@ -1,4 +1,5 @@
-from langchain_mcp_adapters.client import MultiServerMCPClient
+from mcp_pool import MCPSessionPool
+from tool_runner import ToolCallLimiter
 import asyncio
 from langchain_openai import AzureChatOpenAI
 from dotenv import load_dotenv
@@ -6,47 +7,127 @@ from langgraph.graph import StateGraph, START, END
 from langgraph.graph.message import add_messages
 from langgraph.prebuilt import ToolNode, tools_condition
 from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.runnables import RunnableConfig
+from langchain_core.tools import StructuredTool, ToolException
 from typing import TypedDict, List, Annotated
 import os
 load_dotenv()
+
+# How the agent reaches the ticket tools in mcp_srvo.py:
+#   inprocess - call the FastMCP tools directly in this process (default);
+#               their queries go through the async engine, so the loop isn't held
+#   stdio     - spawn the server as a subprocess (`uv run fastmcp run mcp_srvo.py`)
+#   http      - connect to a separately running server at MCP_SERVER_URL
+MCP_TRANSPORT = os.getenv("MCP_TRANSPORT", "inprocess").lower()
+MCP_SERVER_COMMAND = os.getenv("MCP_SERVER_COMMAND", "uv")
+MCP_SERVER_URL = os.getenv("MCP_SERVER_URL", "http://localhost:8001/mcp")
+# Warm sessions kept open to the stdio/http server for the app's lifetime
+MCP_POOL_SIZE = int(os.getenv("MCP_POOL_SIZE", "2"))
+MCP_SERVER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "mcp_srvo.py")
+
 SERVERS = {
-    "Tickets": {
-        "transport": "stdio",
-        "command" : "/Library/Frameworks/Python.framework/Versions/3.10/bin/uv",
-        "args" : [
-            "run",
-            "fastmcp",
-            "run",
-            "/Users/adarshsharma/projects/helphub/mcp_srvo.py"
-        ]
+    "stdio": {
+        "Tickets": {
+            "transport": "stdio",
+            "command": MCP_SERVER_COMMAND,
+            "args": ["run", "fastmcp", "run", MCP_SERVER_PATH]
+        }
+    },
+    "http": {
+        "Tickets": {
+            "transport": "streamable_http",
+            "url": MCP_SERVER_URL
+        }
     }
 }
 
+mcp_pool = None
+
+# Tool calls from one agent step run concurrently, up to this many at a time
+TOOL_MAX_CONCURRENCY = int(os.getenv("TOOL_MAX_CONCURRENCY", "4"))
+TOOL_TIMEOUT_SECONDS = float(os.getenv("TOOL_TIMEOUT_SECONDS", "30"))
+tool_limiter = ToolCallLimiter(max_concurrency=TOOL_MAX_CONCURRENCY, timeout=TOOL_TIMEOUT_SECONDS)
+
+
+def _to_langchain_tool(tool) -> StructuredTool:
+    """Wrap a FastMCP tool so ToolNode calls it without going through the MCP protocol."""
+    async def call(**arguments):
+        try:
+            result = await tool.run(arguments)
+        except Exception as e:
+            # Surface tool failures to the model, as the MCP transports do
+            raise ToolException(str(e))
+        content = "\n".join(block.text for block in result.content if block.type == "text")
+        # Same artifact shape as the MCP adapters produce for structured content
+        artifact = {"structured_content": result.structured_content} if result.structured_content else None
+        return content, artifact
+
+    return StructuredTool(
+        name=tool.name,
+        description=tool.description or "",
+        args_schema=tool.parameters,
+        coroutine=call,
+        response_format="content_and_artifact",
+        handle_tool_error=True
+    )
+
+
+async def load_tools() -> list:
+    """Load the ticket tools over the configured transport."""
+    if MCP_TRANSPORT == "inprocess":
+        from mcp_srvo import mcp
+        tools = await mcp.get_tools()
+        return [_to_langchain_tool(tool) for tool in tools.values()]
+
+    if MCP_TRANSPORT not in SERVERS:
+        raise ValueError(f"Unknown MCP_TRANSPORT {MCP_TRANSPORT!r}; use inprocess, stdio or http")
+
+    global mcp_pool
+    if mcp_pool is None:
+        mcp_pool = MCPSessionPool(SERVERS[MCP_TRANSPORT]["Tickets"], size=MCP_POOL_SIZE)
+        await mcp_pool.start()
+    return mcp_pool.get_tools()
+
+
+async def close_mcp_pool():
+    global mcp_pool
+    if mcp_pool is not None:
+        await mcp_pool.close()
+        mcp_pool = None
+
+
+def get_mcp_pool_stats():
+    return mcp_pool.stats() if mcp_pool is not None else None
+
 class State(TypedDict):
     messages: Annotated[List, add_messages]
 
 async def agent():
-    client = MultiServerMCPClient(SERVERS)
     llm = AzureChatOpenAI(
         azure_endpoint = os.getenv("AZURE_OPENAI_ENDPOINT"),
         azure_deployment = os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME"),
         api_key = os.getenv("AZURE_OPENAI_KEY"),
         api_version = os.getenv("AZURE_OPENAI_API_VERSION")
     )
-    tools = await client.get_tools()
+    tools = await load_tools()
     llm_with_tool = llm.bind_tools(tools=tools)
 
     
     graph = StateGraph(State)
 
-    async def llm_node(state:State):
-        resp = await llm_with_tool.ainvoke(state["messages"])
+    async def llm_node(state:State, config: RunnableConfig):
+        # Pass config through so astream_events sees the model's tokens (Python < 3.11)
+        resp = await llm_with_tool.ainvoke(state["messages"], config=config)
         return {"messages": [resp]}
     
-    tool_node = ToolNode(tools=tools)
+    tool_node = ToolNode(tools=tools, awrap_tool_call=tool_limiter)
+
+    async def tools_node(state:State, config: RunnableConfig):
+        async with tool_limiter.step():
+            return await tool_node.ainvoke(state, config)
 
     graph.add_node("llm", llm_node)
-    graph.add_node("tools", tool_node)
+    graph.add_node("tools", tools_node)
     graph.add_edge(START, "llm")
     graph.add_conditional_edges("llm", tools_condition)
     graph.add_edge("tools", "llm")
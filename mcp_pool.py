@@ -0,0 +1,167 @@
+from langchain_mcp_adapters.sessions import create_session
+from langchain_mcp_adapters.tools import convert_mcp_tool_to_langchain_tool
+import anyio
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Raised when the session's streams were already closed, i.e. the request
+# never reached the server, so retrying on a fresh session is safe.
+_NOT_SENT_ERRORS = (anyio.ClosedResourceError, anyio.BrokenResourceError)
+
+
+class _PooledSession:
+    """One initialized MCP client session, owned by its own background task.
+
+    The transport's context managers must be entered and exited in the same
+    task, so the session lives in `_run()` until `close()` is called or the
+    connection drops.
+    """
+
+    def __init__(self, connection: dict):
+        self.connection = connection
+        self.session = None
+        self._ready = asyncio.Event()
+        self._stop = asyncio.Event()
+        self._task = None
+        self._error = None
+
+    async def open(self):
+        self._ready.clear()
+        self._stop.clear()
+        self._error = None
+        self._task = asyncio.create_task(self._run())
+        await self._ready.wait()
+        if self._error is not None:
+            raise self._error
+
+    async def _run(self):
+        try:
+            async with create_session(self.connection) as session:
+                await session.initialize()
+                self.session = session
+                self._ready.set()
+                await self._stop.wait()
+        except Exception as e:
+            self._error = e
+            logger.warning(f"MCP session closed: {e}")
+        finally:
+            self.session = None
+            self._ready.set()
+
+    @property
+    def alive(self) -> bool:
+        return self.session is not None and not self._task.done()
+
+    async def close(self):
+        self._stop.set()
+        if self._task is not None:
+            try:
+                await asyncio.wait_for(self._task, timeout=5)
+            except asyncio.TimeoutError:
+                self._task.cancel()
+
+
+class MCPSessionPool:
+    """Warm MCP sessions shared by all tool calls for the app's lifetime.
+
+    Opens `size` sessions on `start()` and lists the server's tools once.
+    Each tool call borrows a session, so a call costs only the RPC. Dead
+    sessions are replaced before use; a call whose request was never sent
+    is retried once on the new session.
+    """
+
+    def __init__(self, connection: dict, size: int = 2):
+        self.connection = connection
+        self.size = size
+        self._idle = asyncio.Queue()
+        self._sessions = []
+        self._mcp_tools = None
+        self.calls = 0
+        self.failures = 0
+        self.reconnects = 0
+        self.total_call_time = 0.0
+
+    async def start(self):
+        for _ in range(self.size):
+            pooled = _PooledSession(self.connection)
+            await pooled.open()
+            self._sessions.append(pooled)
+            self._idle.put_nowait(pooled)
+        await self.refresh_tools()
+
+    async def _reconnect(self, pooled: _PooledSession):
+        await pooled.close()
+        self.reconnects += 1
+        await pooled.open()
+
+    async def _borrow(self) -> _PooledSession:
+        pooled = await self._idle.get()
+        if not pooled.alive:
+            try:
+                await self._reconnect(pooled)
+            except Exception:
+                # Keep the slot so a later call can try again
+                self._idle.put_nowait(pooled)
+                raise
+        return pooled
+
+    async def refresh_tools(self) -> list:
+        """Re-read the tool list and schemas from the server."""
+        pooled = await self._borrow()
+        try:
+            result = await pooled.session.list_tools()
+            self._mcp_tools = result.tools
+        finally:
+            self._idle.put_nowait(pooled)
+        return self._mcp_tools
+
+    async def call_tool(self, name: str, arguments: dict):
+        pooled = await self._borrow()
+        started = time.perf_counter()
+        try:
+            try:
+                return await pooled.session.call_tool(name, arguments)
+            except _NOT_SENT_ERRORS:
+                await self._reconnect(pooled)
+                return await pooled.session.call_tool(name, arguments)
+        except Exception:
+            self.failures += 1
+            raise
+        finally:
+            self.calls += 1
+            self.total_call_time += time.perf_counter() - started
+            self._idle.put_nowait(pooled)
+
+    async def __call__(self, request, handler):
+        # Tool-call interceptor: run every call on a pooled session instead of
+        # the per-call session the adapter would otherwise open
+        return await self.call_tool(request.name, request.args)
+
+    def get_tools(self) -> list:
+        """LangChain tools built from the cached schemas, routed through the pool."""
+        return [
+            convert_mcp_tool_to_langchain_tool(
+                None, tool, connection=self.connection, tool_interceptors=[self]
+            )
+            for tool in self._mcp_tools
+        ]
+
+    async def close(self):
+        for pooled in self._sessions:
+            await pooled.close()
+        self._sessions = []
+
+    def stats(self) -> dict:
+        return {
+            "size": self.size,
+            "alive": sum(1 for s in self._sessions if s.alive),
+            "idle": self._idle.qsize(),
+            "cached_tools": len(self._mcp_tools or []),
+            "calls": self.calls,
+            "failures": self.failures,
+            "reconnects": self.reconnects,
+            "avg_call_ms": round(self.total_call_time / self.calls * 1000, 2) if self.calls else 0.0
+        }
@@ -1,9 +1,27 @@
 import asyncio
 from fastapi import FastAPI
 from fastmcp import FastMCP
+from fastmcp.tools.tool import ToolResult
 from utils import *
+from similarity import lookup_similar_tickets
+from dedup import duplicate_index, catch_up_duplicate_index, warm_duplicate_index, SET_DUPLICATE_GROUP_QUERY
+from ticket_events import ticket_event_bus
+from rendering import format_ticket_details, format_ticket_list, format_success_message, format_error_message
 from typing import Optional
-mcp = FastMCP("helphub")
+from contextvars import ContextVar
+from contextlib import asynccontextmanager
+
+
+@asynccontextmanager
+async def server_lifespan(server):
+    # Run standalone (stdio/http), nothing else loads the duplicate index;
+    # in-process the app's lifespan does it instead
+    warm_task = asyncio.create_task(asyncio.to_thread(warm_duplicate_index))
+    yield
+    await asyncio.gather(warm_task, return_exceptions=True)
+
+
+mcp = FastMCP("helphub", lifespan=server_lifespan)
 from fastapi import HTTPException
 
 def raise_error(message: str, status_code: int = 400):
@@ -16,173 +34,6 @@ def raise_error(message: str, status_code: int = 400):
 # RESPONSE FORMATTER HELPERS
 # ============================================================================
 
-def format_ticket_details(ticket_data: dict) -> str:
-    """Format a single ticket into nice HTML"""
-    status_colors = {
-        "open": "bg-green-100 text-green-800",
-        "in_progress": "bg-blue-100 text-blue-800",
-        "resolved": "bg-purple-100 text-purple-800",
-        "closed": "bg-gray-100 text-gray-800"
-    }
-    
-    status = ticket_data.get('status', 'unknown')
-    status_class = status_colors.get(status, 'bg-gray-100 text-gray-800')
-    
-    html = f"""
-    <div class="ticket-card bg-white border border-gray-200 rounded-lg p-4 my-2">
-        <div class="flex items-center justify-between mb-3">
-            <h3 class="text-lg font-semibold text-gray-800">Ticket #{ticket_data['id']}</h3>
-            <span class="inline-block px-3 py-1 text-xs font-medium rounded-full {status_class}">
-                {status.upper().replace('_', ' ')}
-            </span>
-        </div>
-        
-        <div class="space-y-2 text-sm">
-            <div>
-                <span class="font-medium text-gray-600">Query:</span>
-                <p class="text-gray-800 mt-1">{ticket_data['query']}</p>
-            </div>
-    """
-    
-    if ticket_data.get('llm_response'):
-        html += f"""
-            <div class="mt-3 p-3 bg-blue-50 rounded">
-                <span class="font-medium text-blue-800">AI Response:</span>
-                <p class="text-gray-700 mt-1">{ticket_data['llm_response']}</p>
-            </div>
-        """
-    
-    if ticket_data.get('final_response'):
-        html += f"""
-            <div class="mt-3 p-3 bg-green-50 rounded">
-                <span class="font-medium text-green-800">Final Response:</span>
-                <p class="text-gray-700 mt-1">{ticket_data['final_response']}</p>
-            </div>
-        """
-    
-    if ticket_data.get('responded_by') and ticket_data['responded_by'] != 'none':
-        html += f"""
-            <div class="text-xs text-gray-500 mt-2">
-                <span class="font-medium">Handled by:</span> {ticket_data['responded_by'].upper()}
-            </div>
-        """
-    
-    if ticket_data.get('is_resolved'):
-        html += f"""
-            <div class="mt-2 p-2 bg-green-50 border border-green-200 rounded text-xs text-green-800">
-                âœ“ This ticket has been resolved
-            </div>
-        """
-    
-    if ticket_data.get('user_satisfied') is not None:
-        satisfaction = "ðŸ˜Š Satisfied" if ticket_data['user_satisfied'] else "ðŸ˜ž Not Satisfied"
-        html += f"""
-            <div class="text-xs text-gray-600 mt-2">
-                <span class="font-medium">User Feedback:</span> {satisfaction}
-            </div>
-        """
-    
-    html += f"""
-            <div class="text-xs text-gray-400 mt-3 flex justify-between">
-                <span>Created: {ticket_data.get('created_at', 'N/A')}</span>
-                <span>Updated: {ticket_data.get('updated_at', 'N/A')}</span>
-            </div>
-        </div>
-    </div>
-    """
-    
-    return html
-
-
-def format_ticket_list(tickets: list, title: str = "Your Tickets") -> str:
-    """Format a list of tickets into nice HTML"""
-    if not tickets:
-        return f"<p class='text-gray-600'>ðŸ“­ No tickets found matching your criteria.</p>"
-    
-    status_colors = {
-        "open": "bg-green-100 text-green-800",
-        "in_progress": "bg-blue-100 text-blue-800",
-        "resolved": "bg-purple-100 text-purple-800",
-        "closed": "bg-gray-100 text-gray-800"
-    }
-    
-    count = len(tickets)
-    html = f"""
-    <div class="mb-4">
-        <h3 class="text-lg font-semibold text-gray-800 mb-3">{title} ({count} ticket{'s' if count != 1 else ''})</h3>
-        <div class="space-y-2">
-    """
-    
-    for ticket in tickets:
-        status = ticket.get('status', 'unknown')
-        status_class = status_colors.get(status, 'bg-gray-100 text-gray-800')
-        query_preview = ticket['query'][:80] + ('...' if len(ticket['query']) > 80 else '')
-        
-        # Add resolution indicator
-        resolved_badge = ""
-        if ticket.get('is_resolved'):
-            resolved_badge = '<span class="ml-2 text-xs text-green-600">âœ“ Resolved</span>'
-        
-        html += f"""
-        <div class="ticket-card bg-white border border-gray-200 rounded-lg p-3 hover:border-indigo-300 transition">
-            <div class="flex items-center justify-between mb-1">
-                <span class="font-semibold text-gray-800">Ticket #{ticket['id']}</span>
-                <div class="flex items-center gap-2">
-                    <span class="inline-block px-2 py-0.5 text-xs font-medium rounded {status_class}">
-                        {status.upper().replace('_', ' ')}
-                    </span>
-                    {resolved_badge}
-                </div>
-            </div>
-            <p class="text-sm text-gray-600 mb-1">{query_preview}</p>
-            <div class="flex justify-between items-center text-xs text-gray-400">
-                <span>Created: {ticket.get('created_at', 'N/A')}</span>
-                {f"<span>By: {ticket.get('username', 'Unknown')}</span>" if ticket.get('username') else ""}
-            </div>
-        </div>
-        """
-    
-    html += """
-        </div>
-    </div>
-    """
-    
-    return html
-
-
-def format_success_message(message_text: str) -> str:
-    """Format success messages nicely"""
-    return f"""
-    <div class="bg-green-50 border border-green-200 rounded-lg p-4 my-2">
-        <div class="flex items-start">
-            <svg class="w-5 h-5 text-green-600 mt-0.5 mr-2 flex-shrink-0" fill="none" stroke="currentColor" viewBox="0 0 24 24">
-                <path stroke-linecap="round" stroke-linejoin="round" stroke-width="2" d="M9 12l2 2 4-4m6 2a9 9 0 11-18 0 9 9 0 0118 0z"></path>
-            </svg>
-            <div>
-                <p class="text-sm text-green-800">{message_text}</p>
-            </div>
-        </div>
-    </div>
-    """
-
-
-def format_error_message(error_text: str) -> str:
-    """Format error messages nicely"""
-    return f"""
-    <div class="bg-red-50 border border-red-200 rounded-lg p-4 my-2">
-        <div class="flex items-start">
-            <svg class="w-5 h-5 text-red-600 mt-0.5 mr-2 flex-shrink-0" fill="none" stroke="currentColor" viewBox="0 0 24 24">
-                <path stroke-linecap="round" stroke-linejoin="round" stroke-width="2" d="M12 8v4m0 4h.01M21 12a9 9 0 11-18 0 9 9 0 0118 0z"></path>
-            </svg>
-            <div>
-                <h4 class="text-sm font-medium text-red-800">Error</h4>
-                <p class="text-sm text-red-700 mt-1">{error_text}</p>
-            </div>
-        </div>
-    </div>
-    """
-
-
 def ticket_response_to_dict(ticket: TicketResponse) -> dict:
     """Convert TicketResponse object to dictionary for formatting"""
     return {
@@ -197,16 +48,162 @@ def ticket_response_to_dict(ticket: TicketResponse) -> dict:
         'is_resolved': ticket.is_resolved,
         'user_satisfied': ticket.user_satisfied,
         'created_at': str(ticket.created_at) if ticket.created_at else 'N/A',
-        'updated_at': str(ticket.updated_at) if ticket.updated_at else 'N/A'
+        'updated_at': str(ticket.updated_at) if ticket.updated_at else 'N/A',
+        'duplicate_group_id': ticket.duplicate_group_id
+    }
+
+
+# ============================================================================
+# COMPACT FORMATTERS (what the model reads)
+# ============================================================================
+
+# Tools answer the model with compact text by default; "html" returns the
+# Tailwind cards above instead.
+# Callers that show a result directly can set tool_output_format for the call.
+TOOL_OUTPUT_FORMAT = os.getenv("TOOL_OUTPUT_FORMAT", "compact").lower()
+tool_output_format = ContextVar("tool_output_format", default=TOOL_OUTPUT_FORMAT)
+COMPACT_QUERY_CHARS = 80
+COMPACT_TEXT_CHARS = 300
+
+
+def _clip(value, limit: int):
+    if value is None:
+        return None
+    value = " ".join(str(value).split())
+    return value if len(value) <= limit else value[:limit - 3] + "..."
+
+
+def compact_ticket_details(ticket_data: dict) -> str:
+    """Format a single ticket as one line of JSON with short keys, leaving out empty fields"""
+    fields = {
+        "id": ticket_data["id"],
+        "user": ticket_data.get("username"),
+        "status": ticket_data.get("status"),
+        "q": _clip(ticket_data.get("query"), COMPACT_TEXT_CHARS),
+        "ai": _clip(ticket_data.get("llm_response"), COMPACT_TEXT_CHARS),
+        "final": _clip(ticket_data.get("final_response"), COMPACT_TEXT_CHARS),
+        "by": ticket_data.get("responded_by") if ticket_data.get("responded_by") != "none" else None,
+        "resolved": bool(ticket_data["is_resolved"]) if ticket_data.get("is_resolved") is not None else None,
+        "satisfied": ticket_data.get("user_satisfied"),
+        "created": ticket_data.get("created_at"),
+        "updated": ticket_data.get("updated_at"),
+        "dup": ticket_data.get("duplicate_group_id")
     }
+    return json.dumps(
+        {k: v for k, v in fields.items() if v not in (None, "", "N/A")},
+        separators=(",", ":"),
+        ensure_ascii=False
+    )
+
+
+def compact_ticket_list(tickets: list, title: str = "Your Tickets") -> str:
+    """Format a list of tickets as a header line plus one pipe-separated row per ticket"""
+    if not tickets:
+        return "No tickets found matching your criteria."
+
+    # The owner column only helps when the list spans several users
+    show_user = len({t.get('username') for t in tickets}) > 1
+    # Search results also carry the matching passage
+    show_match = any(t.get('snippet') for t in tickets)
+    columns = ["id", "status", "resolved"] + (["user"] if show_user else []) + ["created", "query"]
+    if show_match:
+        columns.append("match")
+
+    lines = [f"{title}: {len(tickets)} ticket{'s' if len(tickets) != 1 else ''}", "|".join(columns)]
+    for ticket in tickets:
+        row = [str(ticket['id']), ticket.get('status', ''), "y" if ticket.get('is_resolved') else "n"]
+        if show_user:
+            row.append(ticket.get('username') or "")
+        row.append((ticket.get('created_at') or "")[:16])
+        row.append(_clip(ticket['query'], COMPACT_QUERY_CHARS).replace("|", "/"))
+        if show_match:
+            row.append(_clip(ticket.get('snippet'), COMPACT_QUERY_CHARS).replace("|", "/"))
+        lines.append("|".join(row))
+    return "\n".join(lines)
+
+
+def compact_similar_tickets(matches: list) -> str:
+    """Format similar-ticket matches as a header line plus one pipe-separated row each"""
+    if not matches:
+        return "No similar resolved tickets found."
+    lines = [f"Similar resolved tickets: {len(matches)}", "score|id|query|resolution"]
+    for match in matches:
+        lines.append("|".join([
+            f"{match['score']:.2f}",
+            str(match['ticket_id']),
+            _clip(match['query'], COMPACT_QUERY_CHARS).replace("|", "/"),
+            _clip(match['final_response'], COMPACT_TEXT_CHARS).replace("|", "/")
+        ]))
+    return "\n".join(lines)
+
+
+# Appended to compact results that carry an HTML artifact, so the model
+# comments on the data instead of restating it
+ARTIFACT_NOTE = "(Shown to the user as cards below your reply; do not repeat it.)"
+
+
+def tool_result(compact: str, html: str):
+    """Compact text for the model, with the rendered HTML attached as an artifact for the user"""
+    if tool_output_format.get() == "html":
+        return html
+    return ToolResult(content=f"{compact}\n{ARTIFACT_NOTE}", structured_content={"html": html})
+
+
+def ticket_result(ticket_data: dict, message_text: Optional[str] = None):
+    compact = compact_ticket_details(ticket_data)
+    html = format_ticket_details(ticket_data)
+    if message_text:
+        compact = f"ok: {message_text}\n{compact}"
+        html = format_success_message(f"âœ… {message_text}") + html
+    return tool_result(compact, html)
+
+
+def ticket_list_result(tickets: list, title: str, message_text: Optional[str] = None, next_cursor: Optional[str] = None):
+    if not tickets:
+        # Nothing worth attaching; the model can say so itself
+        if tool_output_format.get() == "html":
+            return format_ticket_list(tickets, title)
+        return compact_ticket_list(tickets, title)
+
+    compact = compact_ticket_list(tickets, title)
+    html = format_ticket_list(tickets, title)
+    if message_text:
+        compact = f"ok: {message_text}\n{compact}"
+        html = format_success_message(f"âœ… {message_text}") + html
+    if next_cursor:
+        compact += f"\nnext_cursor: {next_cursor}"
+        html += f"<p class='text-xs text-gray-400 mt-2'>More tickets available (next_cursor: {next_cursor})</p>"
+    return tool_result(compact, html)
+
+
+def format_tool_error(error_text: str) -> str:
+    if tool_output_format.get() == "html":
+        return format_error_message(error_text)
+    return f"error: {error_text}"
+
+
+async def group_duplicate_tickets(db, rows) -> tuple:
+    """Group freshly inserted tickets with near-duplicates from the last day.
+
+    Runs inside the inserting transaction, after catch_up_duplicate_index()
+    ran outside it; returns ({ticket_id: group_id} for the tickets whose
+    group was set, index entries) to hand to duplicate_index.apply() after
+    the commit. Skipped while the index is still cold.
+    """
+    if not duplicate_index.ready():
+        return {}, []
+    groups, entries = duplicate_index.assign([(row["id"], row["query"], row["created_at"]) for row in rows])
+    if groups:
+        await db.execute(text(SET_DUPLICATE_GROUP_QUERY), duplicate_index.update_params(groups))
+    return groups, entries
 
 
 # ============================================================================
 # MCP TOOLS WITH FORMATTED RESPONSES
 # ============================================================================
 
-@mcp.tool()
-async def create_ticket(ticket: TicketCreate, user_id: int) -> str:
+@mcp.tool(output_schema=None)
+async def create_ticket(ticket: TicketCreate, user_id: int) -> ToolResult | str:
     """
     Create a new support ticket.
 
@@ -215,35 +212,27 @@ async def create_ticket(ticket: TicketCreate, user_id: int) -> str:
         user_id: ID of the user creating the ticket.
     
     Returns:
-        Formatted HTML showing the created ticket details.
+        The created ticket as compact JSON.
     """
     try:
-        with get_db() as db:
-            db.execute(text("""
+        await catch_up_duplicate_index()
+        async with get_async_db() as db:
+            result = await db.execute(text(f"""
                 INSERT INTO tickets (user_id, query, status, responded_by)
                 VALUES (:user_id, :query, :status, :responded_by)
+                RETURNING {TICKET_RETURNING_COLUMNS}
             """), {
                 "user_id": user_id,
                 "query": ticket.query,
                 "status": TicketStatus.OPEN.value,
                 "responded_by": RespondedBy.NONE.value
             })
-            db.commit()
-            
-            result = db.execute(text("""
-                SELECT 
-                    t.id, t.user_id, u.username, 
-                    t.query, t.status, t.llm_response, t.final_response, 
-                    t.responded_by, t.is_resolved, t.user_satisfied, 
-                    t.created_at, t.updated_at
-                FROM tickets t
-                JOIN users u ON t.user_id = u.id
-                WHERE t.user_id = :user_id
-                ORDER BY t.created_at DESC
-                LIMIT 1
-            """), {"user_id": user_id})
-
             row = result.mappings().fetchone()
+            groups, entries = await group_duplicate_tickets(db, [row])
+            await db.commit()
+            duplicate_index.apply(groups, entries)
+            ticket_event_bus.publish("created", [row])
+
             ticket_data = ticket_response_to_dict(TicketResponse(
                 id=row["id"],
                 user_id=row["user_id"],
@@ -256,20 +245,70 @@ async def create_ticket(ticket: TicketCreate, user_id: int) -> str:
                 is_resolved=row["is_resolved"],
                 user_satisfied=row["user_satisfied"],
                 created_at=row["created_at"],
-                updated_at=row["updated_at"]
+                updated_at=row["updated_at"],
+                duplicate_group_id=groups.get(row["id"])
             ))
-            
-            success_msg = format_success_message(f"âœ… Ticket #{ticket_data['id']} created successfully!")
-            ticket_html = format_ticket_details(ticket_data)
-            
-            return success_msg + ticket_html
+
+            message_text = f"Ticket #{ticket_data['id']} created successfully!"
+            if ticket_data['duplicate_group_id'] is not None:
+                message_text += " Similar reports were filed recently; it was grouped with them."
+            return ticket_result(ticket_data, message_text)
             
     except Exception as e:
         logger.error(f"Error creating ticket: {e}")
-        return format_error_message(f"Failed to create ticket: {str(e)}")
+        return format_tool_error(f"Failed to create ticket: {str(e)}")
+
 
+@mcp.tool(output_schema=None)
+async def create_tickets_bulk(bulk: TicketBulkCreate, user_id: int) -> ToolResult | str:
+    """
+    Create several support tickets at once in a single transaction.
+
+    Args:
+        bulk: The tickets to create, each containing a query.
+        user_id: ID of the user the tickets belong to.
+    
+    Returns:
+        The created tickets, one compact row each.
+    """
+    try:
+        await catch_up_duplicate_index()
+        async with get_async_db() as db:
+            rows = []
+            for sql, params in build_bulk_ticket_inserts(user_id, [t.query for t in bulk.tickets]):
+                result = await db.execute(text(sql), params)
+                rows.extend(result.mappings().fetchall())
+            groups, entries = await group_duplicate_tickets(db, rows)
+            await db.commit()
+            duplicate_index.apply(groups, entries)
+            ticket_event_bus.publish("created", rows)
+
+            tickets = [
+                {
+                    'id': row["id"],
+                    'user_id': row["user_id"],
+                    'username': row["username"],
+                    'query': row["query"],
+                    'status': row["status"],
+                    'is_resolved': row["is_resolved"],
+                    'created_at': str(row["created_at"]) if row["created_at"] else 'N/A',
+                    'updated_at': str(row["updated_at"]) if row["updated_at"] else 'N/A'
+                }
+                for row in sorted(rows, key=lambda r: r["id"])
+            ]
+
+            message_text = f"{len(tickets)} tickets created successfully!"
+            duplicates = sum(1 for t in tickets if t['id'] in groups)
+            if duplicates:
+                message_text += f" {duplicates} grouped as near-duplicates."
+            return ticket_list_result(tickets, "Created Tickets", message_text)
 
-@mcp.tool()
+    except Exception as e:
+        logger.error(f"Error bulk creating tickets: {e}")
+        return format_tool_error(f"Failed to create tickets: {str(e)}")
+
+
+@mcp.tool(output_schema=None)
 async def get_tickets(
     current_user_id: int,
     current_user_role: str,
@@ -278,8 +317,9 @@ async def get_tickets(
     is_resolved: Optional[bool] = None,
     responded_by: Optional[RespondedBy] = None,
     limit: int = 100,
-    offset: int = 0
-) -> str:
+    offset: int = 0,
+    cursor: Optional[str] = None
+) -> ToolResult | str:
     """
     Retrieve support tickets with optional filtering.
     
@@ -294,12 +334,20 @@ async def get_tickets(
         responded_by: Filter by responder (llm, human, none)
         limit: Max results to return (default: 100)
         offset: Results to skip for pagination (default: 0)
+        cursor: next_cursor value from a previous page; faster than offset for deep pages
     
     Returns:
-        Formatted HTML showing list of tickets matching the criteria.
+        Matching tickets, one compact row each, plus next_cursor when more remain.
     """
+    cursor_position = None
+    if cursor:
+        try:
+            cursor_position = decode_ticket_cursor(cursor)
+        except ValueError as e:
+            return format_tool_error(str(e))
+
     try:
-        with get_db() as db:
+        async with get_async_db(readonly=True) as db:
             query = """
                 SELECT
                     t.id, t.user_id, u.username, t.query, t.status, t.llm_response,
@@ -333,11 +381,17 @@ async def get_tickets(
                 query += " AND t.responded_by = :responded_by"
                 params["responded_by"] = responded_by.value
 
-            query += " ORDER BY t.created_at DESC LIMIT :limit OFFSET :offset"
+            if cursor_position is not None:
+                # Keyset mode: seek past the last row instead of skipping `offset` rows
+                query += " AND (t.created_at, t.id) < (:cursor_created_at, :cursor_id)"
+                params["cursor_created_at"], params["cursor_id"] = cursor_position
+                offset = 0
+
+            query += " ORDER BY t.created_at DESC, t.id DESC LIMIT :limit OFFSET :offset"
             params["limit"] = limit
             params["offset"] = offset
 
-            result = db.execute(text(query), params)
+            result = await db.execute(text(query), params)
             rows = result.mappings().fetchall()
 
             tickets = [
@@ -369,15 +423,116 @@ async def get_tickets(
             
             title = " ".join(title_parts) + " Tickets" if title_parts else "Your Tickets"
             
-            return format_ticket_list(tickets, title)
+            next_cursor = None
+            if len(rows) == limit:
+                last = rows[-1]
+                next_cursor = encode_ticket_cursor(last["created_at"], last["id"])
+
+            return ticket_list_result(tickets, title, next_cursor=next_cursor)
             
     except Exception as e:
         logger.error(f"Error fetching tickets: {e}")
-        return format_error_message(f"Failed to fetch tickets: {str(e)}")
+        return format_tool_error(f"Failed to fetch tickets: {str(e)}")
+
+
+@mcp.tool(output_schema=None)
+async def search_tickets(
+    search: str,
+    current_user_id: int,
+    current_user_role: str,
+    user_id: Optional[int] = None,
+    limit: int = 10
+) -> ToolResult | str:
+    """
+    Full-text search over ticket queries and responses, best matches first.
+    
+    Access control: Admins search all tickets; regular users search only their own.
+    
+    Args:
+        search: Words to look for, e.g. "vpn disconnects"; the last word may be partial
+        current_user_id: ID of the user making the request
+        current_user_role: User role ("admin" searches all, others only their own tickets)
+        user_id: Restrict to one user's tickets (admin-only)
+        limit: Max results to return (default: 10)
+    
+    Returns:
+        Matching tickets, one compact row each with the matching passage.
+    """
+    match = build_fts_match(search)
+    if match is None:
+        return format_tool_error("Search must contain at least one word.")
 
+    try:
+        async with get_async_db(readonly=True) as db:
+            sql, params = build_ticket_search(
+                match, current_user_id, current_user_role, user_id=user_id, limit=limit
+            )
+            rows = (await db.execute(text(sql), params)).mappings().fetchall()
+
+            tickets = [
+                {
+                    'id': row["id"],
+                    'user_id': row["user_id"],
+                    'username': row["username"],
+                    'query': row["query"],
+                    'status': row["status"],
+                    'llm_response': row["llm_response"],
+                    'final_response': row["final_response"],
+                    'responded_by': row["responded_by"],
+                    'is_resolved': row["is_resolved"],
+                    'user_satisfied': row["user_satisfied"],
+                    'created_at': str(row["created_at"]) if row["created_at"] else 'N/A',
+                    'updated_at': str(row["updated_at"]) if row["updated_at"] else 'N/A',
+                    'snippet': build_search_snippet(
+                        [row["query"], row["llm_response"], row["final_response"]], search
+                    )
+                }
+                for row in rows
+            ]
+
+            return ticket_list_result(tickets, f'Tickets matching "{_clip(search, 40)}"')
+
+    except Exception as e:
+        logger.error(f"Error searching tickets: {e}")
+        return format_tool_error(f"Failed to search tickets: {str(e)}")
 
-@mcp.tool()
-async def get_ticket(ticket_id: int, current_user_id: int, current_user_role: str) -> str:
+
+@mcp.tool(output_schema=None)
+async def find_similar_tickets(
+    problem: str,
+    current_user_id: int,
+    current_user_role: str,
+    k: int = 5
+) -> str:
+    """
+    Find resolved tickets similar to a problem description, with their resolutions.
+    
+    Use it before answering a new problem: a close match (score above ~0.5)
+    usually means the known resolution applies.
+    
+    Access control: Users only match their own tickets (admins match all).
+    
+    Args:
+        problem: The problem description to match, e.g. the user's ticket text
+        current_user_id: ID of the user making the request
+        current_user_role: User role ("admin" matches every user's tickets)
+        k: Max matches to return (default: 5)
+    
+    Returns:
+        One compact row per match: score, ticket id, question, resolution.
+    """
+    try:
+        matches = await asyncio.to_thread(
+            lookup_similar_tickets, problem, current_user_id, current_user_role, k
+        )
+        return compact_similar_tickets(matches)
+    except Exception as e:
+        logger.error(f"Error finding similar tickets: {e}")
+        return format_tool_error(f"Failed to find similar tickets: {str(e)}")
+
+
+@mcp.tool(output_schema=None)
+async def get_ticket(ticket_id: int, current_user_id: int, current_user_role: str) -> ToolResult | str:
     """
     Retrieve a single ticket by its ID.
     
@@ -389,16 +544,16 @@ async def get_ticket(ticket_id: int, current_user_id: int, current_user_role: st
         current_user_role: User role ("admin" can view any ticket, others only their own)
     
     Returns:
-        Formatted HTML showing detailed ticket information.
+        The ticket as compact JSON.
     """
     try:
-        with get_db() as db:
-            result = db.execute(text("""
+        async with get_async_db(readonly=True) as db:
+            result = await db.execute(text("""
                 SELECT 
                     t.id, t.user_id, u.username, 
                     t.query, t.status, t.llm_response, t.final_response, 
                     t.responded_by, t.is_resolved, t.user_satisfied, 
-                    t.created_at, t.updated_at
+                    t.created_at, t.updated_at, t.duplicate_group_id
                 FROM tickets t
                 JOIN users u ON t.user_id = u.id
                 WHERE t.id = :ticket_id
@@ -407,11 +562,11 @@ async def get_ticket(ticket_id: int, current_user_id: int, current_user_role: st
             row = result.mappings().fetchone()
 
             if not row:
-                return format_error_message(f"Ticket #{ticket_id} not found.")
+                return format_tool_error(f"Ticket #{ticket_id} not found.")
             
             # Check authorization
             if current_user_role != "admin" and row["user_id"] != current_user_id:
-                return format_error_message("You don't have permission to view this ticket.")
+                return format_tool_error("You don't have permission to view this ticket.")
             
             ticket_data = {
                 'id': row["id"],
@@ -425,23 +580,24 @@ async def get_ticket(ticket_id: int, current_user_id: int, current_user_role: st
                 'is_resolved': row["is_resolved"],
                 'user_satisfied': row["user_satisfied"],
                 'created_at': str(row["created_at"]) if row["created_at"] else 'N/A',
-                'updated_at': str(row["updated_at"]) if row["updated_at"] else 'N/A'
+                'updated_at': str(row["updated_at"]) if row["updated_at"] else 'N/A',
+                'duplicate_group_id': row["duplicate_group_id"]
             }
             
-            return format_ticket_details(ticket_data)
+            return ticket_result(ticket_data)
             
     except Exception as e:
         logger.error(f"Error fetching ticket: {e}")
-        return format_error_message(f"Failed to fetch ticket: {str(e)}")
+        return format_tool_error(f"Failed to fetch ticket: {str(e)}")
 
 
-@mcp.tool()
+@mcp.tool(output_schema=None)
 async def update_ticket(
     ticket_id: int,
     ticket_update: TicketUpdate,
     current_user_id: int,
     current_user_role: str
-) -> str:
+) -> ToolResult | str:
     """
     Update an existing ticket with role-based field restrictions.
     
@@ -456,15 +612,15 @@ async def update_ticket(
         current_user_role: User role determining update permissions
     
     Returns:
-        Formatted HTML showing the updated ticket details.
+        The updated ticket as compact JSON.
     """
     try:
-        with get_db() as db:
-            result = db.execute(text("SELECT user_id FROM tickets WHERE id = :ticket_id"), {"ticket_id": ticket_id})
+        async with get_async_db() as db:
+            result = await db.execute(text("SELECT user_id FROM tickets WHERE id = :ticket_id"), {"ticket_id": ticket_id})
             ticket = result.fetchone()
             
             if not ticket:
-                return format_error_message(f"Ticket #{ticket_id} not found.")
+                return format_tool_error(f"Ticket #{ticket_id} not found.")
             
             update_fields = []
             params = {"ticket_id": ticket_id}
@@ -472,7 +628,7 @@ async def update_ticket(
             # Regular users can only update their own tickets and only satisfaction
             if current_user_role != "admin":
                 if ticket[0] != current_user_id:
-                    return format_error_message("You don't have permission to update this ticket.")
+                    return format_tool_error("You don't have permission to update this ticket.")
                 
                 if ticket_update.user_satisfied is not None:
                     update_fields.append("user_satisfied = :user_satisfied")
@@ -504,16 +660,16 @@ async def update_ticket(
                     params["user_satisfied"] = ticket_update.user_satisfied
             
             if not update_fields:
-                return format_error_message("No fields provided to update.")
+                return format_tool_error("No fields provided to update.")
             
             update_fields.append("updated_at = CURRENT_TIMESTAMP")
             
             update_query = f"UPDATE tickets SET {', '.join(update_fields)} WHERE id = :ticket_id"
-            db.execute(text(update_query), params)
-            db.commit()
+            await db.execute(text(update_query), params)
+            await db.commit()
             
             # Fetch updated ticket
-            result = db.execute(text("""
+            result = await db.execute(text("""
                 SELECT 
                     t.id, t.user_id, u.username, 
                     t.query, t.status, t.llm_response, t.final_response, 
@@ -525,6 +681,7 @@ async def update_ticket(
             """), {"ticket_id": ticket_id})
             
             row = result.mappings().fetchone()
+            ticket_event_bus.publish("updated", [row])
             
             ticket_data = {
                 'id': row["id"],
@@ -541,13 +698,10 @@ async def update_ticket(
                 'updated_at': str(row["updated_at"]) if row["updated_at"] else 'N/A'
             }
             
-            success_msg = format_success_message(f"âœ… Ticket #{ticket_id} updated successfully!")
-            ticket_html = format_ticket_details(ticket_data)
-            
-            return success_msg + ticket_html
+            return ticket_result(ticket_data, f"Ticket #{ticket_id} updated successfully!")
             
     except HTTPException as he:
-        return format_error_message(str(he.detail))
+        return format_tool_error(str(he.detail))
     except Exception as e:
         logger.error(f"Error updating ticket: {e}")
-        return format_error_message(f"Failed to update ticket: {str(e)}")
\ No newline at end of file
+        return format_tool_error(f"Failed to update ticket: {str(e)}")
\ No newline at end of file
@@ -0,0 +1,422 @@
+from sqlalchemy import text
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+# Ordered list of (version, description, statements). Append new migrations
+# at the end with the next version number; never edit one that has shipped.
+MIGRATIONS = [
+    (1, "Add ticket listing indexes", [
+        "CREATE INDEX IF NOT EXISTS idx_tickets_user_created ON tickets (user_id, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_tickets_status_created ON tickets (status, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_tickets_resolved_responder ON tickets (is_resolved, responded_by)",
+        "CREATE INDEX IF NOT EXISTS idx_tickets_created ON tickets (created_at)",
+    ]),
+    # Per-user counters bumped on every ticket write, so caches in any process
+    # can tell when a user's ticket data changed. user_id 0 tracks all tickets.
+    (2, "Add ticket data versions", [
+        """
+        CREATE TABLE IF NOT EXISTS ticket_data_versions (
+            user_id INTEGER PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_tickets_version_insert AFTER INSERT ON tickets
+        BEGIN
+            INSERT INTO ticket_data_versions (user_id, version) VALUES (NEW.user_id, 1), (0, 1)
+            ON CONFLICT (user_id) DO UPDATE SET version = version + 1;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_tickets_version_update AFTER UPDATE ON tickets
+        BEGIN
+            INSERT INTO ticket_data_versions (user_id, version) VALUES (NEW.user_id, 1), (0, 1)
+            ON CONFLICT (user_id) DO UPDATE SET version = version + 1;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_tickets_version_delete AFTER DELETE ON tickets
+        BEGIN
+            INSERT INTO ticket_data_versions (user_id, version) VALUES (OLD.user_id, 1), (0, 1)
+            ON CONFLICT (user_id) DO UPDATE SET version = version + 1;
+        END
+        """,
+    ]),
+    # Admin statistics kept as counters, so /api/admin/stats doesn't aggregate
+    # the whole tickets table on every call. One row per (metric, key); NULL
+    # columns are counted under the key 'null'. ticket_stats.py rebuilds and
+    # checks these from scratch.
+    (3, "Add materialized ticket statistics", [
+        """
+        CREATE TABLE IF NOT EXISTS ticket_stats (
+            metric VARCHAR(32) NOT NULL,
+            key VARCHAR(32) NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (metric, key)
+        )
+        """,
+        """
+        INSERT INTO ticket_stats (metric, key, count)
+        SELECT 'tickets', 'total', COUNT(*) FROM tickets
+        UNION ALL
+        SELECT 'status', COALESCE(status, 'null'), COUNT(*) FROM tickets GROUP BY 2
+        UNION ALL
+        SELECT 'resolved', CASE WHEN is_resolved = 1 THEN 'yes' ELSE 'no' END, COUNT(*)
+        FROM tickets GROUP BY 2
+        UNION ALL
+        SELECT 'satisfaction',
+            CASE WHEN user_satisfied = 1 THEN 'satisfied'
+                 WHEN user_satisfied = 0 THEN 'unsatisfied'
+                 WHEN user_satisfied IS NULL THEN 'no_response'
+                 ELSE 'other' END,
+            COUNT(*)
+        FROM tickets GROUP BY 2
+        UNION ALL
+        SELECT 'responded_by', COALESCE(responded_by, 'null'), COUNT(*) FROM tickets GROUP BY 2
+        UNION ALL
+        SELECT 'users', 'total', COUNT(*) FROM users
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_tickets_stats_insert AFTER INSERT ON tickets
+        BEGIN
+            INSERT INTO ticket_stats (metric, key, count) VALUES
+                ('tickets', 'total', 1),
+                ('status', COALESCE(NEW.status, 'null'), 1),
+                ('resolved', CASE WHEN NEW.is_resolved = 1 THEN 'yes' ELSE 'no' END, 1),
+                ('satisfaction', CASE WHEN NEW.user_satisfied = 1 THEN 'satisfied'
+                                      WHEN NEW.user_satisfied = 0 THEN 'unsatisfied'
+                                      WHEN NEW.user_satisfied IS NULL THEN 'no_response'
+                                      ELSE 'other' END, 1),
+                ('responded_by', COALESCE(NEW.responded_by, 'null'), 1)
+            ON CONFLICT (metric, key) DO UPDATE SET count = count + 1;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_tickets_stats_update
+        AFTER UPDATE OF status, is_resolved, user_satisfied, responded_by ON tickets
+        BEGIN
+            UPDATE ticket_stats SET count = count - 1 WHERE (metric, key) IN (VALUES
+                ('status', COALESCE(OLD.status, 'null')),
+                ('resolved', CASE WHEN OLD.is_resolved = 1 THEN 'yes' ELSE 'no' END),
+                ('satisfaction', CASE WHEN OLD.user_satisfied = 1 THEN 'satisfied'
+                                      WHEN OLD.user_satisfied = 0 THEN 'unsatisfied'
+                                      WHEN OLD.user_satisfied IS NULL THEN 'no_response'
+                                      ELSE 'other' END),
+                ('responded_by', COALESCE(OLD.responded_by, 'null'))
+            );
+            INSERT INTO ticket_stats (metric, key, count) VALUES
+                ('status', COALESCE(NEW.status, 'null'), 1),
+                ('resolved', CASE WHEN NEW.is_resolved = 1 THEN 'yes' ELSE 'no' END, 1),
+                ('satisfaction', CASE WHEN NEW.user_satisfied = 1 THEN 'satisfied'
+                                      WHEN NEW.user_satisfied = 0 THEN 'unsatisfied'
+                                      WHEN NEW.user_satisfied IS NULL THEN 'no_response'
+                                      ELSE 'other' END, 1),
+                ('responded_by', COALESCE(NEW.responded_by, 'null'), 1)
+            ON CONFLICT (metric, key) DO UPDATE SET count = count + 1;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_tickets_stats_delete AFTER DELETE ON tickets
+        BEGIN
+            UPDATE ticket_stats SET count = count - 1 WHERE (metric, key) IN (VALUES
+                ('tickets', 'total'),
+                ('status', COALESCE(OLD.status, 'null')),
+                ('resolved', CASE WHEN OLD.is_resolved = 1 THEN 'yes' ELSE 'no' END),
+                ('satisfaction', CASE WHEN OLD.user_satisfied = 1 THEN 'satisfied'
+                                      WHEN OLD.user_satisfied = 0 THEN 'unsatisfied'
+                                      WHEN OLD.user_satisfied IS NULL THEN 'no_response'
+                                      ELSE 'other' END),
+                ('responded_by', COALESCE(OLD.responded_by, 'null'))
+            );
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_users_stats_insert AFTER INSERT ON users
+        BEGIN
+            INSERT INTO ticket_stats (metric, key, count) VALUES ('users', 'total', 1)
+            ON CONFLICT (metric, key) DO UPDATE SET count = count + 1;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_users_stats_delete AFTER DELETE ON users
+        BEGIN
+            UPDATE ticket_stats SET count = count - 1 WHERE metric = 'users' AND key = 'total';
+        END
+        """,
+    ]),
+    # Hourly and daily ticket volume and resolution rollups for
+    # /api/admin/analytics. Resolution times go into a log-scale histogram
+    # (bin i holds times up to 1.1^i seconds) so percentiles can be read
+    # back from any range of buckets. Existing resolved tickets are
+    # backfilled using updated_at as their resolution time.
+    (4, "Add ticket analytics rollups", [
+        """
+        CREATE TABLE IF NOT EXISTS ticket_rollups (
+            granularity VARCHAR(8) NOT NULL,
+            bucket_start TIMESTAMP NOT NULL,
+            created INTEGER NOT NULL DEFAULT 0,
+            resolved INTEGER NOT NULL DEFAULT 0,
+            resolved_by_llm INTEGER NOT NULL DEFAULT 0,
+            resolved_by_human INTEGER NOT NULL DEFAULT 0,
+            reopened INTEGER NOT NULL DEFAULT 0,
+            resolution_seconds_total REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (granularity, bucket_start)
+        ) WITHOUT ROWID
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS ticket_resolution_histogram (
+            granularity VARCHAR(8) NOT NULL,
+            bucket_start TIMESTAMP NOT NULL,
+            bin INTEGER NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (granularity, bucket_start, bin)
+        ) WITHOUT ROWID
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS resolution_time_bins (
+            bin INTEGER PRIMARY KEY,
+            upper_seconds REAL NOT NULL
+        )
+        """,
+        """
+        INSERT INTO resolution_time_bins (bin, upper_seconds)
+        WITH RECURSIVE bins (bin, upper_seconds) AS (
+            SELECT 0, 1.0
+            UNION ALL
+            SELECT bin + 1, upper_seconds * 1.1 FROM bins WHERE bin < 220
+        )
+        SELECT bin, upper_seconds FROM bins
+        """,
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_resolution_time_bins_upper ON resolution_time_bins (upper_seconds)",
+        """
+        INSERT INTO ticket_rollups (granularity, bucket_start, created)
+        SELECT g.granularity,
+            CASE g.granularity WHEN 'hour' THEN strftime('%Y-%m-%d %H:00:00', t.created_at)
+                               ELSE strftime('%Y-%m-%d 00:00:00', t.created_at) END,
+            COUNT(*)
+        FROM tickets t, (SELECT 'hour' AS granularity UNION ALL SELECT 'day') g
+        WHERE t.created_at IS NOT NULL
+        GROUP BY 1, 2
+        """,
+        """
+        INSERT INTO ticket_rollups (granularity, bucket_start, resolved, resolved_by_llm,
+                                    resolved_by_human, resolution_seconds_total)
+        SELECT g.granularity,
+            CASE g.granularity WHEN 'hour' THEN strftime('%Y-%m-%d %H:00:00', t.updated_at)
+                               ELSE strftime('%Y-%m-%d 00:00:00', t.updated_at) END,
+            COUNT(*),
+            SUM(t.responded_by = 'llm'),
+            SUM(t.responded_by = 'human'),
+            SUM(MAX((julianday(t.updated_at) - julianday(t.created_at)) * 86400, 0))
+        FROM tickets t, (SELECT 'hour' AS granularity UNION ALL SELECT 'day') g
+        WHERE t.is_resolved = 1 AND t.updated_at IS NOT NULL AND t.created_at IS NOT NULL
+        GROUP BY 1, 2
+        ON CONFLICT (granularity, bucket_start) DO UPDATE SET
+            resolved = excluded.resolved,
+            resolved_by_llm = excluded.resolved_by_llm,
+            resolved_by_human = excluded.resolved_by_human,
+            resolution_seconds_total = excluded.resolution_seconds_total
+        """,
+        """
+        INSERT INTO ticket_resolution_histogram (granularity, bucket_start, bin, count)
+        SELECT granularity, bucket_start,
+            COALESCE((SELECT b.bin FROM resolution_time_bins b WHERE b.upper_seconds >= seconds
+                      ORDER BY b.upper_seconds LIMIT 1), 220),
+            COUNT(*)
+        FROM (
+            SELECT g.granularity,
+                CASE g.granularity WHEN 'hour' THEN strftime('%Y-%m-%d %H:00:00', t.updated_at)
+                                   ELSE strftime('%Y-%m-%d 00:00:00', t.updated_at) END AS bucket_start,
+                MAX((julianday(t.updated_at) - julianday(t.created_at)) * 86400, 0) AS seconds
+            FROM tickets t, (SELECT 'hour' AS granularity UNION ALL SELECT 'day') g
+            WHERE t.is_resolved = 1 AND t.updated_at IS NOT NULL AND t.created_at IS NOT NULL
+        )
+        GROUP BY 1, 2, 3
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_tickets_rollup_insert AFTER INSERT ON tickets
+        BEGIN
+            INSERT INTO ticket_rollups (granularity, bucket_start, created) VALUES
+                ('hour', strftime('%Y-%m-%d %H:00:00', COALESCE(NEW.created_at, 'now')), 1),
+                ('day', strftime('%Y-%m-%d 00:00:00', COALESCE(NEW.created_at, 'now')), 1)
+            ON CONFLICT (granularity, bucket_start) DO UPDATE SET created = created + 1;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_tickets_rollup_resolve AFTER UPDATE OF is_resolved ON tickets
+        WHEN NEW.is_resolved = 1 AND COALESCE(OLD.is_resolved, 0) != 1
+        BEGIN
+            INSERT INTO ticket_rollups (granularity, bucket_start, resolved, resolved_by_llm,
+                                        resolved_by_human, resolution_seconds_total) VALUES
+                ('hour', strftime('%Y-%m-%d %H:00:00', 'now'), 1,
+                 NEW.responded_by = 'llm', NEW.responded_by = 'human',
+                 MAX((julianday('now') - julianday(NEW.created_at)) * 86400, 0)),
+                ('day', strftime('%Y-%m-%d 00:00:00', 'now'), 1,
+                 NEW.responded_by = 'llm', NEW.responded_by = 'human',
+                 MAX((julianday('now') - julianday(NEW.created_at)) * 86400, 0))
+            ON CONFLICT (granularity, bucket_start) DO UPDATE SET
+                resolved = resolved + 1,
+                resolved_by_llm = resolved_by_llm + excluded.resolved_by_llm,
+                resolved_by_human = resolved_by_human + excluded.resolved_by_human,
+                resolution_seconds_total = resolution_seconds_total + excluded.resolution_seconds_total;
+
+            INSERT INTO ticket_resolution_histogram (granularity, bucket_start, bin, count)
+            SELECT g.granularity,
+                CASE g.granularity WHEN 'hour' THEN strftime('%Y-%m-%d %H:00:00', 'now')
+                                   ELSE strftime('%Y-%m-%d 00:00:00', 'now') END,
+                COALESCE((SELECT b.bin FROM resolution_time_bins b
+                          WHERE b.upper_seconds >= MAX((julianday('now') - julianday(NEW.created_at)) * 86400, 0)
+                          ORDER BY b.upper_seconds LIMIT 1), 220),
+                1
+            FROM (SELECT 'hour' AS granularity UNION ALL SELECT 'day') g
+            WHERE true
+            ON CONFLICT (granularity, bucket_start, bin) DO UPDATE SET count = count + 1;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_tickets_rollup_reopen AFTER UPDATE OF is_resolved ON tickets
+        WHEN OLD.is_resolved = 1 AND COALESCE(NEW.is_resolved, 0) != 1
+        BEGIN
+            INSERT INTO ticket_rollups (granularity, bucket_start, reopened) VALUES
+                ('hour', strftime('%Y-%m-%d %H:00:00', 'now'), 1),
+                ('day', strftime('%Y-%m-%d 00:00:00', 'now'), 1)
+            ON CONFLICT (granularity, bucket_start) DO UPDATE SET reopened = reopened + 1;
+        END
+        """,
+    ]),
+    # Full-text index over the ticket text for /api/tickets/search and the
+    # search_tickets tool. External content table: the text stays in tickets,
+    # the triggers keep the index in step with it.
+    (5, "Add ticket full-text search", [
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS tickets_fts USING fts5(
+            query, llm_response, final_response,
+            content = 'tickets', content_rowid = 'id',
+            tokenize = 'porter unicode61 remove_diacritics 2'
+        )
+        """,
+        "INSERT INTO tickets_fts (tickets_fts) VALUES ('rebuild')",
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_tickets_fts_insert AFTER INSERT ON tickets
+        BEGIN
+            INSERT INTO tickets_fts (rowid, query, llm_response, final_response)
+            VALUES (NEW.id, NEW.query, NEW.llm_response, NEW.final_response);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_tickets_fts_update
+        AFTER UPDATE OF query, llm_response, final_response ON tickets
+        BEGIN
+            INSERT INTO tickets_fts (tickets_fts, rowid, query, llm_response, final_response)
+            VALUES ('delete', OLD.id, OLD.query, OLD.llm_response, OLD.final_response);
+            INSERT INTO tickets_fts (rowid, query, llm_response, final_response)
+            VALUES (NEW.id, NEW.query, NEW.llm_response, NEW.final_response);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_tickets_fts_delete AFTER DELETE ON tickets
+        BEGIN
+            INSERT INTO tickets_fts (tickets_fts, rowid, query, llm_response, final_response)
+            VALUES ('delete', OLD.id, OLD.query, OLD.llm_response, OLD.final_response);
+        END
+        """,
+    ]),
+    # Near-duplicate tickets share the id of the first ticket of their group,
+    # assigned at insert time by dedup.py
+    (6, "Add ticket duplicate groups", [
+        "ALTER TABLE tickets ADD COLUMN duplicate_group_id INTEGER",
+        """
+        CREATE INDEX IF NOT EXISTS idx_tickets_duplicate_group
+        ON tickets (duplicate_group_id) WHERE duplicate_group_id IS NOT NULL
+        """,
+    ]),
+    # The global data version (user_id 0 in migration 2) of the last write to
+    # each ticket. Versions are handed out while the write lock is held, so
+    # they follow commit order: readers that ask for "version > last seen"
+    # can't miss a write that was still in flight when they last looked,
+    # which updated_at can't promise. The version triggers are recreated to
+    # record it in the same step.
+    (7, "Add ticket change versions", [
+        """
+        CREATE TABLE IF NOT EXISTS ticket_change_versions (
+            ticket_id INTEGER PRIMARY KEY,
+            version INTEGER NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_ticket_change_versions_version ON ticket_change_versions (version)",
+        "DROP TRIGGER IF EXISTS trg_tickets_version_insert",
+        "DROP TRIGGER IF EXISTS trg_tickets_version_update",
+        "DROP TRIGGER IF EXISTS trg_tickets_version_delete",
+        """
+        CREATE TRIGGER trg_tickets_version_insert AFTER INSERT ON tickets
+        BEGIN
+            INSERT INTO ticket_data_versions (user_id, version) VALUES (NEW.user_id, 1), (0, 1)
+            ON CONFLICT (user_id) DO UPDATE SET version = version + 1;
+            INSERT INTO ticket_change_versions (ticket_id, version)
+            SELECT NEW.id, version FROM ticket_data_versions WHERE user_id = 0
+            ON CONFLICT (ticket_id) DO UPDATE SET version = excluded.version;
+        END
+        """,
+        """
+        CREATE TRIGGER trg_tickets_version_update AFTER UPDATE ON tickets
+        BEGIN
+            INSERT INTO ticket_data_versions (user_id, version) VALUES (NEW.user_id, 1), (0, 1)
+            ON CONFLICT (user_id) DO UPDATE SET version = version + 1;
+            INSERT INTO ticket_change_versions (ticket_id, version)
+            SELECT NEW.id, version FROM ticket_data_versions WHERE user_id = 0
+            ON CONFLICT (ticket_id) DO UPDATE SET version = excluded.version;
+        END
+        """,
+        """
+        CREATE TRIGGER trg_tickets_version_delete AFTER DELETE ON tickets
+        BEGIN
+            INSERT INTO ticket_data_versions (user_id, version) VALUES (OLD.user_id, 1), (0, 1)
+            ON CONFLICT (user_id) DO UPDATE SET version = version + 1;
+            DELETE FROM ticket_change_versions WHERE ticket_id = OLD.id;
+        END
+        """,
+    ]),
+]
+
+
+def get_schema_version(conn) -> int:
+    """Return the highest applied migration version (0 for a fresh database)."""
+    result = conn.execute(text("SELECT MAX(version) FROM schema_migrations"))
+    return result.fetchone()[0] or 0
+
+
+def run_migrations(conn):
+    """Apply pending migrations in order, each one in its own transaction."""
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            description VARCHAR(255) NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """))
+    conn.commit()
+
+    current_version = get_schema_version(conn)
+
+    for version, description, statements in MIGRATIONS:
+        if version <= current_version:
+            continue
+
+        # SQLite DDL is transactional, so a failed migration leaves no trace
+        conn.exec_driver_sql("BEGIN")
+        try:
+            for statement in statements:
+                conn.execute(text(statement))
+            conn.execute(text("""
+                INSERT INTO schema_migrations (version, description)
+                VALUES (:version, :description)
+            """), {"version": version, "description": description})
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"Migration {version} ({description}) failed: {e}")
+            raise
+
+        logger.info(f"Applied migration {version}: {description}")
@@ -0,0 +1,102 @@
+from jinja2 import Environment, FileSystemLoader
+from markupsafe import Markup
+from cache import TTLCache
+import os
+
+# Shared HTML fragments for tickets and status messages, used by both the
+# web app and the MCP server. Templates live in templates/partials.
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates")
+
+_env = Environment(loader=FileSystemLoader(TEMPLATE_DIR), autoescape=True)
+
+# Compiled once at import instead of on every call
+_ticket_details = _env.get_template("partials/ticket_details.html")
+_ticket_list_item = _env.get_template("partials/ticket_list_item.html")
+_ticket_list = _env.get_template("partials/ticket_list.html")
+_success_message = _env.get_template("partials/success_message.html")
+_error_message = _env.get_template("partials/error_message.html")
+
+STATUS_COLORS = {
+    "open": "bg-green-100 text-green-800",
+    "in_progress": "bg-blue-100 text-blue-800",
+    "resolved": "bg-purple-100 text-purple-800",
+    "closed": "bg-gray-100 text-gray-800"
+}
+DEFAULT_STATUS_COLOR = "bg-gray-100 text-gray-800"
+
+# Rendered ticket cards, keyed by (kind, ticket id, updated_at, fingerprint).
+# updated_at only has one-second resolution, so the key also carries a hash
+# of the rendered fields to catch two edits within the same second.
+RENDER_CACHE_SIZE = int(os.getenv("RENDER_CACHE_SIZE", "10000"))
+RENDER_CACHE_TTL_SECONDS = float(os.getenv("RENDER_CACHE_TTL_SECONDS", "3600"))
+fragment_cache = TTLCache(maxsize=RENDER_CACHE_SIZE, ttl=RENDER_CACHE_TTL_SECONDS)
+
+_CARDS_MARKER = "\x00cards\x00"
+
+_CARD_FIELDS = (
+    "query", "status", "llm_response", "final_response", "responded_by",
+    "is_resolved", "user_satisfied", "username", "created_at"
+)
+
+
+def _cache_key(kind: str, ticket: dict) -> tuple:
+    fingerprint = hash(tuple(map(ticket.get, _CARD_FIELDS)))
+    return (kind, ticket["id"], ticket.get("updated_at"), fingerprint)
+
+
+def _card_context(ticket: dict) -> dict:
+    status = ticket.get('status', 'unknown')
+    return {
+        "ticket": ticket,
+        "status": status,
+        "status_class": STATUS_COLORS.get(status, DEFAULT_STATUS_COLOR)
+    }
+
+
+def format_ticket_details(ticket_data: dict) -> str:
+    """Format a single ticket into nice HTML"""
+    key = _cache_key("details", ticket_data)
+    html = fragment_cache.get(key)
+    if html is None:
+        html = _ticket_details.render(_card_context(ticket_data))
+        fragment_cache.set(key, html)
+    return html
+
+
+def _format_ticket_list_item(ticket: dict) -> str:
+    key = _cache_key("item", ticket)
+    html = fragment_cache.get(key)
+    if html is None:
+        query = ticket['query']
+        html = _ticket_list_item.render(
+            _card_context(ticket),
+            query_preview=query[:80] + ('...' if len(query) > 80 else '')
+        )
+        fragment_cache.set(key, html)
+    return html
+
+
+def format_ticket_list(tickets: list, title: str = "Your Tickets") -> str:
+    """Format a list of tickets into nice HTML"""
+    if not tickets:
+        return _ticket_list.render(title=title, count=0)
+
+    # Render only the small wrapper through Jinja and join the cached cards
+    # into it, so a long listing isn't copied through Markup again
+    wrapper = _ticket_list.render(title=title, count=len(tickets), cards=Markup(_CARDS_MARKER))
+    head, tail = wrapper.split(_CARDS_MARKER)
+    return "".join([head, "\n".join(map(_format_ticket_list_item, tickets)), tail])
+
+
+def format_success_message(message_text: str) -> str:
+    """Format success messages nicely"""
+    return _success_message.render(message=message_text)
+
+
+def format_error_message(error_text: str) -> str:
+    """Format error messages nicely"""
+    return _error_message.render(message=error_text)
+
+
+def get_render_stats() -> dict:
+    return fragment_cache.stats()
@@ -1,6 +1,85 @@
 from passlib.context import CryptContext
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import asyncio
+import os
 
 pwd_context = CryptContext(
     schemes=["argon2"],   # 👈 IMPORTANT
     deprecated="auto"
 )
+
+# Argon2 is deliberately CPU/memory heavy, so hashing runs in worker processes
+# instead of blocking the event loop. The semaphore caps queued work.
+HASH_POOL_WORKERS = int(os.getenv("HASH_POOL_WORKERS", str(os.cpu_count() or 1)))
+HASH_MAX_CONCURRENCY = int(os.getenv("HASH_MAX_CONCURRENCY", str(HASH_POOL_WORKERS * 4)))
+
+_hash_pool = None
+_hash_semaphore = None
+_hash_stats = {"in_flight": 0, "waiting": 0, "max_waiting": 0, "completed": 0, "failed": 0}
+
+
+def _hash_password(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def _verify_password(password: str, hashed_password: str) -> bool:
+    return pwd_context.verify(password, hashed_password)
+
+
+def _get_hash_pool() -> ProcessPoolExecutor:
+    global _hash_pool
+    if _hash_pool is None:
+        # spawn, not fork: the app process already runs DB and event-loop threads
+        _hash_pool = ProcessPoolExecutor(
+            max_workers=HASH_POOL_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _hash_pool
+
+
+async def _run_in_hash_pool(fn, *args):
+    global _hash_semaphore
+    if _hash_semaphore is None:
+        _hash_semaphore = asyncio.Semaphore(HASH_MAX_CONCURRENCY)
+
+    _hash_stats["waiting"] += 1
+    _hash_stats["max_waiting"] = max(_hash_stats["max_waiting"], _hash_stats["waiting"])
+    async with _hash_semaphore:
+        _hash_stats["waiting"] -= 1
+        _hash_stats["in_flight"] += 1
+        try:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(_get_hash_pool(), fn, *args)
+            _hash_stats["completed"] += 1
+            return result
+        except Exception:
+            _hash_stats["failed"] += 1
+            raise
+        finally:
+            _hash_stats["in_flight"] -= 1
+
+
+async def hash_in_pool(password: str) -> str:
+    """Hash a password in the worker pool."""
+    return await _run_in_hash_pool(_hash_password, password)
+
+
+async def verify_in_pool(password: str, hashed_password: str) -> bool:
+    """Verify a password against its hash in the worker pool."""
+    return await _run_in_hash_pool(_verify_password, password, hashed_password)
+
+
+def get_hash_pool_stats() -> dict:
+    return {
+        **_hash_stats,
+        "workers": HASH_POOL_WORKERS,
+        "max_concurrency": HASH_MAX_CONCURRENCY
+    }
+
+
+def shutdown_hash_pool():
+    global _hash_pool
+    if _hash_pool is not None:
+        _hash_pool.shutdown(wait=False, cancel_futures=True)
+        _hash_pool = None
@@ -0,0 +1,419 @@
+from sqlalchemy import text
+from utils import get_db
+from typing import List, Optional
+import numpy as np
+import logging
+import os
+import re
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Hashed bag of words and word bigrams over the query text of resolved tickets
+SIMILARITY_FEATURE_BITS = int(os.getenv("SIMILARITY_FEATURE_BITS", "20"))
+# Recent changes are searched by brute force, then merged into the main index
+SIMILARITY_MERGE_THRESHOLD = int(os.getenv("SIMILARITY_MERGE_THRESHOLD", "5000"))
+# Features in more than this share of documents (and over 1000 of them) are
+# skipped at query time
+SIMILARITY_MAX_DF = float(os.getenv("SIMILARITY_MAX_DF", "0.2"))
+# Tickets tokenized per batch while building, to bound temporary memory
+SIMILARITY_BUILD_BATCH = 50000
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+_TICKET_CHANGES_QUERY = """
+    SELECT id, user_id, query, final_response, is_resolved
+    FROM tickets
+"""
+# Tickets whose last write came after global data version `since` (migration 7)
+_CHANGED_SINCE = " WHERE id IN (SELECT ticket_id FROM ticket_change_versions WHERE version > :since)"
+
+
+def _stem(word: str) -> str:
+    # Just enough stemming that "disconnects" and "disconnecting" meet
+    for suffix in ("ing", "ed", "es", "s"):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3 and not word.endswith("ss"):
+            return word[:-len(suffix)]
+    return word
+
+
+def _tokens(value: str) -> list:
+    words = [_stem(word) for word in _TOKEN_RE.findall(value.lower())]
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+def _features(value: str, mask: int):
+    """Hashed unigram and bigram counts for a text, as (feature ids, counts)."""
+    tokens = _tokens(value)
+    if not tokens:
+        return np.empty(0, np.int32), np.empty(0, np.float32)
+    ids = np.fromiter((hash(t) & mask for t in tokens), np.int32, len(tokens))
+    features, counts = np.unique(ids, return_counts=True)
+    return features, counts.astype(np.float32)
+
+
+def _gather(starts: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """Concatenated index ranges [start, start + length) as one array."""
+    total = int(lengths.sum())
+    if not total:
+        return np.empty(0, np.int64)
+    return np.repeat(starts + lengths - lengths.cumsum(), lengths) + np.arange(total)
+
+
+class _Growable:
+    """A numpy array with amortized appends."""
+
+    def __init__(self, dtype):
+        self.data = np.empty(1024, dtype)
+        self.size = 0
+
+    def extend(self, values) -> int:
+        start = self.size
+        end = start + len(values)
+        if end > len(self.data):
+            grown = np.empty(max(end, 2 * len(self.data)), self.data.dtype)
+            grown[:start] = self.data[:start]
+            self.data = grown
+        self.data[start:end] = values
+        self.size = end
+        return start
+
+    def view(self) -> np.ndarray:
+        return self.data[:self.size]
+
+
+class SimilarTicketIndex:
+    """In-memory nearest-neighbour index over resolved tickets' query text.
+
+    Tickets are TF-IDF vectors over hashed features, stored as posting
+    lists (feature -> rows) in CSR arrays: a lookup only touches rows that
+    share a feature with the question and scores them with one bincount.
+    Rows added since the last merge sit in a small unsorted segment that
+    is searched by brute force and merged in once it passes
+    SIMILARITY_MERGE_THRESHOLD. Replaced or reopened tickets are masked
+    out until then.
+
+    The index follows the database through `sync()`: whenever the global
+    ticket data version moves, it reads back the tickets written after the
+    version of the last sync, so resolutions made by any process or tool
+    are picked up.
+    Searches return ids and scores; read the ticket text from the database.
+    """
+
+    def __init__(self, feature_bits: int = SIMILARITY_FEATURE_BITS):
+        self.n_features = 1 << feature_bits
+        self._mask = self.n_features - 1
+        self._lock = threading.RLock()
+        self._reset()
+        self.queries = 0
+        self.total_query_time = 0.0
+        self.merges = 0
+        self.build_seconds = None
+
+    def _reset(self):
+        # One entry per row; rows are renumbered on merge
+        self._ticket_ids = _Growable(np.int64)
+        self._user_ids = _Growable(np.int64)
+        self._alive = _Growable(bool)
+        self._row_starts = _Growable(np.int64)
+        self._row_lengths = _Growable(np.int32)
+        self._rows = {}
+        # Forward index: each row's features and term counts
+        self._row_features = _Growable(np.int32)
+        self._row_counts = _Growable(np.float32)
+        # Main segment: postings sorted by feature
+        self._indptr = np.zeros(self.n_features + 1, np.int64)
+        self._post_rows = np.empty(0, np.int32)
+        self._post_weights = np.empty(0, np.float32)
+        # Delta segment: postings of rows added since the last merge
+        self._delta = []
+        self._delta_arrays = None
+        self._df = np.zeros(self.n_features, np.int32)
+        self._n_docs = 0
+        self._version = None
+
+    # -- building -------------------------------------------------------
+
+    def _weights(self, features: np.ndarray, counts: np.ndarray) -> np.ndarray:
+        idf = np.log((1 + self._n_docs) / (1 + self._df[features])) + 1
+        return ((1 + np.log(counts)) * idf).astype(np.float32)
+
+    def _remove(self, ticket_id: int):
+        row = self._rows.pop(ticket_id, None)
+        if row is None:
+            return
+        self._alive.data[row] = False
+        start, length = self._row_starts.data[row], self._row_lengths.data[row]
+        self._df[self._row_features.data[start:start + length]] -= 1
+        self._n_docs -= 1
+
+    def _add(self, ticket_id: int, user_id: int, query: str, delta: bool = True):
+        features, counts = _features(query, self._mask)
+        if len(features) == 0:
+            return
+        self._df[features] += 1
+        self._n_docs += 1
+
+        row = self._ticket_ids.extend([ticket_id])
+        self._user_ids.extend([user_id])
+        self._alive.extend([True])
+        self._row_starts.extend([self._row_features.extend(features)])
+        self._row_counts.extend(counts)
+        self._row_lengths.extend([len(features)])
+        self._rows[ticket_id] = row
+
+        if delta:
+            weights = self._weights(features, counts)
+            weights /= np.linalg.norm(weights)
+            self._delta.append((features, np.full(len(features), row, np.int32), weights))
+            self._delta_arrays = None
+
+    def _add_many(self, tickets):
+        """Bulk `_add` for (id, user_id, query, ...) rows, straight into the main segment."""
+        bits = self.n_features.bit_length() - 1
+        hashes, token_counts = [], []
+        for ticket in tickets:
+            tokens = _tokens(ticket[2])
+            hashes.extend(hash(t) & self._mask for t in tokens)
+            token_counts.append(len(tokens))
+        if not hashes:
+            return
+
+        # Count each (row, feature) pair across the whole batch in one pass
+        rows = np.repeat(np.arange(len(tickets), dtype=np.int64), token_counts)
+        pairs, counts = np.unique((rows << bits) | np.array(hashes, np.int64), return_counts=True)
+        rows, features = pairs >> bits, (pairs & self._mask).astype(np.int32)
+        lengths = np.bincount(rows, minlength=len(tickets)).astype(np.int32)
+        present = np.flatnonzero(lengths)
+
+        first_row = self._ticket_ids.size
+        ticket_ids = np.array([tickets[i][0] for i in present], np.int64)
+        self._ticket_ids.extend(ticket_ids)
+        self._user_ids.extend(np.array([tickets[i][1] for i in present], np.int64))
+        self._alive.extend(np.ones(len(present), bool))
+        self._row_starts.extend(self._row_features.extend(features) + np.cumsum(lengths[present]) - lengths[present])
+        self._row_counts.extend(counts.astype(np.float32))
+        self._row_lengths.extend(lengths[present])
+        self._rows.update(zip(ticket_ids.tolist(), range(first_row, first_row + len(present))))
+        self._df += np.bincount(features, minlength=self.n_features).astype(np.int32)
+        self._n_docs += len(present)
+
+    def _apply(self, ticket: dict):
+        self._remove(ticket["id"])
+        if ticket["is_resolved"] and ticket["final_response"]:
+            self._add(ticket["id"], ticket["user_id"], ticket["query"])
+
+    def _merge(self):
+        """Rebuild the main segment from the live rows, with current IDF weights."""
+        keep = np.flatnonzero(self._alive.view())
+        starts = self._row_starts.view()[keep]
+        lengths = self._row_lengths.view()[keep]
+        positions = _gather(starts, lengths)
+        features = self._row_features.view()[positions]
+        counts = self._row_counts.view()[positions]
+        rows = np.repeat(np.arange(len(keep), dtype=np.int32), lengths)
+
+        # Compact the row tables and forward index down to the live rows
+        ticket_ids, user_ids = self._ticket_ids.view()[keep], self._user_ids.view()[keep]
+        for table in (self._ticket_ids, self._user_ids, self._alive, self._row_starts,
+                      self._row_lengths, self._row_features, self._row_counts):
+            table.size = 0
+        self._ticket_ids.extend(ticket_ids)
+        self._user_ids.extend(user_ids)
+        self._alive.extend(np.ones(len(keep), bool))
+        self._row_starts.extend(np.concatenate([[0], lengths.cumsum()[:-1]]) if len(keep) else [])
+        self._row_lengths.extend(lengths)
+        self._row_features.extend(features)
+        self._row_counts.extend(counts)
+        self._rows = dict(zip(ticket_ids.tolist(), range(len(keep))))
+
+        weights = self._weights(features, counts)
+        norms = np.sqrt(np.bincount(rows, weights=weights.astype(np.float64) ** 2, minlength=len(keep)))
+        weights /= norms[rows].astype(np.float32)
+
+        order = np.argsort(features, kind="stable")
+        self._post_rows = rows[order]
+        self._post_weights = weights[order]
+        self._indptr = np.zeros(self.n_features + 1, np.int64)
+        np.cumsum(np.bincount(features, minlength=self.n_features), out=self._indptr[1:])
+        self._delta = []
+        self._delta_arrays = None
+        self.merges += 1
+
+    @staticmethod
+    def _data_version(db) -> int:
+        return db.execute(text("SELECT version FROM ticket_data_versions WHERE user_id = 0")).scalar() or 0
+
+    def build(self, db):
+        """Load every resolved ticket, using a sync session."""
+        started = time.perf_counter()
+        with self._lock:
+            self._reset()
+            self._version = self._data_version(db)
+            result = db.execute(text(
+                _TICKET_CHANGES_QUERY + " WHERE is_resolved = 1 AND final_response IS NOT NULL"
+            ).execution_options(yield_per=SIMILARITY_BUILD_BATCH))
+            for batch in result.partitions(SIMILARITY_BUILD_BATCH):
+                self._add_many(batch)
+            self._merge()
+        self.build_seconds = time.perf_counter() - started
+        logger.info(f"Similar ticket index built: {self._n_docs} tickets in {self.build_seconds:.1f}s")
+
+    def sync(self, db):
+        """Apply tickets changed since the last sync, if the ticket data version moved."""
+        if self._version is None:
+            with self._lock:
+                # The warm thread and the first lookup can both get here;
+                # whoever waited on the lock finds the index built
+                if self._version is None:
+                    self.build(db)
+                    return
+        version = self._data_version(db)
+        if version == self._version:
+            return
+        with self._lock:
+            # Writes committed after `version` was read come back again on
+            # the next sync; applying a ticket twice is harmless
+            result = db.execute(text(_TICKET_CHANGES_QUERY + _CHANGED_SINCE), {"since": self._version})
+            for ticket in result.mappings():
+                self._apply(ticket)
+            self._version = version
+            dead_rows = self._alive.size - len(self._rows)
+            if len(self._delta) + dead_rows >= SIMILARITY_MERGE_THRESHOLD:
+                self._merge()
+
+    # -- querying -------------------------------------------------------
+
+    def _delta_postings(self):
+        if self._delta_arrays is None:
+            if self._delta:
+                features, rows, weights = zip(*self._delta)
+                self._delta_arrays = (np.concatenate(features), np.concatenate(rows), np.concatenate(weights))
+            else:
+                self._delta_arrays = (np.empty(0, np.int32), np.empty(0, np.int32), np.empty(0, np.float32))
+        return self._delta_arrays
+
+    def search(self, question: str, k: int = 5, min_score: float = 0.0,
+               user_id: Optional[int] = None) -> List[dict]:
+        """Top-k resolved tickets by cosine similarity to `question`, best first.
+
+        Returns dicts with ticket_id, user_id and score.
+        """
+        started = time.perf_counter()
+        with self._lock:
+            n_rows = self._ticket_ids.size
+            features, counts = _features(question, self._mask)
+            if len(features) == 0 or n_rows == 0:
+                return []
+
+            # Very common features cost the most to scan and say the least;
+            # keep them only if the question has nothing else
+            df = self._df[features]
+            known = df > 0
+            keep = known & (df <= max(SIMILARITY_MAX_DF * self._n_docs, 1000))
+            if not keep.any():
+                keep = known
+            if not keep.any():
+                return []
+            features, counts = features[keep], counts[keep]
+            weights = self._weights(features, counts)
+            weights /= np.linalg.norm(weights)
+
+            starts = self._indptr[features]
+            lengths = self._indptr[features + 1] - starts
+            positions = _gather(starts, lengths)
+            rows = self._post_rows[positions]
+            contributions = self._post_weights[positions] * np.repeat(weights, lengths)
+
+            delta_features, delta_rows, delta_weights = self._delta_postings()
+            if len(delta_features):
+                # Position of each delta feature in the (sorted) query features
+                slot = np.searchsorted(features, delta_features).clip(max=len(features) - 1)
+                hit = features[slot] == delta_features
+                rows = np.concatenate([rows, delta_rows[hit]])
+                contributions = np.concatenate([contributions, delta_weights[hit] * weights[slot[hit]]])
+
+            scores = np.bincount(rows, weights=contributions, minlength=n_rows)
+            scores[~self._alive.view()] = 0
+            if user_id is not None:
+                scores[self._user_ids.view() != user_id] = 0
+
+            k = min(k, n_rows)
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            matches = [
+                {
+                    "ticket_id": int(self._ticket_ids.data[row]),
+                    "user_id": int(self._user_ids.data[row]),
+                    "score": round(float(scores[row]), 4)
+                }
+                for row in top
+                if scores[row] > min_score
+            ]
+
+        self.queries += 1
+        self.total_query_time += time.perf_counter() - started
+        return matches
+
+    def stats(self) -> dict:
+        return {
+            "tickets": self._n_docs,
+            "pending_merge": len(self._delta),
+            "merges": self.merges,
+            "build_seconds": round(self.build_seconds, 2) if self.build_seconds is not None else None,
+            "queries": self.queries,
+            "avg_query_ms": round(self.total_query_time / self.queries * 1000, 2) if self.queries else 0.0
+        }
+
+
+similar_tickets = SimilarTicketIndex()
+
+
+# Matches scoring below this are not worth suggesting
+SIMILARITY_MIN_SCORE = float(os.getenv("SIMILARITY_MIN_SCORE", "0.1"))
+
+
+def lookup_similar_tickets(question: str, current_user_id: int, current_user_role: str,
+                           k: int = 5, min_score: float = SIMILARITY_MIN_SCORE) -> List[dict]:
+    """Top-k resolved tickets similar to `question`, with their resolutions.
+
+    Admins search every resolved ticket; regular users only their own,
+    since a resolution can carry details of the user it was written for.
+    Blocking; run it in a thread from async code.
+    """
+    user_id = None if current_user_role == "admin" else current_user_id
+    with get_db(readonly=True) as db:
+        similar_tickets.sync(db)
+        matches = similar_tickets.search(question, k=k, min_score=min_score, user_id=user_id)
+        if not matches:
+            return []
+
+        params = {f"id_{i}": match["ticket_id"] for i, match in enumerate(matches)}
+        result = db.execute(text(f"""
+            SELECT id, query, final_response, responded_by
+            FROM tickets
+            WHERE id IN ({", ".join(":" + name for name in params)})
+        """), params)
+        tickets = {row["id"]: row for row in result.mappings()}
+
+    similar = []
+    for match in matches:
+        ticket = tickets.get(match["ticket_id"])
+        # Reopened since the last sync
+        if ticket is None or not ticket["final_response"]:
+            continue
+        similar.append({
+            "ticket_id": ticket["id"],
+            "score": match["score"],
+            "query": ticket["query"],
+            "final_response": ticket["final_response"],
+            "responded_by": ticket["responded_by"]
+        })
+    return similar
+
+
+def warm_similar_tickets():
+    """Build the index ahead of the first lookup."""
+    with get_db(readonly=True) as db:
+        similar_tickets.sync(db)
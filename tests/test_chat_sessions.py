@@ -0,0 +1,79 @@
+"""Chat endpoints with a stand-in agent, against a throwaway database.
+
+    pip install pytest
+    python -m pytest tests
+"""
+import importlib
+import os
+import secrets
+import sqlite3
+import sys
+
+import pytest
+from fastapi.testclient import TestClient
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage, SystemMessage
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+class FakeAgent:
+    async def ainvoke(self, state):
+        return {"messages": state["messages"] + [AIMessage(content="fake reply")]}
+
+    async def astream_events(self, state, version):
+        yield {"event": "on_chat_model_stream", "data": {"chunk": AIMessageChunk(content="fake reply")}}
+        yield {"event": "on_chat_model_end", "data": {"output": AIMessage(content="fake reply")}}
+
+
+async def fake_agent():
+    return FakeAgent()
+
+
+@pytest.fixture(scope="module")
+def app(tmp_path_factory):
+    # The database file and templates are found relative to the working
+    # directory, so move there before main (and utils) are imported
+    workdir = tmp_path_factory.mktemp("helphub")
+    (workdir / "templates").symlink_to(os.path.join(ROOT, "templates"))
+    with pytest.MonkeyPatch.context() as patch:
+        patch.chdir(workdir)
+        main = importlib.import_module("main")
+        patch.setattr(main, "agent", fake_agent)
+        patch.setattr(main, "INTENT_ROUTER_ENABLED", False)
+        with TestClient(main.app) as client:
+            yield main, client
+
+
+def login(main, client) -> tuple:
+    username = f"chat_{secrets.token_hex(4)}"
+    response = client.post("/api/auth/register", json={
+        "username": username,
+        "email": f"{username}@test.local",
+        "password": "test-password"
+    })
+    response.raise_for_status()
+    response = client.post("/api/auth/login", json={"username": username, "password": "test-password"})
+    response.raise_for_status()
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    with sqlite3.connect(main.database_name) as conn:
+        user_id = conn.execute("SELECT id FROM users WHERE username = ?", (username,)).fetchone()[0]
+    return headers, f"user_{user_id}"
+
+
+@pytest.mark.parametrize("path", ["/htmx/chat/send", "/htmx/chat/stream"])
+def test_evicted_session_is_rebuilt(app, path):
+    main, client = app
+    headers, session_id = login(main, client)
+    client.post("/htmx/chat/init", headers=headers).raise_for_status()
+    # What the store's idle TTL or byte budget does to a quiet session
+    del main.chat_sessions[session_id]
+
+    response = client.post(path, data={"message": "my printer is jammed"}, headers=headers)
+
+    assert response.status_code == 200
+    assert "fake reply" in response.text
+    system, question, answer = main.chat_sessions.get(session_id)
+    assert isinstance(system, SystemMessage) and "Current user information" in system.content
+    assert isinstance(question, HumanMessage) and question.content == "my printer is jammed"
+    assert answer.content == "fake reply"
@@ -0,0 +1,195 @@
+from sqlalchemy import text
+from utils import get_async_db, TICKET_RETURNING_COLUMNS
+import asyncio
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Live ticket changes for the dashboard sidebar. Every create/update path
+# publishes the rows it wrote after committing; /api/tickets/events streams
+# them to each subscriber that may see them (admins: all tickets, users:
+# their own).
+
+# Events buffered per subscriber; a client that falls further behind gets
+# one "resync" event telling it to reload the list instead
+TICKET_EVENT_QUEUE_SIZE = int(os.getenv("TICKET_EVENT_QUEUE_SIZE", "256"))
+# Comment frames sent on idle streams so proxies keep them open
+TICKET_EVENT_KEEPALIVE_SECONDS = float(os.getenv("TICKET_EVENT_KEEPALIVE_SECONDS", "15"))
+# How often writes made by another process are looked for; see watch_ticket_changes()
+TICKET_EVENT_POLL_SECONDS = float(os.getenv("TICKET_EVENT_POLL_SECONDS", "1"))
+
+# What the sidebar needs; the full text columns stay out of the events
+TICKET_EVENT_FIELDS = (
+    "id", "user_id", "username", "status", "query", "is_resolved",
+    "responded_by", "created_at", "updated_at"
+)
+TICKET_EVENT_QUERY_CHARS = 200
+# In-process publishes remembered so the watcher doesn't send them twice
+TICKET_EVENT_PUBLISHED_MAX = 4096
+
+
+def ticket_event_payload(ticket) -> dict:
+    """Slim a ticket row (mapping or TicketResponse) down to the event fields."""
+    if not hasattr(ticket, "keys"):
+        ticket = ticket.model_dump()
+    payload = {field: ticket[field] for field in TICKET_EVENT_FIELDS if field in ticket.keys()}
+    payload["is_resolved"] = bool(payload.get("is_resolved"))
+    query = payload.get("query")
+    if query and len(query) > TICKET_EVENT_QUERY_CHARS:
+        payload["query"] = query[:TICKET_EVENT_QUERY_CHARS - 3] + "..."
+    for field in ("created_at", "updated_at"):
+        if payload.get(field) is not None:
+            payload[field] = str(payload[field])
+    return payload
+
+
+class TicketSubscription:
+    def __init__(self, user_id: int, role: str, maxsize: int):
+        self.user_id = user_id
+        self.is_admin = role == "admin"
+        self.queue = asyncio.Queue(maxsize=maxsize)
+
+    def can_see(self, payload: dict) -> bool:
+        return self.is_admin or payload["user_id"] == self.user_id
+
+    async def get(self):
+        return await self.queue.get()
+
+
+class TicketEventBus:
+    """In-process fan-out of ticket changes to SSE subscribers.
+
+    `publish()` may be called from any thread; delivery always happens on
+    the event loop the subscribers live on.
+    """
+
+    def __init__(self, queue_size: int = TICKET_EVENT_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._subscribers = set()
+        self._loop = None
+        # Set when the first subscriber arrives; the watcher sleeps on it
+        self._subscribed = asyncio.Event()
+        # {ticket_id: updated_at} dispatched here since the watcher last
+        # looked; None while no watcher runs
+        self._recent = None
+        self.published = 0
+        self.resyncs = 0
+
+    def subscribe(self, user_id: int, role: str) -> TicketSubscription:
+        self._loop = asyncio.get_running_loop()
+        subscription = TicketSubscription(user_id, role, self.queue_size)
+        self._subscribers.add(subscription)
+        self._subscribed.set()
+        return subscription
+
+    def unsubscribe(self, subscription: TicketSubscription):
+        self._subscribers.discard(subscription)
+
+    def has_subscribers(self) -> bool:
+        return bool(self._subscribers)
+
+    def publish(self, change: str, tickets):
+        """Send "created"/"updated" ticket rows to the subscribers allowed to see them."""
+        if not self._subscribers:
+            return
+        payloads = [{"change": change, **ticket_event_payload(ticket)} for ticket in tickets]
+        if not payloads:
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            self._dispatch(payloads)
+        else:
+            self._loop.call_soon_threadsafe(self._dispatch, payloads)
+
+    def _dispatch(self, payloads: list):
+        if self._recent is not None:
+            for payload in payloads:
+                self._recent.pop(payload["id"], None)
+                self._recent[payload["id"]] = payload.get("updated_at")
+            while len(self._recent) > TICKET_EVENT_PUBLISHED_MAX:
+                del self._recent[next(iter(self._recent))]
+        for subscription in list(self._subscribers):
+            for payload in payloads:
+                if not subscription.can_see(payload):
+                    continue
+                try:
+                    subscription.queue.put_nowait(("ticket", payload))
+                except asyncio.QueueFull:
+                    # Too far behind for patches to be worth it; later events
+                    # still queue up behind the resync and are harmless
+                    while not subscription.queue.empty():
+                        subscription.queue.get_nowait()
+                    subscription.queue.put_nowait(("resync", {}))
+                    self.resyncs += 1
+        self.published += len(payloads)
+
+    def _published_here(self, row) -> bool:
+        """Whether this exact version of the row was already dispatched in-process."""
+        if self._recent.get(row["id"], False) != str(row["updated_at"]):
+            return False
+        del self._recent[row["id"]]
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": len(self._subscribers),
+            "published": self.published,
+            "resyncs": self.resyncs
+        }
+
+
+ticket_event_bus = TicketEventBus()
+
+
+# Rows whose last write came after global data version `since` (migration 7)
+CHANGED_TICKETS_QUERY = f"""
+    SELECT {TICKET_RETURNING_COLUMNS}
+    FROM tickets
+    WHERE id IN (SELECT ticket_id FROM ticket_change_versions WHERE version > :since)
+    ORDER BY id
+"""
+
+
+async def watch_ticket_changes(bus: TicketEventBus = ticket_event_bus):
+    """Publish ticket writes made by another process, e.g. the MCP server over stdio/http.
+
+    Polls the global write counter from migration 2 while anyone is
+    subscribed and reads back the rows written after the version seen at
+    the last poll. The baseline is read as soon as the first subscriber
+    arrives. Rows this process already published, as it does for writes
+    made through the REST API, are skipped. A write committing between the
+    two reads is sent again on the next poll, which the sidebar treats as a
+    no-op.
+    """
+    version = None
+    bus._recent = {}
+    while True:
+        if bus.has_subscribers():
+            await asyncio.sleep(TICKET_EVENT_POLL_SECONDS)
+        else:
+            version = None
+            bus._recent.clear()
+            bus._subscribed.clear()
+            await bus._subscribed.wait()
+        if not bus.has_subscribers():
+            continue
+        try:
+            async with get_async_db(readonly=True) as db:
+                result = await db.execute(text(
+                    "SELECT version FROM ticket_data_versions WHERE user_id = 0"
+                ))
+                current = result.scalar() or 0
+                if version is not None and current != version:
+                    result = await db.execute(text(CHANGED_TICKETS_QUERY), {"since": version})
+                    rows = [row for row in result.mappings().fetchall() if not bus._published_here(row)]
+                    bus.publish("created", [row for row in rows if row["created_at"] == row["updated_at"]])
+                    bus.publish("updated", [row for row in rows if row["created_at"] != row["updated_at"]])
+                version = current
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Error watching ticket changes: {e}")
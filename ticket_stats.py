@@ -0,0 +1,123 @@
+from sqlalchemy import text
+from utils import get_db, initialize_database_and_tables
+import argparse
+import logging
+import sys
+
+logger = logging.getLogger(__name__)
+
+# Counters in ticket_stats are kept up to date by the triggers from
+# migration 3. This module reads them back into the /api/admin/stats shape
+# and can rebuild them from the tickets and users tables.
+#
+#   python ticket_stats.py           rebuild the counters, reporting any drift
+#   python ticket_stats.py --check   only report drift; exit status 1 if any
+
+COUNTERS_QUERY = "SELECT metric, key, count FROM ticket_stats"
+
+# The same aggregates the stats endpoint used to run on every call
+_FULL_SCAN_QUERY = """
+    SELECT 'tickets', 'total', COUNT(*) FROM tickets
+    UNION ALL
+    SELECT 'status', COALESCE(status, 'null'), COUNT(*) FROM tickets GROUP BY 2
+    UNION ALL
+    SELECT 'resolved', CASE WHEN is_resolved = 1 THEN 'yes' ELSE 'no' END, COUNT(*)
+    FROM tickets GROUP BY 2
+    UNION ALL
+    SELECT 'satisfaction',
+        CASE WHEN user_satisfied = 1 THEN 'satisfied'
+             WHEN user_satisfied = 0 THEN 'unsatisfied'
+             WHEN user_satisfied IS NULL THEN 'no_response'
+             ELSE 'other' END,
+        COUNT(*)
+    FROM tickets GROUP BY 2
+    UNION ALL
+    SELECT 'responded_by', COALESCE(responded_by, 'null'), COUNT(*) FROM tickets GROUP BY 2
+    UNION ALL
+    SELECT 'users', 'total', COUNT(*) FROM users
+"""
+
+
+def _nonzero(counters: dict, metric: str) -> dict:
+    # Groups that dropped to zero keep their row; GROUP BY would not list them
+    return {key: count for (m, key), count in counters.items() if m == metric and count}
+
+
+def _group_key(key: str):
+    return None if key == "null" else key
+
+
+def build_stats(rows) -> dict:
+    """Turn (metric, key, count) rows into the /api/admin/stats response."""
+    counters = {(metric, key): count for metric, key, count in rows}
+    return {
+        "total_tickets": counters.get(("tickets", "total"), 0),
+        "tickets_by_status": {
+            _group_key(key): count for key, count in _nonzero(counters, "status").items()
+        },
+        "resolved_tickets": counters.get(("resolved", "yes"), 0),
+        "user_satisfaction": {
+            "satisfied": counters.get(("satisfaction", "satisfied"), 0),
+            "unsatisfied": counters.get(("satisfaction", "unsatisfied"), 0),
+            "no_response": counters.get(("satisfaction", "no_response"), 0)
+        },
+        "response_types": {
+            _group_key(key): count for key, count in _nonzero(counters, "responded_by").items()
+        },
+        "total_users": counters.get(("users", "total"), 0)
+    }
+
+
+def find_drift(stored: dict, actual: dict) -> list:
+    """Return (metric, key, stored, actual) for every counter that disagrees."""
+    drift = []
+    for metric_key in sorted(set(stored) | set(actual)):
+        stored_count = stored.get(metric_key, 0)
+        actual_count = actual.get(metric_key, 0)
+        if stored_count != actual_count:
+            drift.append((*metric_key, stored_count, actual_count))
+    return drift
+
+
+def reconcile(fix: bool = True) -> list:
+    """Recount everything from scratch and compare with the stored counters.
+
+    With `fix`, the counters are replaced by the fresh counts in the same
+    transaction, so no write can slip in between the count and the rewrite.
+    """
+    with get_db() as db:
+        db.execute(text("BEGIN IMMEDIATE"))
+        try:
+            stored = {(m, k): c for m, k, c in db.execute(text(COUNTERS_QUERY)).fetchall()}
+            actual = {(m, k): c for m, k, c in db.execute(text(_FULL_SCAN_QUERY)).fetchall()}
+            drift = find_drift(stored, actual)
+
+            if fix:
+                if drift:
+                    logger.warning(f"Rebuilding ticket_stats, {len(drift)} counter(s) drifted")
+                db.execute(text("DELETE FROM ticket_stats"))
+                db.execute(text(f"INSERT INTO ticket_stats (metric, key, count) {_FULL_SCAN_QUERY}"))
+                db.commit()
+            else:
+                db.rollback()
+        except Exception:
+            db.rollback()
+            raise
+    return drift
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild and check the admin statistics counters")
+    parser.add_argument("--check", action="store_true", help="report drift without rewriting the counters")
+    args = parser.parse_args()
+
+    # Make sure the counters table and triggers exist before checking them
+    initialize_database_and_tables()
+    drift = reconcile(fix=not args.check)
+    for metric, key, stored_count, actual_count in drift:
+        print(f"{metric}/{key}: stored {stored_count}, actual {actual_count}")
+    if not drift:
+        print("Counters match the tickets and users tables.")
+    elif not args.check:
+        print(f"Rebuilt counters, fixed {len(drift)} drifted value(s).")
+    sys.exit(1 if drift and args.check else 0)
@@ -0,0 +1,125 @@
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from langchain_core.messages import ToolMessage
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Latencies of the tool calls made in the current agent step
+_step_latencies = ContextVar("step_latencies", default=None)
+# Concurrency slots of the current agent step; each step gets its own
+_step_semaphore = ContextVar("step_semaphore", default=None)
+
+
+class ToolCallLimiter:
+    """Caps concurrent tool calls per agent step, times them out and records their latency.
+
+    ToolNode already runs the tool calls of one agent step concurrently and
+    returns the results in call order; this is passed to it as
+    `awrap_tool_call` to bound that concurrency and to stop a slow tool from
+    holding up the whole step. Wrap the step in `step()` to measure how much
+    running the calls concurrently saved over running them one by one.
+    """
+
+    def __init__(self, max_concurrency: int, timeout: float):
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self._tools = {}
+        self.steps = 0
+        self.multi_call_steps = 0
+        self.step_time = 0.0
+        self.sequential_time = 0.0
+
+    def _record(self, name: str, latency: float, outcome: str):
+        entry = self._tools.setdefault(
+            name, {"calls": 0, "errors": 0, "timeouts": 0, "total_time": 0.0, "max_time": 0.0}
+        )
+        entry["calls"] += 1
+        entry["total_time"] += latency
+        entry["max_time"] = max(entry["max_time"], latency)
+        if outcome != "ok":
+            entry[outcome] += 1
+
+        latencies = _step_latencies.get()
+        if latencies is not None:
+            latencies.append(latency)
+
+    async def __call__(self, request, execute):
+        call = request.tool_call
+        semaphore = _step_semaphore.get()
+        if semaphore is None:
+            # Called outside step(): nothing to share slots with
+            semaphore = asyncio.Semaphore(self.max_concurrency)
+        queued = time.perf_counter()
+        started = None
+
+        async def run():
+            nonlocal started
+            async with semaphore:
+                started = time.perf_counter()
+                return await execute(request)
+
+        outcome = "ok"
+        try:
+            # The timeout covers waiting for a slot too, so a step never
+            # waits longer than `timeout` for any one call
+            result = await asyncio.wait_for(run(), timeout=self.timeout)
+            if isinstance(result, ToolMessage) and result.status == "error":
+                outcome = "errors"
+            return result
+        except asyncio.TimeoutError:
+            outcome = "timeouts"
+            waited = "running" if started is not None else "waiting for a slot"
+            logger.warning(f"Tool {call['name']} timed out after {self.timeout}s ({waited})")
+            return ToolMessage(
+                content=f"Error: {call['name']} did not respond within {self.timeout:g} seconds.",
+                tool_call_id=call["id"],
+                name=call["name"],
+                status="error"
+            )
+        finally:
+            self._record(call["name"], time.perf_counter() - (started or queued), outcome)
+
+    @asynccontextmanager
+    async def step(self):
+        """Run one agent tool step with its own `max_concurrency` slots.
+
+        Also measures the step: wall time against the sum of its call latencies.
+        """
+        latencies = []
+        token = _step_latencies.set(latencies)
+        semaphore_token = _step_semaphore.set(asyncio.Semaphore(self.max_concurrency))
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            _step_semaphore.reset(semaphore_token)
+            _step_latencies.reset(token)
+            self.steps += 1
+            if len(latencies) > 1:
+                self.multi_call_steps += 1
+                self.step_time += time.perf_counter() - started
+                self.sequential_time += sum(latencies)
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "timeout_seconds": self.timeout,
+            "steps": self.steps,
+            "multi_call_steps": self.multi_call_steps,
+            "multi_call_wall_ms": round(self.step_time * 1000, 2),
+            "multi_call_sequential_ms": round(self.sequential_time * 1000, 2),
+            "parallel_saved_ms": round(max(self.sequential_time - self.step_time, 0.0) * 1000, 2),
+            "tools": {
+                name: {
+                    "calls": entry["calls"],
+                    "errors": entry["errors"],
+                    "timeouts": entry["timeouts"],
+                    "avg_ms": round(entry["total_time"] / entry["calls"] * 1000, 2),
+                    "max_ms": round(entry["max_time"] * 1000, 2)
+                }
+                for name, entry in self._tools.items()
+            }
+        }
@@ -2,13 +2,19 @@ from pydantic import BaseModel, Field
 from typing import Optional, List, Dict
 from enum import Enum
 from contextlib import contextmanager, asynccontextmanager
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine, event, text
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from dotenv import load_dotenv
 import logging
+import os
+import base64
+import json
+import re
 load_dotenv()
 from passlib.context import CryptContext
 from security import *
+from migrations import run_migrations
 
 
 # Logging setup
@@ -19,16 +25,104 @@ logger = logging.getLogger(__name__)
 # Database Configuration - SQLite3
 database_name = "ticketing_tool.db"
 DATABASE_URL = f"sqlite:///{database_name}"
+ASYNC_DATABASE_URL = f"sqlite+aiosqlite:///{database_name}"
+
+# SQLite performance profile, applied to every new connection
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_TEMP_STORE = os.getenv("SQLITE_TEMP_STORE", "MEMORY")
+
+# Read/write split: one writer connection, a pool of read-only connections
+SQLITE_SPLIT_READ_WRITE = os.getenv("SQLITE_SPLIT_READ_WRITE", "true").lower() == "true"
+SQLITE_READ_POOL_SIZE = int(os.getenv("SQLITE_READ_POOL_SIZE", "5"))
+
+
+def _sqlite_pragma_hook(readonly: bool):
+    """Build a connect-event listener that applies the SQLite profile."""
+    def apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            # journal_mode is persistent and needs write access, so only the writer sets it
+            if not readonly:
+                cursor.execute(f"PRAGMA journal_mode = {SQLITE_JOURNAL_MODE}")
+            cursor.execute(f"PRAGMA synchronous = {SQLITE_SYNCHRONOUS}")
+            cursor.execute(f"PRAGMA busy_timeout = {SQLITE_BUSY_TIMEOUT_MS}")
+            cursor.execute(f"PRAGMA cache_size = -{SQLITE_CACHE_SIZE_KB}")
+            cursor.execute(f"PRAGMA mmap_size = {SQLITE_MMAP_SIZE}")
+            cursor.execute(f"PRAGMA temp_store = {SQLITE_TEMP_STORE}")
+            if readonly:
+                cursor.execute("PRAGMA query_only = ON")
+        finally:
+            cursor.close()
+    return apply_pragmas
+
+
+def _engine_pool_args(readonly: bool) -> dict:
+    if not SQLITE_SPLIT_READ_WRITE:
+        return {}
+    if readonly:
+        return {"pool_size": SQLITE_READ_POOL_SIZE, "max_overflow": SQLITE_READ_POOL_SIZE}
+    # SQLite allows a single writer; queue writers in the pool instead of on the file lock
+    return {"pool_size": 1, "max_overflow": 0}
+
 
 # SQLAlchemy setup for SQLite
 engine = create_engine(
     DATABASE_URL,
-    pool_pre_ping=True,
     connect_args={"check_same_thread": False},
-    echo=False
+    echo=False,
+    **_engine_pool_args(readonly=False)
 )
+event.listen(engine, "connect", _sqlite_pragma_hook(readonly=False))
+
+if SQLITE_SPLIT_READ_WRITE:
+    read_engine = create_engine(
+        DATABASE_URL,
+        connect_args={"check_same_thread": False},
+        echo=False,
+        **_engine_pool_args(readonly=True)
+    )
+    event.listen(read_engine, "connect", _sqlite_pragma_hook(readonly=True))
+else:
+    read_engine = engine
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
+# Async engines for the FastAPI routes, so queries don't block the event loop
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    echo=False,
+    **_engine_pool_args(readonly=False)
+)
+event.listen(async_engine.sync_engine, "connect", _sqlite_pragma_hook(readonly=False))
+
+if SQLITE_SPLIT_READ_WRITE:
+    async_read_engine = create_async_engine(
+        ASYNC_DATABASE_URL,
+        echo=False,
+        **_engine_pool_args(readonly=True)
+    )
+    event.listen(async_read_engine.sync_engine, "connect", _sqlite_pragma_hook(readonly=True))
+else:
+    async_read_engine = async_engine
+
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False
+)
+
+AsyncReadSessionLocal = async_sessionmaker(
+    bind=async_read_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False
+)
 
 
 
@@ -80,6 +174,12 @@ class TokenData(BaseModel):
 class TicketCreate(BaseModel):
     query: str = Field(..., min_length=10, description="User query/issue description")
 
+# Max tickets accepted by one bulk create call
+BULK_TICKET_LIMIT = int(os.getenv("BULK_TICKET_LIMIT", "1000"))
+
+class TicketBulkCreate(BaseModel):
+    tickets: List[TicketCreate] = Field(..., min_length=1, max_length=BULK_TICKET_LIMIT)
+
 class TicketUpdate(BaseModel):
     status: Optional[TicketStatus] = None
     llm_response: Optional[str] = None
@@ -88,6 +188,10 @@ class TicketUpdate(BaseModel):
     is_resolved: Optional[bool] = None
     user_satisfied: Optional[bool] = None
 
+class DuplicateGroupResolve(BaseModel):
+    final_response: str = Field(..., min_length=1, description="Response sent on every open ticket of the group")
+    responded_by: RespondedBy = RespondedBy.HUMAN
+
 class TicketResponse(BaseModel):
     id: int
     user_id: int
@@ -101,16 +205,166 @@ class TicketResponse(BaseModel):
     user_satisfied: Optional[bool]
     created_at: str
     updated_at: str
+    duplicate_group_id: Optional[int] = None
+
+class TicketSearchResult(TicketResponse):
+    snippet: str
+    rank: float
+
+class SimilarTicket(BaseModel):
+    ticket_id: int
+    score: float
+    query: str
+    final_response: str
+    responded_by: Optional[str]
+
+# Columns for INSERT/UPDATE ... RETURNING, shaped like TicketResponse
+TICKET_RETURNING_COLUMNS = """
+    id, user_id, (SELECT username FROM users WHERE users.id = tickets.user_id) AS username,
+    query, status, llm_response, final_response, responded_by, is_resolved, user_satisfied,
+    created_at, updated_at, duplicate_group_id
+"""
+
+# Rows per multi-row INSERT, well under SQLite's bound-parameter limit
+BULK_INSERT_CHUNK_SIZE = 500
+
+def build_bulk_ticket_inserts(user_id: int, queries: List[str]):
+    """Split a bulk create into multi-row INSERT ... RETURNING statements.
+
+    Returns a list of (sql, params) pairs; run them in one transaction.
+    """
+    statements = []
+    for start in range(0, len(queries), BULK_INSERT_CHUNK_SIZE):
+        chunk = queries[start:start + BULK_INSERT_CHUNK_SIZE]
+        params = {
+            "user_id": user_id,
+            "status": TicketStatus.OPEN.value,
+            "responded_by": RespondedBy.NONE.value
+        }
+        values = []
+        for i, query in enumerate(chunk):
+            params[f"query_{i}"] = query
+            values.append(f"(:user_id, :query_{i}, :status, :responded_by)")
+        sql = f"""
+            INSERT INTO tickets (user_id, query, status, responded_by)
+            VALUES {", ".join(values)}
+            RETURNING {TICKET_RETURNING_COLUMNS}
+        """
+        statements.append((sql, params))
+    return statements
+
+# Keyset pagination cursors: an opaque token wrapping (created_at, id) of the last row
+def encode_ticket_cursor(created_at: str, ticket_id: int) -> str:
+    payload = json.dumps([str(created_at), ticket_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+def decode_ticket_cursor(cursor: str):
+    """Return (created_at, id) from a cursor, raising ValueError if it is malformed."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, ticket_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return str(created_at), int(ticket_id)
+    except Exception:
+        raise ValueError("Invalid pagination cursor")
+
+# Full-text search over tickets_fts. User input is reduced to quoted words
+# (implicitly ANDed), so FTS5 operators or stray quotes can't break the query.
+SEARCH_MAX_TERMS = 16
+_SEARCH_TERM_RE = re.compile(r"\w+")
+
+def build_fts_match(search: str) -> Optional[str]:
+    """Turn free text into an FTS5 MATCH expression, or None if it has no words."""
+    terms = _SEARCH_TERM_RE.findall(search)[:SEARCH_MAX_TERMS]
+    if not terms:
+        return None
+    quoted = [f'"{term}"' for term in terms]
+    # The last word is a prefix, so "vpn conn" finds "connecting"
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+def build_ticket_search(match: str, current_user_id: int, current_user_role: str,
+                        user_id: Optional[int] = None, limit: int = 20):
+    """Build the (sql, params) for a ranked ticket search.
+
+    Matches in the query text weigh twice as much as matches in responses.
+    Regular users only ever see their own tickets. Ranking reads only the
+    index; ticket rows are joined for the top `limit` ids alone.
+    """
+    filters = ""
+    params = {"match": match, "limit": limit}
+    if current_user_role != "admin":
+        filters += " AND f.user_id = :current_user_id"
+        params["current_user_id"] = current_user_id
+    if user_id is not None:
+        filters += " AND f.user_id = :user_id"
+        params["user_id"] = user_id
+
+    sql = f"""
+        WITH ranked AS (
+            SELECT tickets_fts.rowid AS id, bm25(tickets_fts, 2.0, 1.0, 1.0) AS rank
+            FROM tickets_fts
+            {"JOIN tickets f ON f.id = tickets_fts.rowid" if filters else ""}
+            WHERE tickets_fts MATCH :match{filters}
+            ORDER BY rank
+            LIMIT :limit
+        )
+        SELECT
+            t.id, t.user_id, u.username, t.query, t.status, t.llm_response,
+            t.final_response, t.responded_by, t.is_resolved, t.user_satisfied,
+            t.created_at, t.updated_at, t.duplicate_group_id, ranked.rank
+        FROM ranked
+        JOIN tickets t ON t.id = ranked.id
+        JOIN users u ON t.user_id = u.id
+        ORDER BY ranked.rank
+    """
+    return sql, params
+
+SEARCH_SNIPPET_WORDS = 12
+
+def _search_hit(word: str, stems: List[str]) -> bool:
+    word = word.lower()
+    return any(word.startswith(stem) for stem in stems)
+
+def build_search_snippet(texts: List[Optional[str]], search: str) -> str:
+    """A short passage around the search words with the hits in **bold**.
+
+    Built in Python for the returned rows only; FTS5's snippet() would be
+    computed for every match before ranking. Words are matched on a short
+    prefix to roughly follow the porter stemmer ("jams" finds "jammed").
+    """
+    terms = [term.lower() for term in _SEARCH_TERM_RE.findall(search)[:SEARCH_MAX_TERMS]]
+    stems = [term[:max(len(term) - 3, min(len(term), 3))] for term in terms]
+
+    best_words, best_hits = [], []
+    for value in texts:
+        words = (value or "").split()
+        hits = [i for i, word in enumerate(words) if _search_hit(word, stems)]
+        if len(hits) > len(best_hits) or not best_words:
+            best_words, best_hits = words, hits
+
+    first_hit = best_hits[0] if best_hits else 0
+    start = max(0, min(first_hit - SEARCH_SNIPPET_WORDS // 4, len(best_words) - SEARCH_SNIPPET_WORDS))
+    end = start + SEARCH_SNIPPET_WORDS
+    hits = set(best_hits)
+    window = [f"**{word}**" if i in hits else word for i, word in enumerate(best_words[start:end], start)]
+    return ("..." if start > 0 else "") + " ".join(window) + ("..." if end < len(best_words) else "")
 
 # Database connection context manager
 @contextmanager
-def get_db():
-    db = SessionLocal()
+def get_db(readonly: bool = False):
+    db = ReadSessionLocal() if readonly else SessionLocal()
     try:
         yield db
     finally:
         db.close()
 
+# Async database session context manager
+@asynccontextmanager
+async def get_async_db(readonly: bool = False):
+    session_factory = AsyncReadSessionLocal if readonly else AsyncSessionLocal
+    async with session_factory() as db:
+        yield db
+
 
 
 def initialize_database_and_tables():
@@ -150,6 +404,9 @@ def initialize_database_and_tables():
             """))
             
             conn.commit()
+
+            # Bring existing databases up to the current schema version
+            run_migrations(conn)
             logger.info("SQLite database and tables initialized successfully.")
             
             # Create default admin if not exists